@@ -0,0 +1,32 @@
+import hmac
+import os
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from utils.profiler import list_profiles, profile_path
+
+router = APIRouter()
+
+# Admin endpoints are disabled (403) unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def check_admin_token(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/profiles")
+def get_profiles(x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    return {"profiles": list_profiles()}
+
+
+@router.get("/profiles/{name}")
+def get_profile(name: str, x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
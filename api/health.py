@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+
+from services.warmup import readiness
 
 router = APIRouter()
 
@@ -11,3 +13,13 @@ async def health_check():
 @router.get("/health")
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
+
+
+@router.get("/ready")
+async def readiness_check(response: Response):
+    """
+    200 once this worker has finished warming up (DB pools, LLM check, pipeline imports, schema prompts), else 503.
+    """
+    state = readiness()
+    response.status_code = 200 if state["ready"] else 503
+    return {"status": "ready" if state["ready"] else "warming_up", "version": "1.0.0", "steps": state["steps"]}
@@ -0,0 +1,49 @@
+import logging
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from services.jobs import get_job_runner, JobQueueFull, DEFAULT_PRIORITY
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+class JobRequest(BaseModel):
+    question: str
+    priority: int = Field(DEFAULT_PRIORITY, ge=0, le=9, description="0 = most urgent, 9 = least urgent")
+
+
+def job_response(job):
+    result = job.get("result")
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "progress": job.get("progress", []),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "result": {
+            "status": "success" if result.get("error") is None else "failure",
+            "result": result
+        } if result else None,
+        "error": job.get("error")
+    }
+
+
+@router.post("/jobs", status_code=202)
+def submit_job(request: JobRequest):
+    try:
+        job = get_job_runner().submit(request.question, request.priority)
+    except JobQueueFull as e:
+        logger.warning("Job rejected", extra={"error": str(e)})
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return job_response(job)
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_job_runner().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_response(job)
@@ -1,7 +1,15 @@
+import json
 import logging
-from fastapi import APIRouter
+from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.analyzer import run_reasoning_pipeline
+from utils.admission import check_deadline, deadline_exceeded
+from utils.cache import shared_cached
+from utils.cancellation import check_cancelled
+from utils.tracing import start_trace
+from utils.profiler import profile_request
 
 router = APIRouter()
 
@@ -12,12 +20,44 @@ class QuestionRequest(BaseModel):
     question: str
 
 
+class QuestionsRequest(BaseModel):
+    questions: List[str]
+
+
 @router.post("/ask-question")
-def process_question(request: QuestionRequest):
-    question = request.question
+def process_question(request: QuestionRequest, http_response: Response, debug_timing: bool = False):
+    """
+    Answers one question. With ?debug_timing=1 the response also carries the request's span tree.
+    Responds 504 when the client's X-Request-Deadline passes before the pipeline finishes.
+    """
+    with start_trace("ask_question") as root_span, profile_request("ask_question"):
+        response = answer_question(request.question)
+        root_span.set_attribute("status", response["status"])
+    if response["status"] == "failure" and deadline_exceeded():
+        http_response.status_code = 504
+
+    if debug_timing:
+        response["trace_id"] = root_span.trace_id
+        response["timing"] = root_span.to_tree()
+    return response
+
+
+def check_request(stage):
+    check_deadline(stage)
+    check_cancelled(stage)
+
+
+def answer_question(question):
+    # The pipeline (pandas, networkx, openai, prompt builders) is imported on first use to keep worker start-up fast
+    from services.analyzer import run_reasoning_pipeline
 
     try:
-        reasoning_result = run_reasoning_pipeline(question)
+        # Successful answers are shared across worker processes when the shared cache is on
+        reasoning_result = shared_cached("answer", " ".join(question.lower().split()),
+                                         # Work is abandoned between stages once the deadline has passed or
+                                         # the client has gone away
+                                         lambda: run_reasoning_pipeline(question, progress=check_request),
+                                         keep=lambda result: result.get("error") is None, label=question)
         is_success = reasoning_result.get("error") is None
 
         return {
@@ -25,7 +65,7 @@ def process_question(request: QuestionRequest):
             "result": reasoning_result
         }
     except Exception as e:
-        logger.error(f"Pipeline execution error: {e}")
+        logger.error("Pipeline execution error", extra={"error": str(e)})
         return {
             "status": "failure",
             "result": {
@@ -38,3 +78,26 @@ def process_question(request: QuestionRequest):
                 "error": str(e)
             }
         }
+
+
+@router.post("/ask-questions")
+def process_questions(request: QuestionsRequest):
+    """
+    Runs a batch of questions and streams one NDJSON line per question as soon as it finishes.
+    """
+    from services.batch import run_batch, BATCH_MAX_QUESTIONS
+
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+
+    def stream():
+        for index, question, reasoning_result in run_batch(request.questions):
+            line = {
+                "index": index,
+                "question": question,
+                "status": "success" if reasoning_result.get("error") is None else "failure",
+                "result": reasoning_result
+            }
+            yield json.dumps(jsonable_encoder(line)) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,221 @@
+"""
+Offline batch runner for scheduled reports — runs questions through the reasoning pipeline without uvicorn.
+
+Usage:
+    python batch_cli.py questions.jsonl results.jsonl
+    python batch_cli.py questions.csv results_parquet_dir --format parquet --processes 4 --threads 8
+
+Input: JSONL lines like {"id": "q1", "question": "..."} or a CSV with a `question` column (and optional `id`).
+Rows without an id are keyed by their line number. Results are written as each question completes, and
+ids are checkpointed next to the output once their results are safely written, so a rerun resumes where the
+previous run stopped (add --retry-failed to also rerun questions that failed).
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.logging_config import configure_logging
+
+configure_logging()
+logger = logging.getLogger("batch_cli")
+
+CHUNK_DONE = "__chunk_done__"
+
+
+def read_questions(path):
+    items = []
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for line_number, row in enumerate(csv.DictReader(f), start=1):
+                if row.get("question"):
+                    items.append((str(row.get("id") or line_number), row["question"]))
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    row = json.loads(line)
+                    items.append((str(row.get("id") or line_number), row["question"]))
+    return items
+
+
+def read_checkpoint(path, retry_failed=False):
+    """
+    Returns the ids to skip. Checkpoint lines are "<id>\t<status>"; the latest line per id wins.
+    """
+    if not os.path.exists(path):
+        return set()
+    statuses = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            item_id, _, status = line.rstrip("\n").partition("\t")
+            if item_id:
+                statuses[item_id] = status
+    return {item_id for item_id, status in statuses.items() if not retry_failed or status == "success"}
+
+
+def write_checkpoint(checkpoint, records):
+    for record in records:
+        checkpoint.write(f"{record['id']}\t{record['status']}\n")
+    checkpoint.flush()
+
+
+class JsonlWriter:
+    def __init__(self, path, checkpoint):
+        self._file = open(path, "a", encoding="utf-8")
+        self._checkpoint = checkpoint
+
+    def write(self, record):
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        write_checkpoint(self._checkpoint, [record])
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writes each flush as its own part file in the output directory, so the directory can be read back as a single
+    dataset (pandas.read_parquet(dir)). A parquet file is unreadable until its footer is written, so rows are
+    checkpointed only once their part file is complete; a crash loses at most the buffered rows, which rerun.
+    """
+
+    def __init__(self, directory, checkpoint, flush_every=50):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+
+        os.makedirs(directory, exist_ok=True)
+        self._pa = pa
+        self._pq = pq
+        self._schema = pa.schema([("id", pa.string()), ("question", pa.string()), ("status", pa.string()),
+                                  ("result", pa.string())])
+        self._directory = directory
+        self._prefix = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._parts = 0
+        self._checkpoint = checkpoint
+        self._buffer = []
+        self._flush_every = flush_every
+
+    def write(self, record):
+        self._buffer.append({**record, "result": json.dumps(record["result"], default=str)})
+        if len(self._buffer) >= self._flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        name = f"{self._prefix}-{self._parts:05d}.parquet"
+        # Written under a hidden name (skipped by dataset readers) and renamed once complete
+        temporary_path = os.path.join(self._directory, f".{name}.tmp")
+        self._pq.write_table(self._pa.Table.from_pylist(self._buffer, schema=self._schema), temporary_path)
+        os.replace(temporary_path, os.path.join(self._directory, name))
+        self._parts += 1
+        write_checkpoint(self._checkpoint, self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+
+
+def _init_worker(requests_per_minute):
+    # Each process gets an equal share of the global LLM rate limit
+    from llm.openai_client import llm_rate_limiter
+    llm_rate_limiter.configure(requests_per_minute)
+
+
+def _run_chunk(chunk, threads, result_queue):
+    from services.batch import run_batch
+
+    questions = [question for _, question in chunk]
+    for index, question, result in run_batch(questions, concurrency=threads):
+        result_queue.put((chunk[index][0], question, json.dumps(result, default=str)))
+
+
+def run(input_path, output_path, output_format, processes, threads, chunk_size, requests_per_minute,
+        retry_failed=False):
+    checkpoint_path = output_path.rstrip("/") + ".checkpoint"
+    done_ids = read_checkpoint(checkpoint_path, retry_failed)
+    pending = [item for item in read_questions(input_path) if item[0] not in done_ids]
+    logger.info(f"{len(done_ids)} questions already done, {len(pending)} to run")
+    if not pending:
+        return
+
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    per_process_rate = requests_per_minute / processes if requests_per_minute else 0
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        writer = ParquetWriter(output_path, checkpoint) if output_format == "parquet" \
+            else JsonlWriter(output_path, checkpoint)
+        try:
+            _run_chunks(chunks, writer, processes, threads, per_process_rate, len(pending))
+        finally:
+            # Also on errors and Ctrl-C: results still buffered are written (and checkpointed) rather than lost
+            writer.close()
+
+
+def _run_chunks(chunks, writer, processes, threads, per_process_rate, total):
+    with multiprocessing.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                initargs=(per_process_rate,)) as executor:
+        result_queue = manager.Queue()
+        for chunk_number, chunk in enumerate(chunks):
+            future = executor.submit(_run_chunk, chunk, threads, result_queue)
+            future.add_done_callback(
+                lambda f, n=chunk_number: result_queue.put((CHUNK_DONE, n, repr(f.exception()) if f.exception() else None))
+            )
+
+        chunks_left = len(chunks)
+        completed = 0
+        started = time.time()
+        while chunks_left:
+            item_id, question, payload = result_queue.get()
+            if item_id == CHUNK_DONE:
+                chunks_left -= 1
+                if payload:
+                    logger.error(f"Chunk {question} failed: {payload}")
+                continue
+            result = json.loads(payload)
+            status = "success" if result.get("error") is None else "failure"
+            writer.write({"id": item_id, "question": question, "status": status, "result": result})
+            completed += 1
+            if completed % 10 == 0 or completed == total:
+                logger.info(f"{completed}/{total} done ({time.time() - started:.0f}s)")
+
+
+def main():
+    from llm.openai_client import LLM_MAX_REQUESTS_PER_MINUTE
+    from services.batch import BATCH_CONCURRENCY, BATCH_CLASSIFY_GROUP_SIZE
+
+    parser = argparse.ArgumentParser(description="Run a file of questions through the reasoning pipeline.")
+    parser.add_argument("input", help="Questions file (.jsonl or .csv)")
+    parser.add_argument("output", help="Results file (.jsonl) or directory (parquet)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None,
+                        help="Output format (default: parquet if the output ends with .parquet or is a directory)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=BATCH_CONCURRENCY, help="Concurrent questions per process")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CLASSIFY_GROUP_SIZE * 2)
+    parser.add_argument("--llm-rpm", type=float, default=LLM_MAX_REQUESTS_PER_MINUTE,
+                        help="Total LLM requests per minute across all processes (0 = unlimited)")
+    parser.add_argument("--retry-failed", action="store_true", help="Rerun questions that failed in a previous run")
+    args = parser.parse_args()
+
+    output_format = args.format or (
+        "parquet" if args.output.endswith(".parquet") or os.path.isdir(args.output) else "jsonl")
+    run(args.input, args.output, output_format, max(1, args.processes), max(1, args.threads),
+        max(1, args.chunk_size), args.llm_rpm, args.retry_failed)
+
+
+if __name__ == "__main__":
+    main()
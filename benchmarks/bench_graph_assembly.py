@@ -0,0 +1,56 @@
+"""
+Micro-benchmark for services.graph.assemble_graph.
+
+Usage:
+    python -m benchmarks.bench_graph_assembly --sizes 1000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.graph import assemble_graph
+
+RELATIONSHIPS = np.array(["HAS_OCCUPATION", "BELONGS_TO_SECTOR", "LOCATED_IN", "TRAINS_FOR", "FUNDED_BY"])
+NODE_TYPES = np.array(["employee", "occupation", "industry", "location", "skill"])
+
+
+def make_enriched_edges(edge_count, seed=42):
+    """
+    Synthetic enriched edges in the shape returned by the graph enrichment query.
+    """
+    rng = np.random.default_rng(seed)
+    node_count = max(2, edge_count // 4)
+    source = rng.integers(0, node_count, edge_count)
+    target = rng.integers(0, node_count, edge_count)
+    return pd.DataFrame({
+        "source": source.astype(str),
+        "target": target.astype(str),
+        "relationship": RELATIONSHIPS[rng.integers(0, len(RELATIONSHIPS), edge_count)],
+        "source_label": np.char.add("node ", source.astype(str)),
+        "source_type": NODE_TYPES[source % len(NODE_TYPES)],
+        "target_label": np.char.add("node ", target.astype(str)),
+        "target_type": NODE_TYPES[target % len(NODE_TYPES)],
+    })
+
+
+def run(sizes, repeat):
+    for size in sizes:
+        edges_df = make_enriched_edges(size)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            graph = assemble_graph(edges_df)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"edges={size:>9,}  nodes={len(graph['nodes']):>9,}  best={best * 1000:10.1f} ms  "
+              f"per_edge={best / size * 1e9:8.1f} ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark graph assembly from enriched edges.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
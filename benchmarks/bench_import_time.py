@@ -0,0 +1,72 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to `import main` (the app a worker loads), measured
+with `python -X importtime`. Also checks that heavy pipeline dependencies stay out of the startup path; they are
+imported on the first request instead.
+
+Usage:
+    python -m benchmarks.bench_import_time                 # median of 5 cold imports, slowest modules
+    python -m benchmarks.bench_import_time --check         # exit 1 over --budget-ms or on an eager heavy import
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only needed once a question is answered
+LAZY_MODULES = ("pandas", "numpy", "networkx", "openai", "duckdb", "services.analyzer", "llm.prompts")
+
+
+def import_once(module):
+    """
+    Imports `module` in a fresh interpreter; returns {module: (self_us, cumulative_us)} for every import.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in completed.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def run(module, repeat, top):
+    runs = [import_once(module) for _ in range(repeat)]
+    totals_ms = [timings[module][1] / 1000 for timings in runs]
+    median_ms = statistics.median(totals_ms)
+    print(f"import {module}: median {median_ms:.0f} ms, min {min(totals_ms):.0f} ms, max {max(totals_ms):.0f} ms "
+          f"over {repeat} cold imports")
+
+    # Slowest modules by self time in the median run
+    median_run = sorted(runs, key=lambda timings: timings[module][1])[len(runs) // 2]
+    print(f"\n{'self ms':>9} {'cumulative ms':>14}  module")
+    for name, (self_us, cumulative_us) in sorted(median_run.items(), key=lambda item: -item[1][0])[:top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:14.1f}  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in median_run]
+    if eager:
+        print(f"\nImported at startup but should be lazy: {', '.join(eager)}")
+    return median_ms, eager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold import time of the API app.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 over budget or on an eager import")
+    args = parser.parse_args()
+
+    median_ms, eager = run(args.module, args.repeat, args.top)
+    over_budget = median_ms > args.budget_ms
+    if over_budget:
+        print(f"\nOVER BUDGET: {median_ms:.0f} ms > {args.budget_ms:.0f} ms")
+    if args.check and (over_budget or eager):
+        sys.exit(1)
@@ -0,0 +1,338 @@
+"""
+Synthetic, referentially consistent data for every table in db.schemas.TABLE_SCHEMAS.
+
+employee_profile, workforce_reskilling_cases and workforce_reskilling_events grow with the scale factor
+(1x = 1,000 employees / 2,000 cases / 10,000 events); SOC codes and regions follow a Zipf-like skew.
+
+Usage:
+    python -m benchmarks.datagen --scale 10 --parquet data/scale10
+    python -m benchmarks.datagen --scale 100 --postgres --create-tables --truncate
+"""
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from db.client import connect
+from db.schemas import TABLE_SCHEMAS
+
+SECTORS = ["Manufacturing", "Retail", "Finance", "Health", "Education", "Construction", "Transport", "ICT",
+           "Hospitality", "Public Administration"]
+REGIONS = ["North East", "North West", "Yorkshire and The Humber", "East Midlands", "West Midlands", "East",
+           "London", "South East", "South West", "Wales", "Scotland", "Northern Ireland"]
+SKILL_CATEGORIES = ["Digital", "Data Analysis", "Leadership", "Green Skills", "Customer Service", "Engineering",
+                    "Healthcare", "Finance"]
+ACTIVITIES = ["Enrolled", "Assessment", "Module 1", "Module 2", "Module 3", "Final Exam", "Certified"]
+COMPLETION_STATUSES = ["Completed", "In Progress", "Failed"]
+SEXES = ["Male", "Female"]
+AGE_BANDS = ["16-24", "25-34", "35-44", "45-54", "55-64", "65+"]
+QUALIFICATIONS = ["None", "GCSE", "A Level", "Degree", "Postgraduate"]
+YEARS = [2017, 2018, 2019, 2020, 2021, 2022, 2023]
+# Relative share of local authorities' workforce per region, in REGIONS order
+REGION_WEIGHTS = [3, 8, 6, 5, 6, 7, 20, 14, 6, 3, 6, 2]
+
+# Base row counts at scale factor 1
+BASE_EMPLOYEES = 1000
+CASES_PER_EMPLOYEE = 2
+EVENTS_PER_CASE = 5
+INDUSTRY_COUNT = 20
+LOCAL_AUTHORITY_COUNT = 60
+OCCUPATION_COUNT = 120
+# Zipf exponent for how employees are spread across SOC codes and local authorities
+ZIPF_EXPONENT = 1.1
+
+
+def generate_tables(scale=1.0, seed=0):
+    """
+    Returns {table_name: DataFrame} for every table in TABLE_SCHEMAS. Dimension tables are fixed-size;
+    employee_profile, workforce_reskilling_cases and workforce_reskilling_events grow with `scale`.
+    """
+    rng = np.random.default_rng(seed)
+    tables = {}
+
+    industry_codes = np.arange(1, INDUSTRY_COUNT + 1)
+    tables["dim_industry"] = pd.DataFrame({
+        "industry_code": industry_codes,
+        "industry_name": [f"Industry {code}" for code in industry_codes],
+        "sector": [SECTORS[code % len(SECTORS)] for code in industry_codes]
+    })
+
+    la_codes = np.array([f"E{6000000 + i:08d}" for i in range(LOCAL_AUTHORITY_COUNT)])
+    region_ids = rng.choice(len(REGIONS), LOCAL_AUTHORITY_COUNT, p=_normalise(REGION_WEIGHTS))
+    tables["dim_local_authority"] = pd.DataFrame({
+        "local_authority_code": la_codes,
+        "local_authority_name": [f"Authority {i}" for i in range(LOCAL_AUTHORITY_COUNT)],
+        "region_name": [REGIONS[r] for r in region_ids],
+        "region_id": region_ids + 1
+    })
+
+    soc_codes = np.arange(1111, 1111 + OCCUPATION_COUNT)
+    occupation_industry = rng.choice(industry_codes, OCCUPATION_COUNT)
+    job_titles = [f"Job {code}" for code in soc_codes]
+    tables["dim_occupation"] = pd.DataFrame({
+        "soc_code": soc_codes, "job_title": job_titles, "industry_code": occupation_industry
+    })
+    tables["job_risk"] = pd.DataFrame({
+        "soc_code": soc_codes, "job_title": job_titles,
+        "automation_probability": rng.beta(2, 3, OCCUPATION_COUNT).round(3)
+    })
+    tables["soc_code_skill_training_map"] = pd.DataFrame({
+        "soc_code": soc_codes,
+        "skill_category": rng.choice(SKILL_CATEGORIES, OCCUPATION_COUNT),
+        "training_program": [f"Programme {i % 25}" for i in range(OCCUPATION_COUNT)]
+    })
+
+    employee_count = max(1, int(BASE_EMPLOYEES * scale))
+    employee_ids = np.arange(1, employee_count + 1)
+    # Skewed: a few SOC codes and the authorities in big regions hold most of the workforce
+    employee_soc_index = rng.choice(OCCUPATION_COUNT, employee_count, p=_zipf_weights(rng, OCCUPATION_COUNT))
+    la_weights = _zipf_weights(rng, LOCAL_AUTHORITY_COUNT) * np.asarray(REGION_WEIGHTS, dtype=float)[region_ids]
+    employee_soc = soc_codes[employee_soc_index]
+    tables["employee_profile"] = pd.DataFrame({
+        "employee_id": employee_ids,
+        "soc_code": employee_soc,
+        "sex": rng.choice(SEXES, employee_count),
+        "qualification": rng.choice(QUALIFICATIONS, employee_count),
+        "local_authority_code": la_codes[rng.choice(LOCAL_AUTHORITY_COUNT, employee_count, p=_normalise(la_weights))],
+        "age_band": rng.choice(AGE_BANDS, employee_count),
+        "industry_code": occupation_industry[employee_soc_index]
+    })
+
+    tables["workforce_reskilling_cases"], tables["workforce_reskilling_events"] = _cases_and_events(
+        rng, employee_ids, employee_soc_index, soc_codes, tables["soc_code_skill_training_map"])
+
+    tables["fact_demographic_automation_rows"] = _demographic_facts(rng)
+    tables["fact_geographic_automation_rows"] = _geographic_facts(rng, la_codes)
+    tables["fact_industry_automation_rows"] = _industry_facts(rng, industry_codes)
+    tables["ess_survey"] = _ess_survey(rng)
+    tables["training_budgets"] = _training_budgets(rng)
+
+    missing = set(TABLE_SCHEMAS["tables"]) - set(tables)
+    assert not missing, f"No generator for tables: {missing}"
+    return {name: tables[name][list(TABLE_SCHEMAS["tables"][name]["columns"])] for name in TABLE_SCHEMAS["tables"]}
+
+
+def _normalise(weights):
+    weights = np.asarray(weights, dtype=float)
+    return weights / weights.sum()
+
+
+def _zipf_weights(rng, count, exponent=ZIPF_EXPONENT):
+    """
+    Zipf-like probabilities over `count` items, with the popularity ranks shuffled.
+    """
+    return _normalise(1.0 / rng.permutation(np.arange(1, count + 1)) ** exponent)
+
+
+def _cases_and_events(rng, employee_ids, employee_soc_index, soc_codes, skill_map):
+    case_count = len(employee_ids) * CASES_PER_EMPLOYEE
+    case_employee_index = rng.integers(0, len(employee_ids), case_count)
+    case_soc_index = employee_soc_index[case_employee_index]
+    case_skill = skill_map["skill_category"].to_numpy()[case_soc_index]
+    start_dates = pd.Timestamp("2021-01-01") + pd.to_timedelta(rng.integers(0, 1000, case_count), unit="D")
+    durations = rng.integers(14, 240, case_count)
+    completed = rng.random(case_count) < 0.7
+    cases = pd.DataFrame({
+        "employee_id": employee_ids[case_employee_index],
+        "training_program": skill_map["training_program"].to_numpy()[case_soc_index],
+        "certification_earned": completed & (rng.random(case_count) < 0.8),
+        "case_id": np.arange(1, case_count + 1),
+        "start_date": start_dates.date,
+        "completion_date": np.where(completed, (start_dates + pd.to_timedelta(durations, unit="D")).date, None),
+        "soc_code": soc_codes[case_soc_index],
+        "skill_category": case_skill
+    })
+
+    event_count = case_count * EVENTS_PER_CASE
+    event_case_index = np.repeat(np.arange(case_count), EVENTS_PER_CASE)
+    step = np.tile(np.arange(EVENTS_PER_CASE), case_count)
+    event_times = (np.asarray(start_dates)[event_case_index]
+                   + pd.to_timedelta(step * 7 + rng.integers(0, 7, event_count), unit="D"))
+    events = pd.DataFrame({
+        "case_id": cases["case_id"].to_numpy()[event_case_index],
+        "activity": np.array(ACTIVITIES)[np.minimum(step, len(ACTIVITIES) - 1)],
+        "actor": rng.choice(["Learner", "Trainer", "Assessor", "System"], event_count),
+        "skill_category": case_skill[event_case_index],
+        "score": rng.integers(0, 101, event_count),
+        "completion_status": rng.choice(COMPLETION_STATUSES, event_count, p=[0.6, 0.3, 0.1]),
+        "event_id": np.arange(1, event_count + 1),
+        "timestamp": event_times
+    })
+    return cases, events
+
+
+def _demographic_facts(rng):
+    index = pd.MultiIndex.from_product([YEARS, SEXES, AGE_BANDS, QUALIFICATIONS],
+                                       names=["year", "sex", "age_band", "qualification"])
+    df = index.to_frame(index=False)
+    shares = rng.dirichlet([3, 2, 1], len(df))
+    df["low_risk"], df["medium_risk"], df["high_risk"] = shares[:, 0].round(3), shares[:, 1].round(3), shares[:, 2].round(3)
+    df["total"] = rng.integers(1000, 50000, len(df))
+    return df
+
+
+def _geographic_facts(rng, la_codes):
+    index = pd.MultiIndex.from_product([YEARS, la_codes], names=["year", "local_authority_code"])
+    df = index.to_frame(index=False)
+    df["probability_of_automation"] = rng.beta(2, 3, len(df)).round(3)
+    for column in ("low_risk", "medium_risk", "high_risk"):
+        df[column] = rng.integers(100, 20000, len(df))
+    return df
+
+
+def _industry_facts(rng, industry_codes):
+    index = pd.MultiIndex.from_product([YEARS, industry_codes], names=["year", "industry_code"])
+    df = index.to_frame(index=False)
+    df["probability_of_automation"] = rng.beta(2, 3, len(df)).round(3)
+    for column in ("low_risk", "medium_risk", "high_risk"):
+        df[column] = rng.integers(100, 20000, len(df))
+    return df
+
+
+def _ess_survey(rng, rows=2000):
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "year": rng.choice(YEARS, rows),
+        "region_id": rng.integers(1, len(REGIONS) + 1, rows),
+        "sector": rng.choice(SECTORS, rows),
+        "org_type": rng.choice(["Private", "Public", "Charity"], rows),
+        "site_type": rng.choice(["Single", "Multi"], rows),
+        "size_band": rng.choice(["2-4", "5-24", "25-99", "100+"], rows),
+        "job_role_id": rng.choice([f"R{i}" for i in range(10)], rows),
+        "age_group": rng.choice(AGE_BANDS, rows),
+        "gender": rng.choice(SEXES, rows),
+        "education_level": rng.choice(QUALIFICATIONS, rows),
+        "metric_name": rng.choice(["skills_gap", "training_days", "vacancies"], rows),
+        "metric_value": rng.gamma(2.0, 5.0, rows).round(2)
+    })
+
+
+def _training_budgets(rng):
+    index = pd.MultiIndex.from_product([YEARS, SECTORS, ["Small", "Medium", "Large"]],
+                                       names=["year", "sector", "estab_size"])
+    df = index.to_frame(index=False)
+    df.insert(0, "id", np.arange(1, len(df) + 1))
+    df["employees"] = rng.integers(1000, 100000, len(df)).astype(float)
+    df["trainees"] = (df["employees"] * rng.uniform(0.2, 0.7, len(df))).round()
+    df["twentytwo_prices_budget_total_mn"] = rng.uniform(1, 500, len(df)).round(2)
+    df["twentytwo_prices_budget_per_employee"] = (df["twentytwo_prices_budget_total_mn"] * 1e6 / df["employees"]).round(2)
+    df["twentytwo_prices_budget_per_trainee"] = (df["twentytwo_prices_budget_total_mn"] * 1e6 / df["trainees"]).round(2)
+    return df
+
+
+DUCKDB_TYPES = {"INT4": "INTEGER", "INT8": "BIGINT", "FLOAT4": "REAL", "FLOAT8": "DOUBLE", "TEXT": "VARCHAR",
+                "BOOLEAN": "BOOLEAN", "DATE": "DATE", "TIMESTAMP": "TIMESTAMP"}
+
+
+def load_duckdb(tables, path):
+    """
+    Creates every table with the column types from TABLE_SCHEMAS in a DuckDB file and loads the data.
+    """
+    import duckdb
+
+    connection = duckdb.connect(path)
+    try:
+        for name, df in tables.items():
+            columns = TABLE_SCHEMAS["tables"][name]["columns"]
+            column_defs = ", ".join(f'"{col}" {DUCKDB_TYPES.get(sql_type, "VARCHAR")}' for col, sql_type in columns.items())
+            connection.execute(f'DROP TABLE IF EXISTS "{name}"')
+            connection.execute(f'CREATE TABLE "{name}" ({column_defs})')
+            connection.register("source_df", df)
+            connection.execute(f'INSERT INTO "{name}" SELECT * FROM source_df')
+            connection.unregister("source_df")
+    finally:
+        connection.close()
+
+
+def _table_name(schema_name):
+    # TABLE_SCHEMAS refers to some tables by their export name (e.g. dim_industry_rows)
+    return schema_name if schema_name in TABLE_SCHEMAS["tables"] else schema_name.removesuffix("_rows")
+
+
+def check_foreign_keys(tables):
+    """
+    Returns a list of violated relationships from TABLE_SCHEMAS["relationships"] (empty when consistent).
+    """
+    violations = []
+    for rel in TABLE_SCHEMAS["relationships"]:
+        left, right = tables[_table_name(rel["left_table"])], tables[_table_name(rel["right_table"])]
+        orphans = ~left[rel["left_column"]].dropna().isin(right[rel["right_column"]])
+        if orphans.any():
+            violations.append(f'{rel["left_table"]}.{rel["left_column"]} → {rel["right_table"]}.'
+                              f'{rel["right_column"]}: {int(orphans.sum())} orphan rows')
+    return violations
+
+
+def write_parquet(tables, directory):
+    """
+    Writes one <table>.parquet file per table into `directory`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, df in tables.items():
+        df.to_parquet(os.path.join(directory, f"{name}.parquet"), index=False)
+
+
+def copy_to_postgres(tables, connection, create_tables=False, truncate=False, chunk_rows=100_000):
+    """
+    Bulk-loads every table with COPY ... FROM STDIN (CSV), `chunk_rows` rows per COPY, in one transaction.
+    With `create_tables`, missing tables are created from the TABLE_SCHEMAS column types.
+    """
+    with connection.cursor() as cursor:
+        for name, df in tables.items():
+            columns = TABLE_SCHEMAS["tables"][name]["columns"]
+            if create_tables:
+                column_defs = ", ".join(f'"{col}" {sql_type}' for col, sql_type in columns.items())
+                cursor.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({column_defs})')
+            if truncate:
+                cursor.execute(f'TRUNCATE TABLE "{name}"')
+            column_list = ", ".join(f'"{col}"' for col in columns)
+            for start in range(0, len(df), chunk_rows):
+                buffer = io.StringIO()
+                df.iloc[start:start + chunk_rows].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY "{name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic reskilling data at a given scale.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale factor, e.g. 1, 10 or 100")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parquet", metavar="DIR", help="Write one parquet file per table into DIR")
+    parser.add_argument("--duckdb", metavar="PATH", help="Load the tables into a DuckDB file")
+    parser.add_argument("--postgres", action="store_true", help="COPY the tables into the DB_* Postgres database")
+    parser.add_argument("--create-tables", action="store_true", help="Create missing Postgres tables first")
+    parser.add_argument("--truncate", action="store_true", help="Empty the Postgres tables before loading")
+    args = parser.parse_args()
+    if not (args.parquet or args.duckdb or args.postgres):
+        parser.error("choose at least one output: --parquet, --duckdb or --postgres")
+
+    started = time.perf_counter()
+    tables = generate_tables(scale=args.scale, seed=args.seed)
+    violations = check_foreign_keys(tables)
+    if violations:
+        raise SystemExit("Generated data violates foreign keys:\n" + "\n".join(violations))
+    print(f"Generated {sum(len(df) for df in tables.values()):,} rows in {time.perf_counter() - started:.1f}s")
+    for name, df in tables.items():
+        print(f"  {name:36} {len(df):>12,}")
+
+    if args.parquet:
+        write_parquet(tables, args.parquet)
+        print(f"Wrote parquet files to {args.parquet}")
+    if args.duckdb:
+        load_duckdb(tables, args.duckdb)
+        print(f"Loaded DuckDB database {args.duckdb}")
+    if args.postgres:
+        connection = connect()
+        try:
+            copy_to_postgres(tables, connection, args.create_tables, args.truncate)
+        finally:
+            connection.close()
+        print("Copied tables into Postgres")
+
+
+if __name__ == "__main__":
+    main()
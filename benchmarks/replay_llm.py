@@ -0,0 +1,79 @@
+"""
+Deterministic stand-in for the OpenAI backend: answers every prompt from recorded responses,
+with a configurable simulated latency, so benchmarks never hit the network.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "llm_recordings.json")
+
+
+def load_recordings(path=FIXTURES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["recordings"]
+
+
+def classification_response(recording):
+    return (
+        f"Reasoning Type: {recording['reasoning_type']}\n"
+        f"Reasoning Justification: The question is answered by {recording['visualization_type'].lower()} data.\n"
+        f"Reasoning Path: [Question, Query, Aggregate, Answer]\n"
+        f"Visualization Type: {recording['visualization_type']}"
+    )
+
+
+def sql_response(recording):
+    if "nodes_sql" in recording:
+        return (f"1. Nodes SQL:\n```sql\n{recording['nodes_sql']}\n```\n\n"
+                f"2. Edges SQL:\n```sql\n{recording['edges_sql']}\n```")
+    return f"```sql\n{recording['sql']}\n```"
+
+
+def answer_response(recording):
+    return f"Final Answer:\n{recording['answer']}"
+
+
+class ReplayLLM:
+    """
+    Callable LLM backend. The prompt kind (classification, SQL or answer) is taken from the prompt text and the
+    recording from the quoted question inside it. Latency is `latency_ms` ± `jitter_ms` from a seeded RNG.
+    """
+
+    def __init__(self, recordings=None, latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.recordings = recordings if recordings is not None else load_recordings()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+        return self.respond(prompt)
+
+    def respond(self, prompt):
+        if "Given these" in prompt:
+            questions = re.findall(r'^\s*Question \d+: "(.*)"\s*$', prompt, flags=re.MULTILINE)
+            return "\n\n".join(f"### Question {i}\n{classification_response(self._find(q))}"
+                               for i, q in enumerate(questions, start=1))
+
+        recording = self._find(prompt)
+        if "Given this question" in prompt:
+            return classification_response(recording)
+        if "Nodes SQL" in prompt or "generating only SQL" in prompt:
+            return sql_response(recording)
+        return answer_response(recording)
+
+    def _find(self, text):
+        matches = [r for r in self.recordings if r["question"] in text]
+        if not matches:
+            raise KeyError(f"No recorded response for prompt: {text[:200]!r}")
+        return max(matches, key=lambda r: len(r["question"]))
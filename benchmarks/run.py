@@ -0,0 +1,240 @@
+"""
+End-to-end benchmark of run_reasoning_pipeline against local stand-ins: recorded LLM responses
+(benchmarks.replay_llm) and a seeded DuckDB database (benchmarks.datagen). Reports throughput,
+p50/p95/p99 latency and peak traced memory per visualization type and concurrency level, and
+compares them with a stored baseline.
+
+Absolute timings only compare on the machine (and with the settings) the baseline was recorded with, which is
+stored in the baseline under "_environment". When the current run differs, only error counts are checked;
+re-record the baseline on the reference machine with --update-baseline. Levels with more concurrent requests
+than CPUs mostly measure scheduling contention and vary a lot between runs, so they get a wider tolerance
+(--contended-tolerance); --repeat takes the median of several measurements.
+
+Needs the development requirements (pip install -r requirements-dev.txt) for DuckDB.
+
+Usage:
+    python -m benchmarks.run                      # run and print results
+    python -m benchmarks.run --check --repeat 3   # exit 1 if anything regressed past the tolerance
+    python -m benchmarks.run --update-baseline    # overwrite benchmarks/baseline.json
+    SPECULATIVE_SQL_ENABLED=true python -m benchmarks.run   # with speculative SQL generation (repeated questions hit)
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.datagen import generate_tables, load_duckdb
+from benchmarks.replay_llm import ReplayLLM, load_recordings
+from db.client import set_db_backend
+from llm.openai_client import set_llm_backend
+from services.analyzer import run_reasoning_pipeline
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Higher-is-worse metrics compared against the baseline (throughput is compared the other way)
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_request", "peak_memory_mb")
+ENVIRONMENT_KEY = "_environment"
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def measure(question, concurrency, requests):
+    """
+    Runs `requests` pipelines for one question at the given concurrency; returns throughput and latency percentiles.
+    """
+    def timed_run(_):
+        start = time.perf_counter()
+        result = run_reasoning_pipeline(question)
+        return time.perf_counter() - start, result.get("error")
+
+    started = time.perf_counter()
+    # Process CPU time is much less sensitive than wall time to queueing and to other load on the machine
+    cpu_started = time.process_time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed_run, range(requests)))
+    elapsed = time.perf_counter() - started
+    cpu_ms_per_request = (time.process_time() - cpu_started) * 1000 / requests
+
+    latencies_ms = [duration * 1000 for duration, _ in outcomes]
+    errors = [error for _, error in outcomes if error]
+    return {
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "cpu_ms_per_request": round(cpu_ms_per_request, 2),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None
+    }
+
+
+def measure_peak_memory(question, runs=3):
+    """
+    Peak Python heap allocated while running the pipeline sequentially, in MB (after one untraced warm-up run).
+    """
+    run_reasoning_pipeline(question)
+    tracemalloc.start()
+    try:
+        for _ in range(runs):
+            run_reasoning_pipeline(question)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024 / 1024, 2)
+
+
+def measure_median(question, concurrency, requests, repeat):
+    """
+    measure() `repeat` times; the median of each timing metric and the worst error count.
+    """
+    samples = [measure(question, concurrency, requests) for _ in range(repeat)]
+    combined = {name: round(statistics.median(sample[name] for sample in samples), 2)
+                for name in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_request")}
+    combined["errors"] = max(sample["errors"] for sample in samples)
+    combined["first_error"] = next((sample["first_error"] for sample in samples if sample["first_error"]), None)
+    return combined
+
+
+def run(concurrency_levels, requests, latency_ms, jitter_ms, scale, seed, repeat=1):
+    recordings = load_recordings()
+    set_llm_backend(ReplayLLM(recordings, latency_ms=latency_ms, jitter_ms=jitter_ms, seed=seed))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.duckdb")
+        load_duckdb(generate_tables(scale=scale, seed=seed), db_path)
+        set_db_backend("duckdb", db_path)
+        try:
+            results = {}
+            for recording in recordings:
+                peak_memory_mb = measure_peak_memory(recording["question"])
+                levels = {}
+                for concurrency in concurrency_levels:
+                    levels[str(concurrency)] = measure_median(recording["question"], concurrency, requests, repeat)
+                    levels[str(concurrency)]["peak_memory_mb"] = peak_memory_mb
+                results[recording["visualization_type"]] = levels
+        finally:
+            set_db_backend("postgres")
+            set_llm_backend(None)
+    return results
+
+
+def environment(args):
+    """
+    What the timings depend on: the machine, the interpreter and the benchmark settings.
+    """
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "scale": args.scale,
+        "seed": args.seed,
+        "repeat": args.repeat
+    }
+
+
+def compare(results, baseline, tolerance, timings=True, contended_tolerance=None):
+    """
+    Returns a list of human-readable regressions (metric worse than baseline by more than `tolerance`, or
+    `contended_tolerance` for concurrency levels above the CPU count). With timings=False only error counts are
+    compared.
+    """
+    regressions = []
+    for visualization_type, levels in results.items():
+        for concurrency, metrics in levels.items():
+            base = baseline.get(visualization_type, {}).get(concurrency)
+            if not base:
+                continue
+            label = f"{visualization_type} @ {concurrency}"
+            if metrics["errors"] > base.get("errors", 0):
+                regressions.append(f"{label}: errors {base.get('errors', 0)} → {metrics['errors']}")
+            if not timings:
+                continue
+            level_tolerance = tolerance
+            if contended_tolerance is not None and int(concurrency) > (os.cpu_count() or 1):
+                level_tolerance = max(tolerance, contended_tolerance)
+            if metrics["throughput_rps"] < base["throughput_rps"] * (1 - level_tolerance):
+                regressions.append(f"{label}: throughput_rps {base['throughput_rps']} → {metrics['throughput_rps']}")
+            for name in LATENCY_METRICS:
+                if name in base and metrics[name] > base[name] * (1 + level_tolerance):
+                    regressions.append(f"{label}: {name} {base[name]} → {metrics[name]}")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'visualization_type':32} {'conc':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'cpu ms':>8} {'peak MB':>8} {'errors':>6}")
+    for visualization_type, levels in results.items():
+        for concurrency, m in levels.items():
+            print(f"{visualization_type:32} {concurrency:>4} {m['throughput_rps']:8.2f} {m['p50_ms']:9.2f} "
+                  f"{m['p95_ms']:9.2f} {m['p99_ms']:9.2f} {m['cpu_ms_per_request']:8.2f} {m['peak_memory_mb']:8.2f} "
+                  f"{m['errors']:6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic end-to-end pipeline benchmark.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="Pipeline runs per question and concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated LLM latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--scale", type=float, default=1.0, help="Data scale factor for the generated database")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON to this path")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression, e.g. 0.2 = 20%%")
+    parser.add_argument("--contended-tolerance", type=float, default=0.6,
+                        help="Allowed relative regression for concurrency levels above the CPU count")
+    parser.add_argument("--repeat", type=int, default=1, help="Measurements per level; the median is reported")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.concurrency, args.requests, args.latency_ms, args.jitter_ms, args.scale, args.seed,
+                  max(1, args.repeat))
+    print_results(results)
+    current_environment = environment(args)
+
+    for path in filter(None, [args.output, args.baseline if args.update_baseline else None]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({ENVIRONMENT_KEY: current_environment, **results}, f, indent=2)
+    if args.update_baseline:
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --update-baseline to create one.")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    baseline_environment = baseline.pop(ENVIRONMENT_KEY, {})
+    differences = {key: (baseline_environment.get(key), value) for key, value in current_environment.items()
+                   if baseline_environment.get(key) != value}
+    for key, (recorded, current) in differences.items():
+        print(f"Environment differs from the baseline: {key} {recorded!r} → {current!r}")
+    if differences:
+        print("Timings are not comparable with this baseline; checking error counts only.")
+    regressions = compare(results, baseline, args.tolerance, timings=not differences,
+                          contended_tolerance=args.contended_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline.")
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# db/aggregates.py
+"""
+Pre-aggregated summary tables for the most common question shapes.
+
+Each summary table is defined by the SELECT that builds it. Tables with a `watermark_column` are refreshed
+incrementally: only the time buckets at or after the last seen watermark are recomputed (the source is treated
+as an append-mostly log). The others are small and are rebuilt in full. When AGGREGATES_ENABLED is set, the
+tables are advertised to the LLM as first-class tables next to TABLE_SCHEMAS.
+
+Usage:
+    python -m db.aggregates            # create missing tables and refresh them
+    python -m db.aggregates --full     # rebuild every table from scratch
+"""
+import argparse
+import copy
+import functools
+import logging
+import os
+import threading
+import time
+
+from db.schemas import TABLE_SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+# Advertise the summary tables in the SQL prompts (only once they exist and are being refreshed)
+AGGREGATES_ENABLED = os.getenv("AGGREGATES_ENABLED", "false").lower() == "true"
+# Background refresh interval in the API process; 0 disables the scheduler
+AGGREGATES_REFRESH_SECONDS = float(os.getenv("AGGREGATES_REFRESH_SECONDS", "0"))
+# Arbitrary key for pg_try_advisory_lock, so only one worker refreshes at a time
+AGGREGATES_LOCK_KEY = 4_210_739
+
+STATE_TABLE = "aggregate_refresh_state"
+
+AGGREGATES = {
+    "agg_industry_automation": {
+        "description": "Automation risk per industry and year (fact_industry_automation_rows joined to dim_industry).",
+        "columns": {
+            "year": "INT8",
+            "industry_code": "INT8",
+            "industry_name": "VARCHAR(500)",
+            "sector": "VARCHAR(500)",
+            "avg_probability_of_automation": "FLOAT8",
+            "low_risk": "INT8",
+            "medium_risk": "INT8",
+            "high_risk": "INT8"
+        },
+        "foreign_keys": {"industry_code": "dim_industry.industry_code"},
+        "sql": """SELECT fiar.year, fiar.industry_code, di.industry_name, di.sector,
+       AVG(fiar.probability_of_automation) AS avg_probability_of_automation,
+       SUM(fiar.low_risk) AS low_risk, SUM(fiar.medium_risk) AS medium_risk, SUM(fiar.high_risk) AS high_risk
+FROM fact_industry_automation_rows fiar
+JOIN dim_industry di ON fiar.industry_code = di.industry_code
+GROUP BY fiar.year, fiar.industry_code, di.industry_name, di.sector"""
+    },
+    "agg_region_automation": {
+        "description": "Automation risk per region and year (fact_geographic_automation_rows joined to dim_local_authority).",
+        "columns": {
+            "year": "INT8",
+            "region_id": "INT4",
+            "region_name": "VARCHAR(50)",
+            "local_authority_count": "INT8",
+            "avg_probability_of_automation": "FLOAT8",
+            "low_risk": "INT8",
+            "medium_risk": "INT8",
+            "high_risk": "INT8"
+        },
+        "sql": """SELECT fgar.year, dla.region_id, dla.region_name,
+       COUNT(DISTINCT fgar.local_authority_code) AS local_authority_count,
+       AVG(fgar.probability_of_automation) AS avg_probability_of_automation,
+       SUM(fgar.low_risk) AS low_risk, SUM(fgar.medium_risk) AS medium_risk, SUM(fgar.high_risk) AS high_risk
+FROM fact_geographic_automation_rows fgar
+JOIN dim_local_authority dla ON fgar.local_authority_code = dla.local_authority_code
+GROUP BY fgar.year, dla.region_id, dla.region_name"""
+    },
+    "agg_occupation_risk": {
+        "description": "Employees and automation probability per occupation (employee_profile joined to job_risk).",
+        "columns": {
+            "soc_code": "INT8",
+            "job_title": "TEXT",
+            "industry_code": "INT8",
+            "employee_count": "INT8",
+            "automation_probability": "FLOAT8"
+        },
+        "foreign_keys": {"soc_code": "dim_occupation.soc_code", "industry_code": "dim_industry.industry_code"},
+        "sql": """SELECT ep.soc_code, jr.job_title, ep.industry_code,
+       COUNT(*) AS employee_count, MAX(jr.automation_probability) AS automation_probability
+FROM employee_profile ep
+JOIN job_risk jr ON ep.soc_code = jr.soc_code
+GROUP BY ep.soc_code, jr.job_title, ep.industry_code"""
+    },
+    "agg_skill_events_monthly": {
+        "description": "Reskilling events per month, skill category and completion status (from workforce_reskilling_events).",
+        "columns": {
+            "month": "DATE",
+            "skill_category": "TEXT",
+            "completion_status": "TEXT",
+            "event_count": "INT8",
+            "case_count": "INT8",
+            "avg_score": "FLOAT8"
+        },
+        "source": "workforce_reskilling_events",
+        "watermark_column": "timestamp",
+        "bucket_column": "month",
+        "sql": """SELECT CAST(DATE_TRUNC('month', wre."timestamp") AS DATE) AS month, wre.skill_category,
+       wre.completion_status, COUNT(*) AS event_count, COUNT(DISTINCT wre.case_id) AS case_count,
+       AVG(wre.score) AS avg_score
+FROM workforce_reskilling_events wre
+WHERE wre."timestamp" IS NOT NULL {since}
+GROUP BY 1, wre.skill_category, wre.completion_status"""
+    }
+}
+
+
+@functools.lru_cache(maxsize=1)
+def prompt_schemas():
+    """
+    The schema shown to the LLM: TABLE_SCHEMAS plus, when AGGREGATES_ENABLED, the summary tables.
+    Built once per process; treat the result as read-only.
+    """
+    if not AGGREGATES_ENABLED:
+        return TABLE_SCHEMAS
+    schemas = copy.deepcopy(TABLE_SCHEMAS)
+    for name, aggregate in AGGREGATES.items():
+        schemas["tables"][name] = {
+            "description": aggregate["description"] + " Prefer this pre-aggregated table when it can answer the question.",
+            "columns": aggregate["columns"],
+            **({"foreign_keys": aggregate["foreign_keys"]} if "foreign_keys" in aggregate else {})
+        }
+    return schemas
+
+
+def create_tables(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+                       f"(name TEXT PRIMARY KEY, watermark TIMESTAMP, refreshed_at TIMESTAMP)")
+        for name, aggregate in AGGREGATES.items():
+            column_defs = ", ".join(f'"{col}" {sql_type}' for col, sql_type in aggregate["columns"].items())
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {name} ({column_defs})')
+    connection.commit()
+
+
+def _timestamp_literal(value):
+    return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+
+
+def refresh_aggregate(connection, name, full=False):
+    """
+    Refreshes one summary table in its own transaction; returns "full", "incremental" or "unchanged".
+    """
+    aggregate = AGGREGATES[name]
+    column_list = ", ".join(f'"{col}"' for col in aggregate["columns"])
+    watermark_column = aggregate.get("watermark_column")
+    with connection.cursor() as cursor:
+        if watermark_column is None:
+            cursor.execute(f"DELETE FROM {name}")
+            cursor.execute(f"INSERT INTO {name} ({column_list}) {aggregate['sql']}")
+            mode, new_watermark = "full", None
+        else:
+            cursor.execute(f"SELECT watermark FROM {STATE_TABLE} WHERE name = '{name}'")
+            row = cursor.fetchone()
+            watermark = None if full or row is None else row[0]
+            cursor.execute(f'SELECT MAX("{watermark_column}") FROM {aggregate["source"]}')
+            new_watermark = cursor.fetchone()[0]
+            if watermark is not None and new_watermark is not None and new_watermark <= watermark:
+                mode = "unchanged"
+            elif watermark is None:
+                cursor.execute(f"DELETE FROM {name}")
+                cursor.execute(f"INSERT INTO {name} ({column_list}) {aggregate['sql'].format(since='')}")
+                mode = "full"
+            else:
+                # Recompute every bucket from the one holding the old watermark onwards
+                bucket_start = f"DATE_TRUNC('month', {_timestamp_literal(watermark)})"
+                since = f'AND "{watermark_column}" >= {bucket_start}'
+                cursor.execute(f'DELETE FROM {name} WHERE "{aggregate["bucket_column"]}" >= {bucket_start}')
+                cursor.execute(f"INSERT INTO {name} ({column_list}) {aggregate['sql'].format(since=since)}")
+                mode = "incremental"
+        if mode != "unchanged":
+            watermark_sql = _timestamp_literal(new_watermark) if new_watermark is not None else "NULL"
+            cursor.execute(f"DELETE FROM {STATE_TABLE} WHERE name = '{name}'")
+            cursor.execute(f"INSERT INTO {STATE_TABLE} (name, watermark, refreshed_at) "
+                           f"VALUES ('{name}', {watermark_sql}, CURRENT_TIMESTAMP)")
+    connection.commit()
+    return mode
+
+
+def refresh_all(connection, full=False, lock=True):
+    """
+    Refreshes every summary table. With `lock`, a Postgres advisory lock makes concurrent callers skip the run.
+    Returns {name: mode}, or None when another process holds the lock.
+    """
+    if lock:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT pg_try_advisory_lock({AGGREGATES_LOCK_KEY})")
+            if not cursor.fetchone()[0]:
+                logger.info("Aggregate refresh already running elsewhere; skipping")
+                return None
+    try:
+        results = {}
+        for name in AGGREGATES:
+            started = time.perf_counter()
+            try:
+                results[name] = refresh_aggregate(connection, name, full)
+            except Exception as e:
+                connection.rollback()
+                results[name] = "failed"
+                logger.error("Aggregate refresh failed", extra={"aggregate": name, "error": str(e)})
+                continue
+            logger.info("Aggregate refreshed", extra={
+                "aggregate": name, "mode": results[name],
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+            })
+        return results
+    finally:
+        if lock:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT pg_advisory_unlock({AGGREGATES_LOCK_KEY})")
+            connection.commit()
+
+
+_scheduler_thread = None
+
+
+def start_refresh_scheduler(interval=None):
+    """
+    Starts a daemon thread that refreshes the summary tables every `interval` seconds (AGGREGATES_REFRESH_SECONDS).
+    """
+    global _scheduler_thread
+    interval = interval or AGGREGATES_REFRESH_SECONDS
+    if interval <= 0 or _scheduler_thread is not None:
+        return
+    _scheduler_thread = threading.Thread(target=_refresh_loop, args=(interval,), name="aggregate-refresh",
+                                         daemon=True)
+    _scheduler_thread.start()
+
+
+def _refresh_loop(interval):
+    from db.client import connect
+
+    while True:
+        connection = None
+        try:
+            connection = connect()
+            create_tables(connection)
+            refresh_all(connection)
+        except Exception as e:
+            logger.error("Aggregate refresh run failed", extra={"error": str(e)})
+        finally:
+            if connection is not None:
+                connection.close()
+        time.sleep(interval)
+
+
+def main():
+    from db.client import connect
+
+    parser = argparse.ArgumentParser(description="Create and refresh the pre-aggregated summary tables.")
+    parser.add_argument("--full", action="store_true", help="Rebuild every table instead of refreshing incrementally")
+    args = parser.parse_args()
+
+    connection = connect()
+    try:
+        create_tables(connection)
+        for name, mode in (refresh_all(connection, full=args.full) or {}).items():
+            print(f"{name:28} {mode}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,246 @@
+import logging
 import os
+import threading
+import time
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import pandas as pd
+
+from db.queries import strip_sql
+from db.prepared import prepared_statement, forget_prepared_statements
+from db.query_log import log_query
+from utils.cache import shared_cached
+from utils.cancellation import current_token, RequestCancelled
+from utils.memo import memoized, memo_active
+from utils.metrics import DB_QUERY_SECONDS, DB_ROWS, DB_ERRORS, DB_REJECTED
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# "postgres" (default) or "duckdb" — a local DuckDB file used as a stand-in by the benchmarks
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+DB_PATH = os.getenv("DB_PATH")
+DB_SSLMODE = os.getenv("DB_SSLMODE", "require")
+
+# Per-query execution limits for generated SQL
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "30000"))
+# Pre-flight EXPLAIN limits; 0 disables the check. Queries over SQL_MAX_COST are rejected, queries only over
+# SQL_MAX_ROWS (estimated) are rewritten with a LIMIT.
+SQL_MAX_COST = float(os.getenv("SQL_MAX_COST", "5000000"))
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "1000000"))
+
+_duckdb_local = threading.local()
+_router = None
+_router_lock = threading.Lock()
+
+
+class QueryRejectedError(Exception):
+    """
+    Raised when a generated query is refused by the cost guard or cancelled by the statement timeout.
+    `reason` is written for the LLM, so it can be fed back into a repair prompt.
+    """
+
+    def __init__(self, reason, cost=None, rows=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.cost = cost
+        self.rows = rows
+
+
+def set_db_backend(backend, path=None):
+    """
+    Switches the query backend at runtime ("postgres" or "duckdb" with a database file path).
+    """
+    global DB_BACKEND, DB_PATH
+    if backend not in ("postgres", "duckdb"):
+        raise ValueError(f"Unknown DB backend '{backend}'")
+    DB_BACKEND, DB_PATH = backend, path
+
+
+def connect():
+    """
+    Opens a new Postgres connection from the DB_* environment variables.
+    """
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASS"),
+        port=os.getenv("DB_PORT"),
+        sslmode=DB_SSLMODE
+    )
+
+
+def get_router():
+    """
+    The process-wide read router over the primary (DB_HOST) and the read replicas (DB_REPLICA_HOSTS).
+    """
+    global _router
+    from db.routing import build_router
+
+    with _router_lock:
+        if _router is None:
+            _router = build_router({
+                "database": os.getenv("DB_NAME"),
+                "user": os.getenv("DB_USER"),
+                "password": os.getenv("DB_PASS"),
+                "sslmode": DB_SSLMODE
+            })
+        return _router
+
+
+def warm_up_pools():
+    """
+    Opens the router's connection pools now rather than on the first query.
+    Raises when the primary cannot be reached (replicas that fail are only marked unhealthy).
+    """
+    if DB_BACKEND != "postgres":
+        return
+    router = get_router()
+    router.check_all()
+    router.start_health_checks()
+    if not router.primary.healthy:
+        raise ConnectionError(f"Primary database {router.primary.name} is unreachable: {router.primary.last_error}")
+
+
+def close_router():
+    """
+    Closes every pooled connection; the next query builds a new router.
+    """
+    global _router
+    with _router_lock:
+        if _router is not None:
+            _router.close()
+            _router = None
 
 
 def run_sql_query_postgres(query):
-    connection = None  # Initialize connection as None
-    cursor = None
+    """
+    Runs the query and returns the result as a DataFrame.
+    Identical queries within a batch (see utils.memo) are executed only once; each caller gets its own copy.
+    Results are shared across worker processes when the shared cache is on (see utils.cache).
+    """
+    with span("run_sql_query_postgres") as query_span:
+        df = memoized("sql", query, lambda: shared_cached("sql", f"{DB_BACKEND}:{DB_PATH}:{query}",
+                                                          lambda: _execute(query)))
+        query_span.set_attribute("rows", len(df))
+    return df.copy() if memo_active() else df
+
+
+def _execute(query):
+    started = time.perf_counter()
+    if DB_BACKEND == "duckdb":
+        df = _execute_query_duckdb(query)
+    else:
+        df = _execute_query(query)
+    log_query(query, time.perf_counter() - started, len(df))
+    return df
+
+
+def _execute_query_duckdb(query):
+    import duckdb
+
+    # One read-only connection per thread and database file
+    connection = getattr(_duckdb_local, "connection", None)
+    if connection is None or getattr(_duckdb_local, "path", None) != DB_PATH:
+        connection = duckdb.connect(DB_PATH, read_only=True)
+        _duckdb_local.connection, _duckdb_local.path = connection, DB_PATH
+    token = current_token()
+    try:
+        with DB_QUERY_SECONDS.time(), token.on_cancel(connection.interrupt):
+            df = connection.execute(query).fetchdf()
+        DB_ROWS.inc(len(df))
+        return df
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        if token.cancelled:
+            raise RequestCancelled("The request was abandoned; its query was interrupted") from e
+        DB_ERRORS.inc()
+        logger.error("Error executing query", extra={"error": str(e)})
+        raise e
+
+
+def guard_query(cursor, query, statement=None):
+    """
+    Runs EXPLAIN (without ANALYZE) on `statement` (the SQL about to run, e.g. an EXECUTE of a prepared statement;
+    defaults to `query`) and returns what to execute: `statement` unchanged, or `query` wrapped in a LIMIT when
+    only the estimated row count is too high. Raises QueryRejectedError when the estimated cost is too high.
+    """
+    statement = statement or strip_sql(query)
+    if not SQL_MAX_COST and not SQL_MAX_ROWS:
+        return statement
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}")
+    plan = cursor.fetchone()["QUERY PLAN"][0]["Plan"]
+    cost, rows = plan["Total Cost"], plan["Plan Rows"]
+    if SQL_MAX_COST and cost > SQL_MAX_COST:
+        DB_REJECTED.labels(reason="cost").inc()
+        raise QueryRejectedError(
+            f"The query's estimated cost ({cost:,.0f}) exceeds the limit ({SQL_MAX_COST:,.0f}), "
+            f"with about {rows:,} estimated rows. Avoid cross joins and unfiltered joins on large tables "
+            f"such as workforce_reskilling_events, and aggregate before joining.", cost, rows)
+    if SQL_MAX_ROWS and rows > SQL_MAX_ROWS:
+        DB_REJECTED.labels(reason="rows").inc()
+        logger.warning("Query rewritten with a row limit", extra={"estimated_rows": rows, "cost": cost})
+        return f"SELECT * FROM (\n{strip_sql(query)}\n) AS guarded_q\nLIMIT {SQL_MAX_ROWS}"
+    return statement
+
+
+def _execute_query(query):
+    import pandas as pd
 
     try:
-        connection = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            port=os.getenv("DB_PORT"),
-            sslmode="require"
-        )
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(query)
-        records = cursor.fetchall()
+        records = get_router().run_read(lambda connection: _run_read_query(connection, query))
+        DB_ROWS.inc(len(records))
 
         # Convert to DataFrame
         df = pd.DataFrame(records)
         return df
 
+    except QueryRejectedError as e:
+        logger.warning("Query rejected", extra={"reason": e.reason})
+        raise e
+
+    except RequestCancelled as e:
+        logger.info("Query cancelled", extra={"reason": str(e)})
+        raise e
+
     except Exception as e:
-        print(f"Error executing query: {e}")
+        DB_ERRORS.inc()
+        logger.error("Error executing query", extra={"error": str(e)})
         raise e
 
-    finally:
-        # Safely close cursor and connection if they were opened
-        if cursor is not None:
-            cursor.close()
-        if connection is not None:
-            connection.close()
+
+def _run_read_query(connection, query):
+    # An abandoned request cancels its running statement server-side (what pg_cancel_backend does)
+    with current_token().on_cancel(connection.cancel):
+        return _run_guarded_query(connection, query)
+
+
+def _run_guarded_query(connection, query):
+    # Generated SQL only ever reads, and never for longer than the statement timeout
+    connection.set_session(readonly=True)
+    try:
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(f"SET LOCAL statement_timeout = {SQL_STATEMENT_TIMEOUT_MS}")
+            statement = guard_query(cursor, query, prepared_statement(connection, cursor, query))
+            with DB_QUERY_SECONDS.time():
+                cursor.execute(statement)
+                return cursor.fetchall()
+    except psycopg2.errors.InvalidSqlStatementName:
+        # The server dropped our prepared statements (e.g. DISCARD ALL from a pooler): forget them and retry plain
+        forget_prepared_statements(connection)
+        connection.rollback()
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(f"SET LOCAL statement_timeout = {SQL_STATEMENT_TIMEOUT_MS}")
+            with DB_QUERY_SECONDS.time():
+                cursor.execute(guard_query(cursor, query))
+                return cursor.fetchall()
+    except psycopg2.errors.QueryCanceled as e:
+        if current_token().cancelled:
+            raise RequestCancelled("The request was abandoned; its query was cancelled") from e
+        DB_ERRORS.inc()
+        DB_REJECTED.labels(reason="timeout").inc()
+        logger.warning("Query cancelled by statement timeout", extra={"timeout_ms": SQL_STATEMENT_TIMEOUT_MS})
+        raise QueryRejectedError(
+            f"The query was cancelled after the {SQL_STATEMENT_TIMEOUT_MS} ms statement timeout. "
+            f"Filter earlier, aggregate before joining, and avoid joins that multiply rows.") from e
@@ -0,0 +1,400 @@
+# db/index_advisor.py
+"""
+Index advisor for the LLM-generated SQL recorded by db.query_log.
+
+Groups the logged queries by shape, runs EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) on the most expensive
+ones inside a read-only transaction, and aggregates the sequential scans per table: which columns they filter
+on (equality, range, IS NOT NULL, constant predicates), which columns they return and which columns are used as
+join and sort keys. From that it recommends b-tree indexes (composite, covering via INCLUDE, or partial via WHERE)
+and writes a report plus migration SQL.
+
+Usage:
+    SQL_LOG_PATH=sql_log.jsonl uvicorn main:app ...          # collect SQL
+    python -m db.index_advisor sql_log.jsonl --report index_report.md --migration add_indexes.sql [--apply]
+"""
+import argparse
+import logging
+import re
+from collections import Counter, defaultdict
+
+from db.query_log import read_query_log
+from db.schemas import TABLE_SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+# Tables smaller than this (rows scanned per loop) are cheaper to scan than to index
+MIN_TABLE_ROWS = 10_000
+# Filters must discard at least this share of the scanned rows to be worth an index
+MIN_SELECTIVITY = 0.5
+# Upper bounds for composite keys and INCLUDE lists
+MAX_KEY_COLUMNS = 3
+MAX_INCLUDE_COLUMNS = 4
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PREDICATE = re.compile(
+    r"""\(*(?:"?(?P<alias>\w+)"?\.)?"?(?P<column>[A-Za-z_]\w*)"?\)?(?:::[\w ]+(?:\(\d+\))?)?\s*"""
+    r"""(?P<op>IS\ NOT\ NULL|IS\ NULL|=\ ANY|<>|<=|>=|=|<|>|!?~~\*?)"""
+    r"""\s*(?P<value>'(?:[^']|'')*'|-?\d+(?:\.\d+)?)?""",
+    re.VERBOSE
+)
+_JOIN_EQUALITY = re.compile(
+    r"""\(*"?(?P<left_alias>\w+)"?\."?(?P<left>\w+)"?\)?(?:::[\w ]+)?\s*=\s*"""
+    r"""\(*"?(?P<right_alias>\w+)"?\."?(?P<right>\w+)"?\)?"""
+)
+_COLUMN_REF = re.compile(r"""^(?:"?(?P<alias>\w+)"?\.)?"?(?P<column>\w+)"?$""")
+_RANGE_OPS = {"<", ">", "<=", ">="}
+_EQUALITY_OPS = {"=", "= ANY"}
+
+
+def fingerprint(sql):
+    """
+    Normalises a query so that runs differing only in literals or whitespace group together.
+    """
+    normalised = _NUMBER_LITERAL.sub("?", _STRING_LITERAL.sub("?", sql))
+    return " ".join(normalised.split()).lower()
+
+
+def select_sample(entries, sample_size):
+    """
+    Groups logged queries by fingerprint and returns the `sample_size` groups with the highest total duration,
+    as dicts with the latest SQL text, the number of executions and the total logged time.
+    """
+    groups = {}
+    for entry in entries:
+        sql = entry.get("sql")
+        if not sql:
+            continue
+        group = groups.setdefault(fingerprint(sql), {"sql": sql, "count": 0, "total_ms": 0.0})
+        group["sql"] = sql
+        group["count"] += 1
+        group["total_ms"] += entry.get("duration_ms") or 0.0
+    return sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)[:sample_size]
+
+
+def explain(connection, sql, timeout_ms=30_000):
+    """
+    Runs EXPLAIN ANALYZE for one query in a read-only, rolled-back transaction and returns the root plan node.
+    """
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) {sql.strip().rstrip(';')}")
+            result = cursor.fetchone()[0]
+        finally:
+            connection.rollback()
+    return result[0]["Plan"]
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def _table_columns(table):
+    return TABLE_SCHEMAS["tables"].get(table, {}).get("columns", {})
+
+
+def _column_of(alias, column, aliases, default_table):
+    """
+    Resolves an (alias, column) reference to (table, column), or None if it is not a known schema column.
+    """
+    table = aliases.get(alias, default_table) if alias else default_table
+    if table is None or column not in _table_columns(table):
+        return None
+    return table, column
+
+
+def parse_predicates(condition, aliases, default_table=None):
+    """
+    Extracts simple column predicates from a plan Filter/Index Cond string.
+    Returns a list of (table, column, op, literal or None).
+    """
+    predicates = []
+    for match in _PREDICATE.finditer(condition or ""):
+        resolved = _column_of(match.group("alias"), match.group("column"), aliases, default_table)
+        if resolved:
+            predicates.append((*resolved, match.group("op"), match.group("value")))
+    return predicates
+
+
+def parse_join_columns(condition, aliases):
+    """
+    Returns the (table, column) pairs on both sides of equality join conditions.
+    """
+    columns = []
+    for match in _JOIN_EQUALITY.finditer(condition or ""):
+        for alias, column in ((match.group("left_alias"), match.group("left")),
+                              (match.group("right_alias"), match.group("right"))):
+            resolved = _column_of(alias, column, aliases, None)
+            if resolved:
+                columns.append(resolved)
+    return columns
+
+
+def _output_columns(node, aliases, table):
+    columns = set()
+    for expression in node.get("Output", []):
+        match = _COLUMN_REF.match(expression.strip())
+        if match:
+            resolved = _column_of(match.group("alias"), match.group("column"), aliases, table)
+            if resolved:
+                columns.add(resolved[1])
+    return columns
+
+
+def scan_patterns(plan, sql_count=1):
+    """
+    Returns (scans, join_columns, sort_columns) for one plan:
+    one dict per sequential scan with its filter predicates, output columns, rows and time,
+    plus Counters of the join and sort (table, column) keys weighted by `sql_count`.
+    """
+    nodes = list(walk(plan))
+    aliases = {node["Alias"]: node["Relation Name"] for node in nodes if "Relation Name" in node and "Alias" in node}
+    scans, join_columns, sort_columns = [], Counter(), Counter()
+
+    for node in nodes:
+        node_type = node.get("Node Type")
+        if node_type == "Seq Scan" and node.get("Relation Name") in TABLE_SCHEMAS["tables"]:
+            table = node["Relation Name"]
+            loops = node.get("Actual Loops", 1) or 1
+            rows = node.get("Actual Rows", 0) * loops
+            removed = node.get("Rows Removed by Filter", 0) * loops
+            scans.append({
+                "table": table,
+                "predicates": parse_predicates(node.get("Filter"), aliases, table),
+                "output": _output_columns(node, aliases, table),
+                "rows": rows,
+                "rows_scanned_per_loop": (rows + removed) / loops,
+                "rows_removed": removed,
+                "blocks": node.get("Shared Hit Blocks", 0) + node.get("Shared Read Blocks", 0),
+                "time_ms": node.get("Actual Total Time", 0.0) * loops,
+                "weight": sql_count
+            })
+        for key in ("Hash Cond", "Merge Cond", "Join Filter"):
+            for column in parse_join_columns(node.get(key), aliases):
+                join_columns[column] += sql_count
+        for expression in node.get("Sort Key", []):
+            match = _COLUMN_REF.match(expression.split(" ")[0].strip())
+            if match:
+                resolved = _column_of(match.group("alias"), match.group("column"), aliases, None)
+                if resolved:
+                    sort_columns[resolved] += sql_count
+    return scans, join_columns, sort_columns
+
+
+def recommend(scans, join_columns, sort_columns, existing_indexes=None):
+    """
+    Turns the collected sequential scans into index recommendations, most expensive first.
+    Each recommendation is a dict with table, columns, include, where, reason and the scan time it targets.
+    """
+    existing_indexes = existing_indexes or {}
+    candidates = {}
+
+    for scan in scans:
+        table, predicates = scan["table"], scan["predicates"]
+        scanned = scan["rows"] + scan["rows_removed"]
+        if not predicates or scan["rows_scanned_per_loop"] < MIN_TABLE_ROWS:
+            continue
+        if scanned and scan["rows_removed"] / scanned < MIN_SELECTIVITY:
+            continue
+
+        equality = [(col, value) for _, col, op, value in predicates if op in _EQUALITY_OPS]
+        ranges = [col for _, col, op, _ in predicates if op in _RANGE_OPS]
+        not_null = [col for _, col, op, _ in predicates if op == "IS NOT NULL"]
+
+        # A single constant equality predicate (e.g. completion_status = 'Failed') becomes a partial index
+        where = []
+        key = []
+        for col, value in equality:
+            if value is not None and len(equality) == 1 and ranges:
+                where.append(f'"{col}" = {value}')
+            elif col not in key:
+                key.append(col)
+        for col in ranges:
+            if col not in key:
+                key.append(col)
+        where += [f'"{col}" IS NOT NULL' for col in not_null if col not in key]
+        if not key and not_null:
+            key = [not_null[0]]
+            where.remove(f'"{not_null[0]}" IS NOT NULL')
+        if not key:
+            continue
+        key = key[:MAX_KEY_COLUMNS]
+
+        include = sorted(scan["output"] - set(key))
+        include = include if len(include) <= MAX_INCLUDE_COLUMNS else []
+
+        signature = (table, tuple(key), tuple(sorted(where)))
+        candidate = candidates.setdefault(signature, {
+            "table": table, "columns": key, "include": set(), "where": sorted(where),
+            "scan_time_ms": 0.0, "queries": 0, "kind": "filter"
+        })
+        candidate["include"] |= set(include)
+        candidate["scan_time_ms"] += scan["time_ms"] * scan["weight"]
+        candidate["queries"] += scan["weight"]
+
+    # Join and sort keys on large tables that are only ever sequentially scanned
+    large_scanned = {scan["table"] for scan in scans if scan["rows_scanned_per_loop"] >= MIN_TABLE_ROWS}
+    for kind, counter in (("join", join_columns), ("sort", sort_columns)):
+        for (table, column), count in counter.most_common():
+            signature = (table, (column,), ())
+            if table not in large_scanned or signature in candidates:
+                continue
+            candidates[signature] = {
+                "table": table, "columns": [column], "include": set(), "where": [],
+                "scan_time_ms": sum(s["time_ms"] * s["weight"] for s in scans if s["table"] == table),
+                "queries": count, "kind": kind
+            }
+
+    recommendations = []
+    for candidate in candidates.values():
+        if _covered_by_existing(candidate, existing_indexes.get(candidate["table"], [])):
+            continue
+        if len(candidate["include"]) > MAX_INCLUDE_COLUMNS:
+            candidate["include"] = set()
+        candidate["include"] = sorted(candidate["include"])
+        candidate["reason"] = _reason(candidate)
+        recommendations.append(candidate)
+    return sorted(recommendations, key=lambda c: c["scan_time_ms"], reverse=True)
+
+
+def _covered_by_existing(candidate, index_key_lists):
+    key = candidate["columns"]
+    return any(existing[:len(key)] == key for existing in index_key_lists)
+
+
+def _reason(candidate):
+    detail = {
+        "filter": "filtered sequential scans",
+        "join": "join key of a sequentially scanned table",
+        "sort": "sort key of a sequentially scanned table"
+    }[candidate["kind"]]
+    return (f"{detail} in {candidate['queries']} logged queries, "
+            f"{candidate['scan_time_ms']:.1f} ms of scan time in the sample")
+
+
+def index_name(candidate):
+    suffix = "_partial" if candidate["where"] else ""
+    return f"ix_{candidate['table']}_{'_'.join(candidate['columns'])}{suffix}"[:63]
+
+
+def index_sql(candidate):
+    columns = ", ".join(f'"{col}"' for col in candidate["columns"])
+    sql = f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(candidate)} ON "{candidate["table"]}" ({columns})'
+    if candidate["include"]:
+        sql += f' INCLUDE ({", ".join(chr(34) + col + chr(34) for col in candidate["include"])})'
+    if candidate["where"]:
+        sql += f' WHERE {" AND ".join(candidate["where"])}'
+    return sql + ";"
+
+
+def existing_index_keys(connection):
+    """
+    Returns {table: [[key columns], ...]} for the b-tree indexes in the current schema.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT tablename, indexdef FROM pg_indexes WHERE schemaname = current_schema()")
+        rows = cursor.fetchall()
+    connection.rollback()
+    indexes = defaultdict(list)
+    for table, definition in rows:
+        match = re.search(r"USING btree \(([^)]*)\)", definition)
+        if match:
+            indexes[table].append([col.strip().strip('"').split(" ")[0] for col in match.group(1).split(",")])
+    return indexes
+
+
+def build_report(total_queries, sample, scans, recommendations, failures):
+    lines = ["# Index advisor report", "",
+             f"- Logged queries: {total_queries}",
+             f"- Distinct query shapes explained: {len(sample)} ({len(failures)} failed)", "",
+             "## Sequential scans per table", "",
+             "| table | scans | rows removed by filter | buffers | scan time (ms) | filter columns |",
+             "|---|---|---|---|---|---|"]
+    per_table = defaultdict(lambda: {"scans": 0, "removed": 0, "blocks": 0, "time": 0.0, "columns": Counter()})
+    for scan in scans:
+        stats = per_table[scan["table"]]
+        stats["scans"] += scan["weight"]
+        stats["removed"] += scan["rows_removed"] * scan["weight"]
+        stats["blocks"] += scan["blocks"] * scan["weight"]
+        stats["time"] += scan["time_ms"] * scan["weight"]
+        for _, column, op, _ in scan["predicates"]:
+            stats["columns"][f"{column} {op}"] += scan["weight"]
+    for table, stats in sorted(per_table.items(), key=lambda item: item[1]["time"], reverse=True):
+        columns = ", ".join(f"{name} ×{count}" for name, count in stats["columns"].most_common(5))
+        lines.append(f"| {table} | {stats['scans']} | {stats['removed']:,} | {stats['blocks']:,} | "
+                     f"{stats['time']:.1f} | {columns} |")
+
+    lines += ["", "## Recommendations", ""]
+    if not recommendations:
+        lines.append("No index recommendations.")
+    for candidate in recommendations:
+        lines += [f"- `{index_sql(candidate)}`", f"  - {candidate['reason']}"]
+
+    if failures:
+        lines += ["", "## Queries that could not be explained", ""]
+        lines += [f"- {error}: `{' '.join(sql.split())[:200]}`" for sql, error in failures]
+    return "\n".join(lines) + "\n"
+
+
+def advise(connection, log_path, sample_size=50, timeout_ms=30_000):
+    """
+    Runs the whole analysis; returns (report text, recommendations).
+    """
+    entries = list(read_query_log(log_path))
+    sample = select_sample(entries, sample_size)
+    scans, join_columns, sort_columns, failures = [], Counter(), Counter(), []
+    for group in sample:
+        try:
+            plan = explain(connection, group["sql"], timeout_ms)
+        except Exception as e:
+            failures.append((group["sql"], str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__))
+            continue
+        plan_scans, plan_joins, plan_sorts = scan_patterns(plan, group["count"])
+        scans += plan_scans
+        join_columns.update(plan_joins)
+        sort_columns.update(plan_sorts)
+    recommendations = recommend(scans, join_columns, sort_columns, existing_index_keys(connection))
+    return build_report(len(entries), sample, scans, recommendations, failures), recommendations
+
+
+def main():
+    from db.client import connect
+
+    parser = argparse.ArgumentParser(description="Recommend indexes from logged LLM-generated SQL.")
+    parser.add_argument("log", help="SQL log written with SQL_LOG_PATH")
+    parser.add_argument("--sample", type=int, default=50, help="Number of most expensive query shapes to EXPLAIN")
+    parser.add_argument("--timeout-ms", type=int, default=30_000, help="statement_timeout for each EXPLAIN ANALYZE")
+    parser.add_argument("--report", help="Write the report to this file instead of stdout")
+    parser.add_argument("--migration", help="Write the CREATE INDEX statements to this file")
+    parser.add_argument("--apply", action="store_true", help="Create the recommended indexes now")
+    args = parser.parse_args()
+
+    connection = connect()
+    try:
+        report, recommendations = advise(connection, args.log, args.sample, args.timeout_ms)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                f.write(report)
+        else:
+            print(report)
+        if args.migration:
+            with open(args.migration, "w", encoding="utf-8") as f:
+                f.write("-- Generated by db.index_advisor\n")
+                f.writelines(index_sql(candidate) + "\n" for candidate in recommendations)
+        if args.apply:
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                for candidate in recommendations:
+                    print(f"Creating {index_name(candidate)}")
+                    cursor.execute(index_sql(candidate))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# db/prepared.py
+"""
+Per-connection prepared statements for repeated SQL shapes.
+
+Literals are pulled out of each query so that near-identical queries (same shape, different constants) share
+one PREPAREd statement, and Postgres can reuse its plan. Literals that change the meaning or the plan shape are
+left in place: ORDER BY / GROUP BY positions, LIMIT / OFFSET / FETCH counts, typed literals such as
+DATE '2024-01-01' or INTERVAL '1 day', type modifiers as in NUMERIC(10,2), decimal or exponent literals, and
+CASE results (THEN / ELSE). Postgres infers a parameter's type from the other operand, so in `100.0 * COUNT(*)`
+a $1 would become bigint and turn the percentage into integer division, and a CASE whose branches are all
+parameters resolves to text. Other integer literals are safe to infer.
+
+Each pooled connection keeps an LRU of the statements it has prepared; a shape that Postgres refuses to PREPARE
+(e.g. an untyped literal in the select list) is remembered and run as plain SQL from then on.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+from utils.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Statements kept prepared per connection; 0 disables prepared statements
+SQL_PREPARED_CACHE_SIZE = int(os.getenv("SQL_PREPARED_CACHE_SIZE", "100"))
+# Shapes that failed to PREPARE are remembered (up to this many) and not retried
+UNPREPARABLE_CACHE_SIZE = 1000
+
+_SCANNER = re.compile(r"""
+    (?P<skip>--[^\n]*|/\*.*?\*/|"(?:[^"]|"")*"|[Ee]'(?:[^'\\]|\\.|'')*'|\$(?P<tag>\w*)\$.*?\$(?P=tag)\$)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<number>(?<![\w$.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.]))
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<cast>::)
+  | (?P<other>[^\s])
+""", re.VERBOSE | re.DOTALL)
+# Keywords after which a literal stays inline
+_COUNT_KEYWORDS = {"limit", "offset", "fetch", "first", "next"}
+# A CASE's result type comes from its branches; all-parameter branches would make it text
+_CASE_RESULT_KEYWORDS = {"then", "else"}
+_TYPED_LITERAL_KEYWORDS = {"date", "time", "timestamp", "timestamptz", "interval"}
+_POSITION_CLAUSES = {"order", "group"}
+# Types whose parenthesised modifiers must stay literal
+_TYPMOD_TYPES = {"numeric", "decimal", "varchar", "char", "character", "varying", "bit", "float", "time",
+                 "timestamp", "timestamptz", "interval"}
+_CLAUSE_KEYWORDS = {"select", "from", "where", "having", "limit", "offset", "fetch", "window", "union", "except",
+                    "intersect", "on", "join"}
+
+_unprepared = OrderedDict()
+_unprepared_lock = threading.Lock()
+_connection_caches = weakref.WeakKeyDictionary()
+_connection_caches_lock = threading.Lock()
+
+
+def parameterize(sql):
+    """
+    Returns (template, literals): the query with extractable literals replaced by $1..$n, and the distinct
+    literals' SQL source text in parameter order.
+    """
+    parts, literals = [], []
+    position = 0
+    previous_word = None
+    clause = None  # most recent clause keyword, to spot ORDER BY / GROUP BY position lists
+    in_typmod = False
+    for match in _SCANNER.finditer(sql):
+        kind = match.lastgroup if match.lastgroup != "tag" else "skip"
+        text = match.group()
+        if kind == "word":
+            word = text.lower()
+            if word in _POSITION_CLAUSES or word in _CLAUSE_KEYWORDS:
+                clause = word
+            previous_word = word
+            continue
+        if kind in ("string", "number"):
+            inline = (
+                in_typmod
+                or (kind == "number" and not text.isdigit())
+                or previous_word in _COUNT_KEYWORDS
+                or previous_word in _CASE_RESULT_KEYWORDS
+                or (kind == "string" and previous_word in _TYPED_LITERAL_KEYWORDS)
+                or (kind == "number" and clause in _POSITION_CLAUSES and previous_word in ("by", ","))
+            )
+            if not inline:
+                # Repeated literals share one parameter, so e.g. GROUP BY DATE_TRUNC('month', x) still matches
+                # the same expression in the select list
+                if text not in literals:
+                    literals.append(text)
+                parts.append(sql[position:match.start()])
+                parts.append(f"${literals.index(text) + 1}")
+                position = match.end()
+            previous_word = None
+            continue
+        if kind == "other" and text == "(" and previous_word in _TYPMOD_TYPES:
+            in_typmod = True
+        elif kind == "other" and text == ")":
+            in_typmod = False
+        if kind == "other" and text == ",":
+            previous_word = ","
+        elif kind != "skip":
+            previous_word = None
+    parts.append(sql[position:])
+    return "".join(parts), literals
+
+
+def statement_name(template):
+    return "ps_" + hashlib.sha1(template.encode("utf-8")).hexdigest()[:20]
+
+
+def _connection_cache(connection):
+    with _connection_caches_lock:
+        cache = _connection_caches.get(connection)
+        if cache is None:
+            cache = _connection_caches[connection] = OrderedDict()
+        return cache
+
+
+def _remember_unpreparable(template):
+    with _unprepared_lock:
+        _unprepared[template] = True
+        _unprepared.move_to_end(template)
+        while len(_unprepared) > UNPREPARABLE_CACHE_SIZE:
+            _unprepared.popitem(last=False)
+
+
+def prepared_statement(connection, cursor, query):
+    """
+    Returns the SQL to run for `query` on this connection: an EXECUTE of a (possibly newly) prepared statement,
+    or the plain query when its shape is known not to PREPARE or prepared statements are off.
+    Must be called inside the connection's transaction; a failed PREPARE is rolled back to a savepoint.
+    """
+    sql = query.strip().rstrip(";").strip()
+    if SQL_PREPARED_CACHE_SIZE <= 0:
+        return sql
+    template, literals = parameterize(sql)
+    if template in _unprepared:
+        CACHE_REQUESTS.labels(cache="prepared_statement", result="bypass").inc()
+        return sql
+
+    name = statement_name(template)
+    execute_sql = f"EXECUTE {name}({', '.join(literals)})" if literals else f"EXECUTE {name}"
+    cache = _connection_cache(connection)
+    if name in cache:
+        cache.move_to_end(name)
+        CACHE_REQUESTS.labels(cache="prepared_statement", result="hit").inc()
+        return execute_sql
+
+    CACHE_REQUESTS.labels(cache="prepared_statement", result="miss").inc()
+    cursor.execute("SAVEPOINT prepare_statement")
+    try:
+        cursor.execute(f"PREPARE {name} AS {template}")
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+        _remember_unpreparable(template)
+        logger.info("Query shape cannot be prepared; running it as plain SQL", extra={"error": str(e).strip()})
+        return sql
+    cursor.execute("RELEASE SAVEPOINT prepare_statement")
+
+    cache[name] = template
+    while len(cache) > SQL_PREPARED_CACHE_SIZE:
+        evicted, _ = cache.popitem(last=False)
+        cursor.execute(f"DEALLOCATE {evicted}")
+        CACHE_REQUESTS.labels(cache="prepared_statement", result="evicted").inc()
+    return execute_sql
+
+
+def forget_prepared_statements(connection):
+    """
+    Drops this connection's LRU, e.g. after the server reports that a statement no longer exists.
+    """
+    with _connection_caches_lock:
+        _connection_caches.pop(connection, None)
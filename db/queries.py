@@ -0,0 +1,70 @@
+import os
+
+# Number of edges (or nodes) shown in a graph chart
+GRAPH_ROW_LIMIT = int(os.getenv("GRAPH_ROW_LIMIT", "20"))
+# Number of rows fetched for local graph analytics; the cap is still applied inside Postgres
+GRAPH_FETCH_LIMIT = int(os.getenv("GRAPH_FETCH_LIMIT", "5000"))
+
+
+def strip_sql(sql):
+    """
+    Removes surrounding whitespace and trailing semicolons so the query can be embedded as a subquery.
+    """
+    return sql.strip().rstrip(";").strip()
+
+
+def limit_sql(sql, limit, order_by=None):
+    """
+    Wraps a generated query in a subquery with a deterministic ORDER BY and a LIMIT,
+    so the row cap is applied by Postgres instead of after the full result is fetched.
+    The whole-row text is used as a final tie-breaker to make the order total.
+    """
+    order_terms = list(order_by or []) + ["limited_q::text"]
+    return (
+        f"SELECT * FROM (\n{strip_sql(sql)}\n) AS limited_q\n"
+        f"ORDER BY {', '.join(order_terms)}\n"
+        f"LIMIT {int(limit)}"
+    )
+
+
+def enriched_edges_sql(nodes_sql, edges_sql):
+    """
+    Joins the edges query with the nodes query (once for the source, once for the target)
+    so every edge carries source_label/source_type and target_label/target_type.
+    node_label and node_type are read through to_json(), so generated nodes SQL that omits them still runs
+    (they come back NULL, as the old pandas merge left them missing).
+    """
+    return f"""WITH graph_nodes AS (
+    SELECT DISTINCT ON (node_id) node_id, node_label, node_type
+    FROM (
+        SELECT CAST(n.node_id AS TEXT) AS node_id,
+               to_json(n) ->> 'node_label'::text AS node_label,
+               to_json(n) ->> 'node_type'::text AS node_type
+        FROM (
+{strip_sql(nodes_sql)}
+        ) AS n
+    ) AS typed_nodes
+    ORDER BY node_id, node_label
+),
+graph_edges AS (
+{strip_sql(edges_sql)}
+)
+SELECT DISTINCT e.*,
+       s.node_label AS source_label, s.node_type AS source_type,
+       t.node_label AS target_label, t.node_type AS target_type
+FROM graph_edges e
+LEFT JOIN graph_nodes s ON CAST(e.source AS TEXT) = s.node_id
+LEFT JOIN graph_nodes t ON CAST(e.target AS TEXT) = t.node_id"""
+
+
+def build_graph_query(nodes_sql, edges_sql, limit=GRAPH_ROW_LIMIT):
+    """
+    Returns the single capped query for a graph branch, or None when the LLM produced no SQL.
+    """
+    if nodes_sql and edges_sql:
+        return limit_sql(enriched_edges_sql(nodes_sql, edges_sql), limit, ["source", "target"])
+    elif nodes_sql:
+        return limit_sql(nodes_sql, limit, ["node_id"])
+    elif edges_sql:
+        return limit_sql(edges_sql, limit, ["source", "target"])
+    return None
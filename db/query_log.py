@@ -0,0 +1,49 @@
+# db/query_log.py
+"""
+Append-only JSONL log of the SQL executed through run_sql_query_postgres, consumed by db.index_advisor.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Disabled unless a path is configured
+SQL_LOG_PATH = os.getenv("SQL_LOG_PATH")
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "1.0"))
+
+_lock = threading.Lock()
+_file = None
+
+
+def log_query(sql, duration_seconds, rows):
+    """
+    Records one executed query (a SQL_LOG_SAMPLE_RATE sample of them). Never raises.
+    """
+    global _file
+    if not SQL_LOG_PATH or random.random() >= SQL_LOG_SAMPLE_RATE:
+        return
+    line = json.dumps({"ts": time.time(), "sql": sql, "duration_ms": round(duration_seconds * 1000, 2),
+                       "rows": rows})
+    try:
+        with _lock:
+            if _file is None:
+                _file = open(SQL_LOG_PATH, "a", encoding="utf-8", buffering=1)
+            _file.write(line + "\n")
+    except OSError as e:
+        logger.warning("Could not write SQL log", extra={"error": str(e)})
+
+
+def read_query_log(path):
+    """
+    Yields the logged entries from a SQL log file, skipping malformed lines.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
@@ -0,0 +1,228 @@
+# db/routing.py
+"""
+Connection pools for the primary and any read replicas, with read routing.
+
+Every query the pipeline runs is read-only analytics, so reads go to the healthy replica with the fewest
+outstanding queries (replicas lagging more than DB_REPLICA_MAX_LAG_SECONDS are skipped) and fall back to the
+primary. A background thread re-checks health and replication lag; connection failures mark a host
+unhealthy immediately.
+"""
+import contextlib
+import logging
+import os
+import threading
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from utils.metrics import DB_HOST_HEALTHY, DB_HOST_OUTSTANDING, DB_HOST_LAG_SECONDS, DB_FAILOVERS
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated host[:port] list; empty means everything goes to DB_HOST
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "30"))
+DB_HEALTH_CHECK_SECONDS = float(os.getenv("DB_HEALTH_CHECK_SECONDS", "10"))
+
+# Replication lag in seconds; 0 on the primary and on a replica that has replayed everything it received
+LAG_SQL = """SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END"""
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class DatabaseHost:
+    """
+    One Postgres server with its own lazily created connection pool.
+    """
+
+    def __init__(self, host, port, role, connect_kwargs, min_connections=DB_POOL_MIN,
+                 max_connections=DB_POOL_MAX):
+        self.host = host
+        self.port = port
+        self.role = role
+        self.name = f"{host}:{port}" if port else host
+        self._connect_kwargs = dict(connect_kwargs, host=host, port=port)
+        self._min_connections = min_connections
+        self._max_connections = max_connections
+        # getconn() raises instead of blocking when the pool is exhausted, so callers wait on this first
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._pool = None
+        self._lock = threading.Lock()
+        self.outstanding = 0
+        self.picks = 0
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.last_error = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(self._min_connections, self._max_connections,
+                                                    **self._connect_kwargs)
+            return self._pool
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrows a pooled connection; it is rolled back and returned afterwards, or discarded if it broke.
+        """
+        self._slots.acquire()
+        with self._lock:
+            self.outstanding += 1
+        DB_HOST_OUTSTANDING.labels(host=self.name).inc()
+        pool = connection = None
+        broken = False
+        try:
+            pool = self._get_pool()
+            connection = pool.getconn()
+            yield connection
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        finally:
+            if connection is not None:
+                broken = broken or connection.closed != 0
+                if not broken:
+                    try:
+                        connection.rollback()
+                    except CONNECTION_ERRORS:
+                        broken = True
+                pool.putconn(connection, close=broken)
+            with self._lock:
+                self.outstanding -= 1
+            DB_HOST_OUTSTANDING.labels(host=self.name).dec()
+            self._slots.release()
+
+    def mark(self, healthy, error=None, lag_seconds=None):
+        if healthy != self.healthy:
+            logger.warning("Database host health changed", extra={
+                "host": self.name, "role": self.role, "healthy": healthy, "error": error
+            })
+        self.healthy = healthy
+        self.last_error = error
+        if lag_seconds is not None:
+            self.lag_seconds = lag_seconds
+            DB_HOST_LAG_SECONDS.labels(host=self.name).set(lag_seconds)
+        DB_HOST_HEALTHY.labels(host=self.name).set(1 if healthy else 0)
+
+    def check(self):
+        """
+        Runs the health/lag probe and updates this host's state.
+        """
+        try:
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(LAG_SQL)
+                    lag_seconds = float(cursor.fetchone()[0])
+            self.mark(True, lag_seconds=lag_seconds)
+        except Exception as e:
+            self.mark(False, error=str(e))
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+    def status(self):
+        return {"host": self.name, "role": self.role, "healthy": self.healthy, "lag_seconds": self.lag_seconds,
+                "outstanding": self.outstanding, "last_error": self.last_error}
+
+
+class ReadRouter:
+    """
+    Picks the host for each read: the usable replica with the fewest outstanding queries, else the primary.
+    """
+
+    def __init__(self, primary, replicas=(), max_lag_seconds=DB_REPLICA_MAX_LAG_SECONDS):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag_seconds = max_lag_seconds
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._closed = threading.Event()
+
+    def choose(self):
+        with self._lock:
+            usable = [host for host in self.replicas
+                      if host.healthy and host.lag_seconds <= self.max_lag_seconds]
+            # Ties go to the host picked least often, so idle replicas share the load evenly
+            host = min(usable, key=lambda h: (h.outstanding, h.picks)) if usable else self.primary
+            host.picks += 1
+            return host
+
+    def run_read(self, run):
+        """
+        Calls run(connection) on a routed connection. If a replica fails at the connection level it is marked
+        unhealthy and the read is retried once on the primary.
+        """
+        self.start_health_checks()
+        host = self.choose()
+        try:
+            with host.connection() as connection:
+                return run(connection)
+        except CONNECTION_ERRORS as e:
+            if host is self.primary:
+                raise
+            host.mark(False, error=str(e))
+            DB_FAILOVERS.inc()
+            logger.warning("Replica failed; retrying on the primary", extra={"host": host.name, "error": str(e)})
+        with self.primary.connection() as connection:
+            return run(connection)
+
+    def check_all(self):
+        for host in [self.primary] + self.replicas:
+            host.check()
+
+    def start_health_checks(self, interval=DB_HEALTH_CHECK_SECONDS):
+        # Only needed when there is something to route between
+        if not self.replicas or self._health_thread is not None or interval <= 0:
+            return
+        with self._lock:
+            if self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, args=(interval,),
+                                                   name="db-health-check", daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self, interval):
+        while not self._closed.is_set():
+            self.check_all()
+            self._closed.wait(interval)
+
+    def close(self):
+        self._closed.set()
+        for host in [self.primary] + self.replicas:
+            host.close()
+
+    def status(self):
+        return [host.status() for host in [self.primary] + self.replicas]
+
+
+def parse_hosts(spec, default_port):
+    """
+    "replica1:5433,replica2" → [("replica1", "5433"), ("replica2", default_port)]
+    """
+    hosts = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, port = item.partition(":")
+        hosts.append((host, port or default_port))
+    return hosts
+
+
+def build_router(connect_kwargs):
+    """
+    Builds the router from DB_HOST/DB_PORT (primary) and DB_REPLICA_HOSTS.
+    `connect_kwargs` holds the remaining psycopg2.connect arguments (database, user, password, sslmode).
+    """
+    default_port = os.getenv("DB_PORT")
+    primary = DatabaseHost(os.getenv("DB_HOST"), default_port, "primary", connect_kwargs)
+    replicas = [DatabaseHost(host, port, "replica", connect_kwargs)
+                for host, port in parse_hosts(DB_REPLICA_HOSTS, default_port)]
+    return ReadRouter(primary, replicas)
@@ -0,0 +1,401 @@
+# db/sql_validator.py
+"""
+In-process validation of LLM-generated SQL against the schema, before it is sent to Postgres.
+
+A small tokenizer is enough for the checks we need: the query must be a single read-only SELECT (optionally with
+CTEs), every table in FROM/JOIN must exist in the schema shown to the model (or be a CTE), and every
+alias-qualified column must exist in its table. When the query reads only base tables, unqualified identifiers
+are checked too. Errors are phrased so they can be fed straight into a repair prompt.
+"""
+import difflib
+import os
+import re
+
+from db.aggregates import prompt_schemas
+from db.client import QueryRejectedError
+from utils.metrics import DB_REJECTED
+
+# Set to "false" to skip local validation (e.g. if it ever rejects valid SQL)
+SQL_VALIDATION_ENABLED = os.getenv("SQL_VALIDATION_ENABLED", "true").lower() == "true"
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>(?:[EeBbXx])?'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")+")
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<param>\$\d+|%s|%\(\w+\)s)
+  | (?P<op>::|<=|>=|<>|!=|\|\||->>|->|[-+*/%<>=~!@#^&|`?\[\]{}])
+  | (?P<punct>[(),.;:])
+""", re.VERBOSE | re.DOTALL)
+
+FORBIDDEN = {
+    "insert", "update", "delete", "merge", "drop", "alter", "create", "truncate", "grant", "revoke", "copy",
+    "call", "do", "vacuum", "analyze", "reindex", "cluster", "refresh", "comment", "lock", "listen", "notify",
+    "prepare", "execute", "deallocate", "discard", "reset", "set", "begin", "commit", "rollback", "savepoint",
+    "into"
+}
+# Words that can never be a column reference (keywords, type names, date parts, frame words, ...)
+KEYWORDS = {
+    "all", "and", "any", "array", "as", "asc", "between", "both", "by", "case", "cast", "collate", "cross",
+    "cube", "current", "current_date", "current_time", "current_timestamp", "day", "days", "decade", "default",
+    "desc", "distinct", "dow", "doy", "else", "end", "epoch", "escape", "except", "exclude", "exists", "extract",
+    "false", "fetch", "filter", "first", "following", "for", "from", "full", "group", "grouping", "having",
+    "hour", "hours", "ilike", "in", "inner", "intersect", "interval", "is", "isnull", "join", "lateral",
+    "leading", "left", "like", "limit", "localtime", "localtimestamp", "minute", "minutes", "month", "months",
+    "natural", "next", "not", "notnull", "null", "nulls", "offset", "on", "only", "or", "order", "others",
+    "outer", "over", "overlaps", "partition", "placing", "position", "preceding", "quarter", "range",
+    "recursive", "right", "rollup", "row", "rows", "second", "seconds", "select", "sets", "similar", "some",
+    "symmetric", "ties", "then", "to", "trailing", "true", "unbounded", "union", "unknown", "using", "values",
+    "week", "when", "where", "window", "with", "within", "without", "year", "years", "zone", "time", "timestamp",
+    "timestamptz", "date", "text", "varchar", "char", "character", "varying", "numeric", "decimal", "integer",
+    "int", "int2", "int4", "int8", "bigint", "smallint", "real", "float", "float4", "float8", "double",
+    "precision", "boolean", "bool", "json", "jsonb", "uuid", "materialized", "ordinality", "substring", "trim",
+    "overlay", "coalesce", "nullif", "greatest", "least", "asymmetric", "ascending", "descending", "millennium",
+    "century", "milliseconds", "microseconds", "isodow", "isoyear", "julian", "timezone", "last", "at", "local",
+    "of", "no", "groups", "percent", "user", "current_user", "session_user", "current_role", "current_catalog",
+    "current_schema", "authorization", "binary", "check", "column", "constraint", "foreign", "primary",
+    "references", "returning", "table", "tablesample", "unique", "variadic", "verbose", "analyse", "freeze",
+    "concurrently", "initially", "deferrable", "bernoulli", "system", "repeatable", "share", "nowait", "skip",
+    "locked", "key", "normalize", "nfc", "nfd", "nfkc", "nfkd", "uescape", "xmlparse", "document", "content"
+}
+# Clause keywords that end a FROM list or a table alias
+CLAUSE_END = {
+    "where", "group", "order", "having", "limit", "offset", "union", "intersect", "except", "window", "fetch",
+    "on", "using", "join", "inner", "left", "right", "full", "cross", "natural", "lateral", "for", "returning",
+    "select", "from", "when", "then", "else", "end", "as", "and", "or", "not"
+}
+# Functions whose argument syntax contains FROM
+FROM_FUNCTIONS = {"extract", "substring", "trim", "overlay", "position"}
+
+
+class SQLValidationError(QueryRejectedError):
+    """
+    The generated SQL failed local validation. `errors` lists every problem found.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("The query failed validation against the schema:\n" + "\n".join(f"- {e}" for e in errors))
+
+
+def tokenize(sql):
+    """
+    Returns [(kind, value)] with whitespace and comments dropped. Unquoted identifiers are lower-cased and
+    quoted identifiers are unquoted (kind "ident" for both). Raises ValueError on an unexpected character.
+    """
+    tokens = []
+    position = 0
+    while position < len(sql):
+        match = _TOKEN.match(sql, position)
+        if not match:
+            raise ValueError(f"Unexpected character {sql[position]!r} at position {position}")
+        kind, value = match.lastgroup, match.group()
+        position = match.end()
+        if kind in ("space", "comment"):
+            continue
+        if kind == "ident":
+            tokens.append(("ident", value.lower(), False))
+        elif kind == "quoted":
+            tokens.append(("ident", value[1:-1].replace('""', '"'), True))
+        else:
+            tokens.append((kind, value, False))
+    return tokens
+
+
+_schema_cache = {}
+
+
+def _schema_tables(schemas):
+    key = id(schemas)
+    if key not in _schema_cache:
+        _schema_cache.clear()
+        _schema_cache[key] = {name.lower(): {col.lower() for col in table["columns"]}
+                              for name, table in schemas["tables"].items()}
+    return _schema_cache[key]
+
+
+def validate_sql(sql, schemas=None):
+    """
+    Returns a list of human-readable problems with `sql` (empty when it looks valid).
+    """
+    tables = _schema_tables(schemas or prompt_schemas())
+    if not sql or not sql.strip():
+        return ["The query is empty."]
+    try:
+        tokens = tokenize(sql)
+    except ValueError as e:
+        return [str(e)]
+    # Drop trailing semicolons; anything after an inner one is a second statement
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+    if not tokens:
+        return ["The query is empty."]
+
+    errors = []
+    if any(value == ";" for _, value, _ in tokens):
+        errors.append("Only a single statement is allowed; remove everything after the first semicolon.")
+    first = next((value for kind, value, _ in tokens if value != "("), None)
+    if first not in ("select", "with"):
+        errors.append(f"Only read-only SELECT queries are allowed, but the query starts with {first!r}.")
+    forbidden = sorted({value for kind, value, quoted in tokens if kind == "ident" and not quoted
+                        and value in FORBIDDEN})
+    if forbidden:
+        errors.append(f"Only read-only SELECT queries are allowed; found {', '.join(w.upper() for w in forbidden)}.")
+
+    ctes = _cte_names(tokens)
+    aliases, defined_names, all_base_tables = _table_references(tokens, tables, ctes, errors)
+    errors += _check_columns(tokens, tables, aliases, defined_names, all_base_tables)
+    return list(dict.fromkeys(errors))
+
+
+def check_sql(sql, schemas=None):
+    """
+    Raises SQLValidationError if validate_sql finds problems.
+    """
+    if not SQL_VALIDATION_ENABLED:
+        return
+    errors = validate_sql(sql, schemas)
+    if errors:
+        DB_REJECTED.labels(reason="validation").inc()
+        raise SQLValidationError(errors)
+
+
+def check_graph_sql(nodes_sql, edges_sql, schemas=None):
+    """
+    Validates the Nodes SQL and Edges SQL of a graph branch together; errors are prefixed with the query name.
+    """
+    if not SQL_VALIDATION_ENABLED:
+        return
+    errors = [f"{name}: {error}" for name, sql in (("Nodes SQL", nodes_sql), ("Edges SQL", edges_sql)) if sql
+              for error in validate_sql(sql, schemas)]
+    if errors:
+        DB_REJECTED.labels(reason="validation").inc()
+        raise SQLValidationError(errors)
+
+
+def _is_ident(token, value=None):
+    return token is not None and token[0] == "ident" and (value is None or token[1] == value)
+
+
+def _at(tokens, index):
+    return tokens[index] if 0 <= index < len(tokens) else None
+
+
+def _cte_names(tokens):
+    """
+    Names defined as `name AS (` or `name (col, ...) AS (` directly after WITH or a top-level comma of it.
+    """
+    names = set()
+    for i, token in enumerate(tokens):
+        previous = _at(tokens, i - 1)
+        if not (_is_ident(token) and previous is not None
+                and (_is_ident(previous, "with") or _is_ident(previous, "recursive") or previous[1] == ",")):
+            continue
+        following = _at(tokens, i + 1)
+        if _is_ident(following, "as") and _at(tokens, i + 2) is not None and _at(tokens, i + 2)[1] in ("(", "not",
+                                                                                                       "materialized"):
+            names.add(token[1])
+        elif following is not None and following[1] == "(":
+            # name (col, ...) AS (
+            depth, j = 0, i + 1
+            while j < len(tokens):
+                depth += {"(": 1, ")": -1}.get(tokens[j][1], 0)
+                if depth == 0:
+                    break
+                j += 1
+            if _is_ident(_at(tokens, j + 1), "as"):
+                names.add(token[1])
+    return names
+
+
+def _table_references(tokens, tables, ctes, errors):
+    """
+    Walks FROM/JOIN lists. Returns ({alias or table name: set of base tables, or None if unknown columns},
+    names defined in the query (aliases and CTEs), whether every FROM item is a base table).
+    """
+    aliases = {}
+    defined_names = set(ctes)
+    all_base_tables = True
+    function_stack = []  # function name (or None) per open parenthesis
+    derived_at = {}  # depth → True when the parenthesis opened right after FROM/JOIN (a derived table)
+
+    def record(name, targets):
+        aliases.setdefault(name, set())
+        if targets is None or aliases[name] is None:
+            aliases[name] = None
+        else:
+            aliases[name] |= targets
+
+    def read_alias(j):
+        # Optional [AS] alias after a table reference; returns (alias or None, next index)
+        if _is_ident(_at(tokens, j), "as"):
+            j += 1
+        token = _at(tokens, j)
+        if _is_ident(token) and (token[2] or token[1] not in CLAUSE_END | KEYWORDS):
+            return token[1], j + 1
+        return None, j
+
+    i = 0
+    while i < len(tokens):
+        kind, value, quoted = tokens[i]
+        if value == "(":
+            previous = _at(tokens, i - 1)
+            opened_after_from = previous is not None and previous[0] == "ident" and not previous[2] and \
+                previous[1] in ("from", "join", "lateral")
+            function_stack.append(previous[1] if _is_ident(previous) else None)
+            derived_at[len(function_stack)] = opened_after_from
+            i += 1
+            continue
+        if value == ")":
+            closed_depth = len(function_stack)
+            if function_stack:
+                function_stack.pop()
+            if derived_at.pop(closed_depth, False):
+                alias, _ = read_alias(i + 1)
+                if alias:
+                    record(alias, None)
+                    defined_names.add(alias)
+                all_base_tables = False
+            i += 1
+            continue
+        if kind != "ident" or quoted:
+            i += 1
+            continue
+
+        starts_list = value in ("from", "join")
+        if value == "from" and function_stack and function_stack[-1] in FROM_FUNCTIONS:
+            starts_list = False
+        if value == "from" and _is_ident(_at(tokens, i - 1), "distinct"):
+            starts_list = False  # IS [NOT] DISTINCT FROM
+        if not starts_list:
+            i += 1
+            continue
+
+        # Parse one or more comma-separated table references
+        j = i + 1
+        while True:
+            while _is_ident(_at(tokens, j), "only") or _is_ident(_at(tokens, j), "lateral"):
+                j += 1
+            token = _at(tokens, j)
+            if token is None or token[1] == "(" or not _is_ident(token):
+                break
+            name = token[1]
+            j += 1
+            if _at(tokens, j) is not None and _at(tokens, j)[1] == "." and _is_ident(_at(tokens, j + 1)):
+                name = _at(tokens, j + 1)[1]  # schema-qualified: keep the table name
+                j += 2
+            if _at(tokens, j) is not None and _at(tokens, j)[1] == "(":
+                # Table function such as generate_series(...): unknown columns
+                all_base_tables = False
+                alias_index = j
+                depth_count = 0
+                while alias_index < len(tokens):
+                    depth_count += {"(": 1, ")": -1}.get(tokens[alias_index][1], 0)
+                    if depth_count == 0:
+                        break
+                    alias_index += 1
+                alias, _ = read_alias(alias_index + 1)
+                if alias:
+                    record(alias, None)
+                    defined_names.add(alias)
+                break
+            if name in ctes:
+                targets = None
+                all_base_tables = False
+            elif name in tables:
+                targets = {name}
+            else:
+                targets = None
+                errors.append(_unknown_table_message(name, tables))
+            record(name, targets)
+            alias, j = read_alias(j)
+            if alias:
+                record(alias, targets)
+                defined_names.add(alias)
+            if value == "from" and _at(tokens, j) is not None and _at(tokens, j)[1] == ",":
+                j += 1
+                continue
+            break
+        i = j
+    return aliases, defined_names, all_base_tables
+
+
+def _unknown_table_message(name, tables):
+    suggestion = name[:-len("_rows")] if name.endswith("_rows") and name[:-len("_rows")] in tables else None
+    if suggestion is None:
+        matches = difflib.get_close_matches(name, tables, n=1)
+        suggestion = matches[0] if matches else None
+    hint = f" Did you mean '{suggestion}'?" if suggestion else ""
+    return f"Unknown table '{name}'; it is not in the schema.{hint}"
+
+
+def _unknown_column_message(column, table, columns):
+    matches = difflib.get_close_matches(column, columns, n=1)
+    hint = f" Did you mean '{matches[0]}'?" if matches else f" Available columns: {', '.join(sorted(columns))}."
+    return f"Column '{column}' does not exist in table '{table}'.{hint}"
+
+
+def _check_columns(tokens, tables, aliases, defined_names, all_base_tables):
+    errors = []
+    referenced_tables = {t for targets in aliases.values() if targets for t in targets}
+    referenced_columns = set().union(*(tables[t] for t in referenced_tables)) if referenced_tables else set()
+    output_aliases = _output_aliases(tokens)
+
+    for i, (kind, value, quoted) in enumerate(tokens):
+        if kind != "ident":
+            continue
+        previous, following = _at(tokens, i - 1), _at(tokens, i + 1)
+        if previous is not None and previous[1] == ".":
+            continue  # handled as the column part of a qualified reference
+        if following is not None and following[1] == "." and _at(tokens, i + 2) is not None:
+            column_token = _at(tokens, i + 2)
+            if following is not None and _at(tokens, i + 3) is not None and _at(tokens, i + 3)[1] == "(":
+                continue  # schema-qualified function call
+            if value not in aliases:
+                if value in tables or value in defined_names:
+                    continue
+                errors.append(f"Unknown table or alias '{value}' in '{value}.{column_token[1]}'.")
+                continue
+            targets = aliases[value]
+            if targets is None or column_token[1] == "*" or column_token[0] != "ident":
+                continue
+            if not any(column_token[1] in tables[t] for t in targets):
+                table = sorted(targets)[0]
+                errors.append(_unknown_column_message(column_token[1], table, tables[table]))
+            continue
+
+        # Unqualified identifiers: only checkable when every FROM item is a base table
+        if not all_base_tables or not referenced_tables or (not quoted and value in KEYWORDS | FORBIDDEN):
+            continue
+        if following is not None and following[1] == "(":
+            continue  # function call
+        if previous is not None and previous[1] == "::":
+            continue  # type name
+        if _is_ident(previous, "as"):
+            continue  # alias definition
+        if value in referenced_columns or value in aliases or value in defined_names or value in output_aliases:
+            continue
+        matches = difflib.get_close_matches(value, referenced_columns, n=1)
+        hint = f" Did you mean '{matches[0]}'?" if matches else ""
+        errors.append(f"Column '{value}' does not exist in any table used by the query "
+                      f"({', '.join(sorted(referenced_tables))}).{hint}")
+    return errors
+
+
+def _output_aliases(tokens):
+    """
+    Names introduced as `expr AS name` or implicitly as `expr name` before a comma or FROM.
+    """
+    names = set()
+    for i, (kind, value, _) in enumerate(tokens):
+        if kind != "ident":
+            continue
+        previous, following = _at(tokens, i - 1), _at(tokens, i + 1)
+        if _is_ident(previous, "as"):
+            names.add(value)
+        elif previous is not None and (previous[1] == ")" or previous[0] in ("string", "number")) \
+                and (following is None or following[1] == "," or _is_ident(following, "from")):
+            names.add(value)
+    return names
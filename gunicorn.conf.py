@@ -0,0 +1,57 @@
+# gunicorn.conf.py
+"""
+Multi-worker entry point: gunicorn supervising uvicorn workers, one per available core by default.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+Each worker is a separate process with its own DB pools and threadpool, so pandas work and response parsing
+use every core. Per-worker warm-up and shutdown are the FastAPI startup/shutdown events in main.py. Settings
+that would otherwise be per-process are switched to shared stores unless set explicitly:
+  - SHARED_CACHE=sqlite   LLM, SQL and answer caches (utils.cache)
+  - JOB_STORE=sqlite      background job status, readable from any worker (services.jobs)
+  - PROMETHEUS_MULTIPROC_DIR  /metrics aggregates every worker
+"""
+import os
+import shutil
+
+
+def _available_cores():
+    # Honours CPU affinity / cpusets (containers), unlike os.cpu_count()
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# WEB_CONCURRENCY overrides the worker count
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or _available_cores()
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:80")
+# A question can take tens of seconds of LLM calls; workers silent for longer than this are restarted
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+# On SIGTERM, in-flight requests get this long to finish before the worker shuts down
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+# Recycle workers now and then to bound memory growth from pandas/networkx; jitter avoids restarting all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+# The app is imported after fork, so no DB connection or thread is shared between workers
+preload_app = False
+accesslog = None  # requests are already logged by the app
+
+os.environ.setdefault("SHARED_CACHE", "sqlite")
+os.environ.setdefault("JOB_STORE", "sqlite")
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+
+def on_starting(server):
+    # Metric files left by a previous run would be summed into this one
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,26 +1,153 @@
+import asyncio
+import concurrent.futures
+import logging
 import os
-import openai
+import threading
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from utils.cache import shared_cached
+from utils.cancellation import current_token, RequestCancelled
+from utils.memo import memoized
+from utils.metrics import LLM_REQUESTS, LLM_REQUEST_SECONDS, LLM_TOKENS
+from utils.tracing import span, current_span
+from utils.utils import estimate_tokens
+from utils.rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Shared by the API and the offline batch CLI; 0 = unlimited
+LLM_MAX_REQUESTS_PER_MINUTE = float(os.getenv("LLM_MAX_REQUESTS_PER_MINUTE", "0"))
+LLM_MODEL = "gpt-4o"
+llm_rate_limiter = RateLimiter(LLM_MAX_REQUESTS_PER_MINUTE)
+
+_io_loop = None
+_io_loop_lock = threading.Lock()
+_aio_session = None  # only touched from the openai-io loop
 
 
 def call_llm(prompt):
     """
     Calls the OpenAI LLM API with the given prompt and returns a structured response.
+    Identical prompts within a batch (see utils.memo) are sent only once, and replies are shared across
+    worker processes when the shared cache is on (see utils.cache).
+    """
+    with span("call_llm", prompt_tokens_estimate=estimate_tokens(prompt)):
+        return memoized("llm", prompt, lambda: shared_cached("llm", prompt, lambda: _llm_backend(prompt)))
+
+
+def set_llm_backend(backend=None):
+    """
+    Replaces the function that answers prompts (e.g. a recorded-response replayer in the benchmarks).
+    Passing None restores the OpenAI backend.
+    """
+    global _llm_backend
+    _llm_backend = backend or _call_openai
+
+
+def check_llm():
     """
+    Raises unless the OpenAI backend is usable: an API key is set and the model can be looked up (no tokens used).
+    Other backends, such as the benchmark replayer, always pass.
+    """
+    if _llm_backend is not _call_openai:
+        return
+    openai = _openai()
+    if not openai.api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    openai.Model.retrieve(LLM_MODEL)
+
+
+def _openai():
+    # Imported on first call: the SDK and its aiohttp dependency take most of a second to import
+    import openai
+
+    if openai.api_key is None:
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai
+
+
+def _openai_io_loop():
+    """
+    Event loop on its own daemon thread that runs the OpenAI requests. Running them as tasks lets an abandoned
+    request be cancelled mid-flight: cancelling the task closes its HTTP connection.
+    They share one aiohttp session (see _chat_completion), so connections are kept alive between calls.
+    """
+    global _io_loop
+    with _io_loop_lock:
+        if _io_loop is None:
+            _io_loop = asyncio.new_event_loop()
+            threading.Thread(target=_io_loop.run_forever, name="openai-io", daemon=True).start()
+        return _io_loop
+
+
+async def _chat_completion(**kwargs):
+    global _aio_session
+    openai = _openai()
+    if _aio_session is None or _aio_session.closed:
+        import aiohttp
+
+        _aio_session = aiohttp.ClientSession()
+    # Without a session bound here, openai 0.28 opens (and closes) a new session, i.e. a new TLS connection, per call
+    openai.aiosession.set(_aio_session)
+    return await openai.ChatCompletion.acreate(**kwargs)
+
+
+async def _close_aio_session():
+    global _aio_session
+    if _aio_session is not None:
+        await _aio_session.close()
+        _aio_session = None
+    await asyncio.get_running_loop().shutdown_asyncgens()
+
+
+def close_llm():
+    """
+    Closes the shared OpenAI HTTP session and stops the openai-io loop (worker shutdown).
+    """
+    global _io_loop
+    with _io_loop_lock:
+        loop, _io_loop = _io_loop, None
+    if loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_close_aio_session(), loop).result(timeout=5)
+    except Exception as e:
+        logger.warning("Error closing the OpenAI HTTP session", extra={"error": str(e)})
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def _call_openai(prompt):
+    openai = _openai()
+    token = current_token()
+    llm_rate_limiter.acquire()
+    token.raise_if_cancelled("call_llm")
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0
-        )
+        with LLM_REQUEST_SECONDS.time():
+            future = asyncio.run_coroutine_threadsafe(_chat_completion(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0
+            ), _openai_io_loop())
+            with token.on_cancel(future.cancel):
+                response = future.result()
+        usage = response.get('usage') or {}
+        LLM_TOKENS.labels(direction="in").inc(usage.get('prompt_tokens', 0))
+        LLM_TOKENS.labels(direction="out").inc(usage.get('completion_tokens', 0))
+        current_span().set_attribute("prompt_tokens", usage.get('prompt_tokens', 0))
+        current_span().set_attribute("completion_tokens", usage.get('completion_tokens', 0))
+        LLM_REQUESTS.labels(status="success").inc()
         reply = response['choices'][0]['message']['content'].strip()
         return reply
+    except concurrent.futures.CancelledError:
+        LLM_REQUESTS.labels(status="cancelled").inc()
+        raise RequestCancelled("The request was abandoned; its LLM call was cancelled")
     except Exception as e:
-        print(f"Error calling LLM: {e}")
+        LLM_REQUESTS.labels(status="error").inc()
+        current_span().set_attribute("error", str(e))
+        logger.error("Error calling LLM", extra={"error": str(e)})
         return None
 
 
+_llm_backend = _call_openai
@@ -1,4 +1,13 @@
-from db.schemas import TABLE_SCHEMAS
+from db.aggregates import prompt_schemas
+
+# TABLE_SCHEMAS plus the pre-aggregated summary tables when they are enabled, rendered once rather than on every
+# prompt (same text the f-strings produced from the dict)
+SCHEMA_CONTEXT = str(prompt_schemas())
+
+TRUNCATED_DATA_NOTE = """If the data above has "truncated": true, it is a summary of a larger result: "row_count" is the
+total number of rows, "columns" holds per-column statistics (count, min, max, mean, quantiles, top values)
+computed over ALL rows, and "sample_rows" is a small representative sample. Base totals, ranges and
+rankings on the statistics, and use the sample only for examples."""
 
 
 def get_reasoning_prompt(question):
@@ -9,7 +18,7 @@ def get_reasoning_prompt(question):
     "{question}"
 
     And the following table schema:
-    "{TABLE_SCHEMAS}"
+    "{SCHEMA_CONTEXT}"
 
     Perform the following:
 
@@ -47,12 +56,60 @@ def get_reasoning_prompt(question):
     """
 
 
+def get_batch_reasoning_prompt(questions):
+    numbered_questions = "\n".join(f"Question {i}: \"{q}\"" for i, q in enumerate(questions, start=1))
+    return f"""
+    You are an expert reasoning and visualization assistant.
+
+    Given these {len(questions)} questions:
+    {numbered_questions}
+
+    And the following table schema:
+    "{SCHEMA_CONTEXT}"
+
+    For EACH question independently, perform the following:
+
+    Reasoning Type
+    Classify the reasoning type of the question. Choose one from:
+    [Deductive, Inductive, Abductive, Causal, Counterfactual, Multi-Hop, Temporal, Probabilistic, Analogical, Ethical, 
+    Spatial, Scientific, Commonsense, Planning, Legal, Multi-Agent, Metacognitive]
+
+    Reasoning Justification
+    Explain in one or two sentences why you classified the question as that reasoning type.
+
+    Reasoning Path
+    Describe the conceptual reasoning chain as a symbolic path of entities, relationships, or operations needed to answer the question.
+    Use this exact format:
+    Reasoning Path: ["<entity/step 1> → <entity/step 2> → ... → <final target>"]
+
+    Visualization Recommendation
+    Based on the reasoning type, data relationships, and question goal, recommend the most suitable visualization type.
+    Choose from:
+    [Knowledge Graph, Causal Graph, Process Flow, Time Series Chart, Comparative Bar Chart, Ranking Chart, Pie Chart, Histogram,
+    Multi-Series Time Series Chart]
+
+    For the Visualization Type, briefly include key axis, nodes, or segment details in parentheses. Example:
+    Visualization Type: Comparative Bar Chart (X axis - job roles grouped by industry; Y axis - automation risk level)
+
+    OUTPUT FORMAT (strict) — one block per question, in the same order, each starting with its header line:
+
+    ### Question <number>
+    Reasoning Type: <selected reasoning type>
+
+    Reasoning Justification: <one or two sentence explanation for why this reasoning type fits the question>
+
+    Reasoning Path: [<entity/step 1> → <entity/step 2> → ... → <final target>]
+
+    Visualization Type: <recommended visualization type with short axis or segment details in parentheses>
+    """
+
+
 def get_process_flow_prompt(question, reasoning_type):
     return f"""
     You are an assistant generating SQL queries and Process Flow construction logic.
 
     Reasoning Type: {reasoning_type}
-    Schemas: {TABLE_SCHEMAS}
+    Schemas: {SCHEMA_CONTEXT}
 
     User Question: "{question}"
 
@@ -86,7 +143,7 @@ You are an assistant generating only SQL queries (no Python code, no explanation
 Reasoning Type: {reasoning_type}
 Visualization Type: {visualization_type}
 Schemas (use ONLY the tables and columns listed below — do NOT invent new table names):
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 User Question: \"{question}\"
 
@@ -168,7 +225,7 @@ You are an expert assistant generating SQL queries for Knowledge Graph (KG) cons
 Reasoning Type: {reasoning_type}
 Visualization Type: {visualization_type}
 Schemas (use ONLY the tables and columns listed below — do NOT invent new table names or columns):
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 User Question: \"{question}\"
 
@@ -239,7 +296,7 @@ Here is the query result data (in JSON format):
 {db_data_json}
 
 ⚡ SCHEMA AND RELATIONSHIPS:
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 ⚡ TASKS:
 1️⃣ Reasoning Answer:
@@ -294,7 +351,7 @@ You are an expert assistant generating SQL queries for Causal Graph (CG) constru
 Reasoning Type: {reasoning_type}
 Visualization Type: {visualization_type}
 Schemas (use ONLY the tables and columns listed below — do NOT invent new table names or columns):
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 User Question: \"{question}\"
 
@@ -369,7 +426,7 @@ Here is the query result data (in JSON format):
 {db_data_json}
 
 ⚡ SCHEMA AND RELATIONSHIPS:
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 ⚡ TASKS:
 1️⃣ **Reasoning Answer**
@@ -419,7 +476,7 @@ You are an expert assistant generating SQL queries for Process Flow or Process M
 Reasoning Type: {reasoning_type}
 Visualization Type: {visualization_type}
 Schemas (use ONLY the tables and columns listed below — do NOT invent new table names or columns):
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 User Question: \"{question}\"
 
@@ -492,7 +549,7 @@ Here is the query result data (in JSON format):
 {db_data_json}
 
 ⚡ SCHEMA AND RELATIONSHIPS:
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 ⚡ TASKS:
 1️⃣ **Reasoning Answer**  
@@ -547,9 +604,10 @@ Visualization Type: "{visualization_type}"
 
 Here is the query result data (in JSON format):
 {db_data_json}
+{TRUNCATED_DATA_NOTE}
 
 ⚡ SCHEMA:
-{TABLE_SCHEMAS}
+{SCHEMA_CONTEXT}
 
 ⚡ TASK:
 - Provide a clear, accurate, and well-reasoned **answer to the user's question** based entirely on the provided data.
@@ -570,3 +628,129 @@ Final Answer:
 - Do **NOT** include markdown, bullet points, or formatting outside the specified section.
 - Do **NOT** include any code, SQL, or comments.
 """
+
+
+GRAPH_NARRATIVE_FOCUS = {
+    "Knowledge Graph": "Explain the key entities and how they are connected, including indirect (multi-hop) relationships.",
+    "Causal Graph": "Explain the main cause-effect patterns — which factors drive which outcomes, and through which paths.",
+    "Process Flow": "Explain the key steps and transitions — the most frequent paths, bottlenecks, loops and end points."
+}
+
+
+def get_graph_narrative_prompt(question, reasoning_type, visualization_type, graph_summary_json):
+    return f"""
+You are an expert data analyst and graph reasoning assistant.
+
+User Question: "{question}"
+Reasoning Type: "{reasoning_type}"
+Visualization Type: "{visualization_type}"
+
+The {visualization_type} has already been built from the query result. Here is its analytics summary (in JSON format):
+{graph_summary_json}
+
+The summary contains:
+- node_count / edge_count → size of the full graph
+- hubs → the most connected nodes, with in/out degree, degree centrality and betweenness centrality
+- components → number of connected components and the sizes of the largest ones
+- hub_paths → shortest paths between the hubs
+- node_types / relationships → counts of node types and relationship types
+
+⚡ SCHEMA AND RELATIONSHIPS:
+{SCHEMA_CONTEXT}
+
+⚡ TASK:
+- Provide a clear, insightful **answer to the user's question** based entirely on the graph summary.
+- {GRAPH_NARRATIVE_FOCUS.get(visualization_type, GRAPH_NARRATIVE_FOCUS["Knowledge Graph"])}
+- Refer to nodes by their labels, not their ids.
+- Make the explanation understandable for a non-technical audience.
+
+⚡ OUTPUT FORMAT:
+Respond with exactly **one section**:
+
+Final Answer:
+<Your complete and reasoned answer here>
+
+⚡ IMPORTANT RULES:
+- Use only the facts in the summary — do not invent nodes, edges or values.
+- Do **NOT** include markdown, code, SQL, or JSON in the answer.
+"""
+
+
+def get_sql_repair_prompt(question, reasoning_type, visualization_type, sql, problem):
+    return f"""
+You are an assistant generating only SQL queries (no Python code, no explanations, no reasoning text).
+
+The SQL query below was generated for this question but could not be run as written.
+
+User Question: "{question}"
+Reasoning Type: {reasoning_type}
+Visualization Type: {visualization_type}
+
+Query:
+```sql
+{sql}
+```
+
+Problem:
+{problem}
+
+Schemas (use ONLY the tables and columns listed below — do NOT invent new table names):
+{SCHEMA_CONTEXT}
+
+⚡ TASK:
+- Rewrite the query so that it fixes the problem above while still answering the question.
+- Keep exactly the same output column aliases as the original query.
+- The SQL MUST be a single read-only SELECT (CTEs allowed) compatible with the PostgresSQL dialect.
+
+Provide ONLY the following exact response format (no explanation, no reasoning, no commentary):
+
+SQL Query:
+```sql
+<SQL>
+```
+"""
+
+
+def get_graph_sql_repair_prompt(question, reasoning_type, visualization_type, nodes_sql, edges_sql, problem):
+    return f"""
+You are an assistant generating only SQL queries (no Python code, no explanations, no reasoning text).
+
+The Nodes SQL and Edges SQL below were generated for a {visualization_type} but could not be run as written.
+They are executed together: the edges are joined to the nodes on node_id = source / node_id = target.
+
+User Question: "{question}"
+Reasoning Type: {reasoning_type}
+Visualization Type: {visualization_type}
+
+Nodes SQL:
+```sql
+{nodes_sql or ""}
+```
+
+Edges SQL:
+```sql
+{edges_sql or ""}
+```
+
+Problem:
+{problem}
+
+Schemas (use ONLY the tables and columns listed below — do NOT invent new table names):
+{SCHEMA_CONTEXT}
+
+⚡ TASK:
+- Rewrite both queries so that they fix the problem above while still answering the question.
+- Nodes SQL must return node_id, node_label, node_type; Edges SQL must return source, target, relationship.
+- Each query MUST be a single read-only SELECT (CTEs allowed) compatible with the PostgresSQL dialect.
+
+⚠️ STRICT OUTPUT FORMAT (MANDATORY — for parsing):
+1. Nodes SQL:
+```sql
+<Write the Nodes SQL here>
+```
+
+2. Edges SQL:
+```sql
+<Write the Edges SQL here>
+```
+"""
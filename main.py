@@ -1,12 +1,20 @@
 import logging
-import uvicorn
+import time
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from dotenv import load_dotenv
 
 load_dotenv()
-from api import route, health
+from api import route, health, jobs, metrics, admin
+from utils.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS
+from utils.tracing import new_trace_id, trace_id_scope
+from utils.logging_config import configure_logging
+from db.aggregates import start_refresh_scheduler
+from utils.admission import AdmissionMiddleware
+from utils.cache import close_shared_cache
+from utils.cancellation import CancellationMiddleware
+from services.warmup import start_warmup
 
 app = FastAPI(title="Workforce Reskilling APIs")
 
@@ -18,6 +26,11 @@ ALLOWED_ORIGINS = [
     "http://localhost:8080"
 ]
 
+# Added before CORS so shed requests (429/503) still carry the CORS headers; cancellation runs inside admission
+# so it sees the request deadline
+app.add_middleware(CancellationMiddleware)
+app.add_middleware(AdmissionMiddleware)
+
 # allow_origin_regex=r"^https:\/\/.*\.lovable\.dev$",
 app.add_middleware(
     CORSMiddleware,
@@ -29,19 +42,67 @@ app.add_middleware(
 
 # Include routes
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(route.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(admin.router, prefix="/admin")
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
+@app.on_event("startup")
+def start_aggregate_refresh():
+    # No-op unless AGGREGATES_REFRESH_SECONDS > 0
+    start_refresh_scheduler()
+
+
+@app.on_event("startup")
+def warm_up_worker():
+    # Runs in every worker process, in the background; /ready turns 200 once it is done (services.warmup)
+    start_warmup()
+
+
+@app.on_event("shutdown")
+def shut_down_worker():
+    # Runs after in-flight requests have finished (gunicorn graceful_timeout)
+    from db.client import close_router
+    from llm.openai_client import close_llm
+
+    close_router()
+    close_llm()
+    close_shared_cache()
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"Incoming request: {request.method} {request.url}")
-    response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
+    start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    try:
+        with trace_id_scope(new_trace_id(request.headers.get("x-trace-id"))) as trace_id:
+            response = await call_next(request)
+        response.headers["X-Trace-Id"] = trace_id
+    finally:
+        HTTP_IN_FLIGHT.dec()
+    duration = time.perf_counter() - start
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+        method=request.method,
+        # Use the route template (e.g. /api/jobs/{job_id}) to keep label cardinality bounded
+        path=route.path if route is not None else "unmatched",
+        status=str(response.status_code)
+    ).observe(duration)
+    logger.info("Request handled", extra={
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 1),
+        "trace_id": trace_id
+    })
     return response
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
@@ -1,13 +1,24 @@
 import logging
 import pandas as pd
 
-from db.client import run_sql_query_postgres
+from db.client import run_sql_query_postgres, QueryRejectedError
+from db.queries import build_graph_query, GRAPH_FETCH_LIMIT
+from db.sql_validator import check_sql, check_graph_sql
 from llm.prompts import *
 from utils.utils import parsed_reasoning_output, parsed_sql, parsed_2sqls
-from services.visualizer import prepare_chart_data
+from services.summarizer import summarize_dataframe
+from services.visualizer import prepare_chart_data, VISUALIZATION_TYPES
 from services.graph import *
+from services.speculation import start_speculation, record_classification
+from utils.metrics import stage_timer, record_parse_failure, SQL_REPAIRS
+from utils.tracing import trace_or_span, set_trace_attribute
+from utils.logging_config import log_payload
 
 logger = logging.getLogger(__name__)
+classify_logger = logging.getLogger("pipeline.classify")
+sql_logger = logging.getLogger("pipeline.sql")
+query_logger = logging.getLogger("pipeline.query")
+chart_logger = logging.getLogger("pipeline.chart")
 
 
 def classify_reasoning_type(question):
@@ -16,6 +27,133 @@ def classify_reasoning_type(question):
     return reasoning_response
 
 
+def run_query_with_repair(sql, build_query, repair, validate):
+    """
+    Validates `sql` locally and runs build_query(sql). If validation or the database side rejects it
+    (QueryRejectedError), asks the LLM once for a repaired version via repair(sql, reason) and runs that instead.
+    Returns (df, the SQL that was run).
+    """
+    try:
+        validate(sql)
+        return run_sql_query_postgres(build_query(sql)), sql
+    except QueryRejectedError as e:
+        sql_logger.warning("Generated SQL rejected; asking for a repair", extra={"reason": e.reason})
+        with stage_timer("sql_repair"):
+            repaired = repair(sql, e.reason)
+        if not repaired or not build_query(repaired):
+            SQL_REPAIRS.labels(outcome="unparsable").inc()
+            raise
+    try:
+        validate(repaired)
+        df = run_sql_query_postgres(build_query(repaired))
+    except QueryRejectedError:
+        SQL_REPAIRS.labels(outcome="rejected").inc()
+        raise
+    SQL_REPAIRS.labels(outcome="success").inc()
+    return df, repaired
+
+
+GRAPH_BRANCHES = {
+    "Knowledge Graph": (get_kg_sql_prompt, process_knowledge_graph),
+    "Causal Graph": (get_cg_sql_prompt, process_causal_graph),
+    "Process Flow": (get_pf_sql_prompt, process_process_flow),
+}
+
+
+def sql_prompt_for(question, reasoning_type, visualization_type):
+    """
+    The step 2 SQL-generation prompt for a classified question.
+    """
+    if visualization_type in GRAPH_BRANCHES:
+        return GRAPH_BRANCHES[visualization_type][0](question, reasoning_type, visualization_type)
+    return get_sql_prompt(question, reasoning_type, visualization_type)
+
+
+def run_graph_branch(question, reasoning_type, visualization_type, progress=None, speculative_sql=None):
+    """
+    Shared path for the Knowledge Graph, Causal Graph and Process Flow branches:
+    generate nodes/edges SQL, run the capped enrichment query, assemble the graph and analyse it locally.
+    `speculative_sql`, if given, returns an SQL response already requested during classification.
+    """
+    _, process_branch_graph = GRAPH_BRANCHES[visualization_type]
+    report_progress = progress or (lambda stage: None)
+
+    report_progress("sql_generation")
+    with stage_timer("sql_generation"):
+        llm_sql_response = speculative_sql() if speculative_sql else None
+        if llm_sql_response is None:
+            llm_sql_response = call_llm(sql_prompt_for(question, reasoning_type, visualization_type))
+        sql = parsed_2sqls(llm_sql_response)
+    nodes_sql = sql.get('nodes_sql')
+    edges_sql = sql.get('edges_sql')
+    if not nodes_sql and not edges_sql:
+        record_parse_failure("graph_sql")
+    log_payload(sql_logger, logging.INFO, "Generated graph SQL", {"nodes_sql": nodes_sql, "edges_sql": edges_sql},
+                name="sql", visualization_type=visualization_type)
+
+    def build_query(graph_sqls):
+        return build_graph_query(graph_sqls.get('nodes_sql'), graph_sqls.get('edges_sql'), GRAPH_FETCH_LIMIT)
+
+    def repair(graph_sqls, reason):
+        repair_prompt = get_graph_sql_repair_prompt(question, reasoning_type, visualization_type,
+                                                    graph_sqls.get('nodes_sql'), graph_sqls.get('edges_sql'), reason)
+        return parsed_2sqls(call_llm(repair_prompt) or "")
+
+    report_progress("query")
+    with stage_timer("graph_query"):
+        if build_query(sql):
+            df, sql = run_query_with_repair(
+                sql, build_query, repair, lambda graph_sqls: check_graph_sql(graph_sqls.get('nodes_sql'),
+                                                                             graph_sqls.get('edges_sql')))
+        else:
+            df = pd.DataFrame()
+    with stage_timer("graph_assembly"):
+        graph = assemble_graph(df) if sql.get('edges_sql') else assemble_graph(nodes_df=df)
+
+    report_progress("answer")
+    graph_schema = process_branch_graph(question, reasoning_type, graph)
+
+    return df, sql, graph_schema
+
+
+def run_chart_branch(question, reasoning_type, visualization_type, progress=None, speculative_sql=None):
+    """
+    Shared path for the chart visualizations: generate one SQL query, run it, and ask the LLM for the answer.
+    `speculative_sql`, if given, returns an SQL response already requested during classification.
+    """
+    report_progress = progress or (lambda stage: None)
+
+    report_progress("sql_generation")
+    with stage_timer("sql_generation"):
+        llm_sql_response = speculative_sql() if speculative_sql else None
+        if llm_sql_response is None:
+            llm_sql_response = call_llm(sql_prompt_for(question, reasoning_type, visualization_type))
+        sql = parsed_sql(llm_sql_response)
+    if sql is None:
+        record_parse_failure("chart_sql")
+    log_payload(sql_logger, logging.INFO, "Generated SQL", sql or "", name="sql",
+                visualization_type=visualization_type)
+
+    def repair(chart_sql, reason):
+        repair_prompt = get_sql_repair_prompt(question, reasoning_type, visualization_type, chart_sql, reason)
+        return parsed_sql(call_llm(repair_prompt) or "")
+
+    report_progress("query")
+    with stage_timer("chart_query"):
+        df, sql = run_query_with_repair(sql, lambda chart_sql: chart_sql, repair,
+                                        lambda chart_sql: check_sql(chart_sql) if chart_sql else None)
+
+    if df.empty:
+        query_logger.warning("No data returned from database.")
+    df = clean_dataframe_columns(df)
+
+    report_progress("answer")
+    db_data_json = summarize_dataframe(df)
+    graph_schema = process_charts(question, reasoning_type, visualization_type, db_data_json)
+
+    return df, sql, graph_schema
+
+
 def build_response(reasoning_type=None, reasoning_answer=None, reasoning_path=None, sql=None,
                    chart=None, error=None):
     return {
@@ -28,139 +166,63 @@ def build_response(reasoning_type=None, reasoning_answer=None, reasoning_path=No
     }
 
 
-def run_reasoning_pipeline(question):
+def run_reasoning_pipeline(question, progress=None, reasoning_llm_output=None):
+    """
+    Runs the full question → reasoning → SQL → answer → chart pipeline.
+    `progress`, if given, is called with the name of each stage as it starts.
+    `reasoning_llm_output`, if given, is a step-1 classification already obtained (e.g. from a batch prompt).
+    """
+    with trace_or_span("pipeline") as pipeline_span:
+        result = _run_reasoning_pipeline(question, progress, reasoning_llm_output)
+        if result.get("error") is not None:
+            pipeline_span.set_attribute("error", result["error"])
+    return result
+
+
+def _run_reasoning_pipeline(question, progress, reasoning_llm_output):
+    report_progress = progress or (lambda stage: None)
+    speculation = None
     try:
         # Step 1 → Get reasoning type + visualization type
-        reasoning_llm_output = classify_reasoning_type(question)
+        report_progress("classify")
+        if reasoning_llm_output is None:
+            # Step 2's SQL call for the predicted visualization type runs alongside classification
+            speculation = start_speculation(question, sql_prompt_for)
+            with stage_timer("classify"):
+                reasoning_llm_output = classify_reasoning_type(question)
         reasoning_result = parsed_reasoning_output(reasoning_llm_output)
+        if reasoning_result.get("visualization_type") is None:
+            record_parse_failure("reasoning")
 
         reasoning_cat = reasoning_result.get("reasoning_type", "Unknown").strip().capitalize()
         reasoning_justification = reasoning_result.get("reasoning_justification")
         reasoning_type = f'{reasoning_justification} So this reasoning is of type "{reasoning_cat}"'
         reasoning_path = reasoning_result.get("reasoning_path")
         visualization_type = reasoning_result.get("visualization_type", "").strip()
-        print("<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>")
-        print("Reasoning Type : \n", reasoning_type)
-        print("Reasoning Path : \n", reasoning_path)
-        print("Visualization Type : \n", visualization_type)
-
-        df = pd.DataFrame()
-        sql = None
-
-        if visualization_type == "Knowledge Graph":
-            sql_prompt = get_kg_sql_prompt(question, reasoning_type, visualization_type)
-            llm_sql_response = call_llm(sql_prompt)
-            sql = parsed_2sqls(llm_sql_response)
-            nodes_sql = sql.get('nodes_sql')
-            edges_sql = sql.get('edges_sql')
-            print("LLM Response : \n", llm_sql_response)
-            print("Nodes SQL : \n", nodes_sql)
-            print("Edges SQL : \n", edges_sql)
-            nodes_df = run_sql_query_postgres(nodes_sql) if nodes_sql else None
-            edges_df = run_sql_query_postgres(edges_sql) if edges_sql else None
-
-            if nodes_df is not None and edges_df is not None:
-                source_nodes_df = nodes_df.rename(columns={'node_id': 'source', 'node_label': 'source_label', 'node_type': 'source_type'})
-                target_nodes_df = nodes_df.rename(columns={'node_id': 'target', 'node_label': 'target_label', 'node_type': 'target_type'})
-                edges_enriched = edges_df.merge(source_nodes_df, on='source', how='left')
-                edges_enriched = edges_enriched.merge(target_nodes_df, on='target', how='left')
-                df = edges_enriched.drop_duplicates().reset_index(drop=True)
-            elif nodes_df is not None:
-                df = nodes_df.copy()
-            elif edges_df is not None:
-                df = edges_df.copy()
-
-            df = df.head(20)
-            db_data_json = df.to_json(orient='records')
-            graph_schema = process_knowledge_graph(question, reasoning_type, db_data_json)
-
-        elif visualization_type == "Causal Graph":
-            sql_prompt = get_cg_sql_prompt(question, reasoning_type, visualization_type)
-            llm_sql_response = call_llm(sql_prompt)
-            sql = parsed_2sqls(llm_sql_response)
-            nodes_sql = sql.get('nodes_sql')
-            edges_sql = sql.get('edges_sql')
-            print("Nodes SQL : \n", nodes_sql)
-            print("Edges SQL : \n", edges_sql)
-            nodes_df = run_sql_query_postgres(nodes_sql) if nodes_sql else None
-            edges_df = run_sql_query_postgres(edges_sql) if edges_sql else None
-
-            if nodes_df is not None and edges_df is not None:
-                source_nodes_df = nodes_df.rename(
-                    columns={'node_id': 'source', 'node_label': 'source_label', 'node_type': 'source_type'})
-                target_nodes_df = nodes_df.rename(
-                    columns={'node_id': 'target', 'node_label': 'target_label', 'node_type': 'target_type'})
-                edges_enriched = edges_df.merge(source_nodes_df, on='source', how='left')
-                edges_enriched = edges_enriched.merge(target_nodes_df, on='target', how='left')
-                df = edges_enriched.drop_duplicates().reset_index(drop=True)
-            elif nodes_df is not None:
-                df = nodes_df.copy()
-            elif edges_df is not None:
-                df = edges_df.copy()
-
-            df = df.head(20)
-            db_data_json = df.to_json(orient='records')
-            graph_schema = process_causal_graph(question, reasoning_type, db_data_json)
-
-        elif visualization_type == "Process Flow":
-            sql_prompt = get_pf_sql_prompt(question, reasoning_type, visualization_type)
-            llm_sql_response = call_llm(sql_prompt)
-            sql = parsed_2sqls(llm_sql_response)
-            nodes_sql = sql.get('nodes_sql')
-            edges_sql = sql.get('edges_sql')
-            print("Nodes SQL : \n", nodes_sql)
-            print("Edges SQL : \n", edges_sql)
-            nodes_df = run_sql_query_postgres(nodes_sql) if nodes_sql else None
-            edges_df = run_sql_query_postgres(edges_sql) if edges_sql else None
-
-            if nodes_df is not None and edges_df is not None:
-                source_nodes_df = nodes_df.rename(
-                    columns={'node_id': 'source', 'node_label': 'source_label', 'node_type': 'source_type'})
-                target_nodes_df = nodes_df.rename(
-                    columns={'node_id': 'target', 'node_label': 'target_label', 'node_type': 'target_type'})
-                edges_enriched = edges_df.merge(source_nodes_df, on='source', how='left')
-                edges_enriched = edges_enriched.merge(target_nodes_df, on='target', how='left')
-                df = edges_enriched.drop_duplicates().reset_index(drop=True)
-            elif nodes_df is not None:
-                df = nodes_df.copy()
-            elif edges_df is not None:
-                df = edges_df.copy()
-
-            df = df.head(20)
-            db_data_json = df.to_json(orient='records')
-            graph_schema = process_process_flow(question, reasoning_type, db_data_json)
-
-        elif visualization_type == "Multi-Series Time Series Chart":
-            sql_prompt = get_sql_prompt(question, reasoning_type, visualization_type)
-            llm_sql_response = call_llm(sql_prompt)
-            sql = parsed_sql(llm_sql_response)
-            print("SQL : \n", sql)
-
-            df = run_sql_query_postgres(sql)
-
-            if df.empty:
-                print("No data returned from database.")
-            df = clean_dataframe_columns(df)
-            db_data_json = df.to_json(orient='records')
-            graph_schema = process_charts(question, reasoning_type, visualization_type, db_data_json)
-
+        set_trace_attribute("visualization_type",
+                            visualization_type if visualization_type in VISUALIZATION_TYPES else "other")
+        classify_logger.info("Classified question", extra={
+            "reasoning_type": reasoning_cat,
+            "reasoning_path": reasoning_path,
+            "visualization_type": visualization_type
+        })
+        record_classification(question, visualization_type, reasoning_type)
+        speculative_sql = None
+        if speculation is not None:
+            speculative_sql = speculation.take(visualization_type,
+                                               sql_prompt_for(question, reasoning_type, visualization_type))
+
+        if visualization_type in GRAPH_BRANCHES:
+            df, sql, graph_schema = run_graph_branch(question, reasoning_type, visualization_type, progress,
+                                                     speculative_sql)
         else:
-            sql_prompt = get_sql_prompt(question, reasoning_type, visualization_type)
-            llm_sql_response = call_llm(sql_prompt)
-            sql = parsed_sql(llm_sql_response)
-            print("SQL : \n", sql)
-
-            df = run_sql_query_postgres(sql)
-
-            if df.empty:
-                print("No data returned from database.")
-            df = clean_dataframe_columns(df)
-            db_data_json = df.to_json(orient='records')
-            graph_schema = process_charts(question, reasoning_type, visualization_type, db_data_json)
-
-        chart_json = prepare_chart_data(df, visualization_type, graph_schema)
-        print("Graph : \n", graph_schema)
-        print("<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>")
+            df, sql, graph_schema = run_chart_branch(question, reasoning_type, visualization_type, progress,
+                                                     speculative_sql)
+
+        report_progress("chart")
+        with stage_timer("prepare_chart_data"):
+            chart_json = prepare_chart_data(df, visualization_type, graph_schema)
+        log_payload(chart_logger, logging.DEBUG, "Prepared chart", graph_schema, name="graph_schema")
         return build_response(
             reasoning_type,
             graph_schema.get("reasoning_answer"),
@@ -171,6 +233,7 @@ def run_reasoning_pipeline(question):
         )
 
     except Exception as e:
+        logger.warning("Pipeline failed", extra={"error": str(e)})
         return build_response(
             reasoning_type=None,
             reasoning_answer=None,
@@ -179,4 +242,7 @@ def run_reasoning_pipeline(question):
             chart=None,
             error=str(e)
         )
+    finally:
+        if speculation is not None:
+            speculation.close()
 
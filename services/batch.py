@@ -0,0 +1,84 @@
+import logging
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from llm.openai_client import call_llm
+from llm.prompts import get_batch_reasoning_prompt
+from services.analyzer import run_reasoning_pipeline
+from utils.cancellation import current_token, cancellation_scope
+from utils.memo import BatchMemo, memo_scope
+from utils.utils import parsed_batch_reasoning_output
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_CLASSIFY_GROUP_SIZE = int(os.getenv("BATCH_CLASSIFY_GROUP_SIZE", "10"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+
+
+def classify_group(questions):
+    """
+    Classifies several questions with one multi-question prompt.
+    Returns one raw classification section per question (None where the response could not be split).
+    """
+    if len(questions) == 1:
+        return [None]
+    response = call_llm(get_batch_reasoning_prompt(questions))
+    return parsed_batch_reasoning_output(response, len(questions))
+
+
+def run_batch(questions, concurrency=BATCH_CONCURRENCY, group_size=BATCH_CLASSIFY_GROUP_SIZE):
+    """
+    Runs many questions through run_reasoning_pipeline with bounded concurrency and yields
+    (index, question, result) tuples as each one finishes (not in input order).
+
+    Work is shared across the batch:
+    - identical questions run once and the result is yielded for every index;
+    - step-1 classification is grouped into multi-question prompts of `group_size`;
+    - identical LLM prompts and SQL statements are executed once (utils.memo).
+    """
+    unique_questions = list(dict.fromkeys(questions))
+    indexes_by_question = {}
+    for index, question in enumerate(questions):
+        indexes_by_question.setdefault(question, []).append(index)
+
+    memo = BatchMemo()
+    finished = queue.Queue()
+    # Worker threads don't inherit the caller's context; hand them the request's cancellation token
+    token = current_token()
+
+    def run_question(question, reasoning_llm_output):
+        with memo_scope(memo), cancellation_scope(token):
+            try:
+                result = run_reasoning_pipeline(question, progress=token.raise_if_cancelled,
+                                                reasoning_llm_output=reasoning_llm_output)
+            except Exception as e:
+                result = {"error": str(e)}
+        finished.put((question, result))
+
+    def run_group(executor, group):
+        with memo_scope(memo), cancellation_scope(token):
+            try:
+                classifications = classify_group(group)
+            except Exception as e:
+                logger.warning("Grouped classification failed, classifying individually", extra={"error": str(e)})
+                classifications = [None] * len(group)
+        for question, classification in zip(group, classifications):
+            executor.submit(run_question, question, classification)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as executor:
+        for start in range(0, len(unique_questions), max(1, group_size)):
+            executor.submit(run_group, executor, unique_questions[start:start + group_size])
+
+        for _ in unique_questions:
+            question, result = finished.get()
+            for index in indexes_by_question[question]:
+                yield index, question, result
+
+    logger.info("Batch finished", extra={
+        "questions": len(questions),
+        "unique_questions": len(unique_questions),
+        "memo_hits": memo.hits,
+        "memo_misses": memo.misses
+    })
@@ -1,51 +1,61 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from db.queries import GRAPH_ROW_LIMIT
 from llm.openai_client import call_llm
-from llm.prompts import get_kg_data_prompt, get_reasoning_answer_prompt, get_cg_data_prompt
+from llm.prompts import get_reasoning_answer_prompt, get_graph_narrative_prompt
+from services.graph_analytics import analyze_graph, select_display_graph
+from utils.metrics import stage_timer, record_parse_failure
 from utils.utils import parsed_graph_output, parsed_kg_sql_output, clean_dataframe_columns, parsed_kg_data_output, \
     parse_final_answer_response
 
 
-def process_knowledge_graph(question, reasoning_type, db_data_json):
-    data_kg_prompt = get_kg_data_prompt(question, reasoning_type, db_data_json)
-    data_kg_response = call_llm(data_kg_prompt)
-    reasoning_answer, data_nodes, data_edges = parsed_kg_data_output(data_kg_response)
+def process_graph(question, reasoning_type, visualization_type, graph):
+    """
+    Runs the local graph analytics over the full assembled graph and asks the LLM only for the
+    narrative, based on the compact analytics summary. Nodes and edges never round-trip through the LLM.
+    """
+    with stage_timer("graph_analytics"):
+        analytics = analyze_graph(graph)
+    with stage_timer("answer_llm"):
+        narrative_prompt = get_graph_narrative_prompt(question, reasoning_type, visualization_type,
+                                                      json.dumps(analytics, default=str))
+        narrative_response = call_llm(narrative_prompt)
+        reasoning_answer = parse_final_answer_response(narrative_response)
+    if reasoning_answer is None:
+        record_parse_failure("final_answer")
+    display_graph = select_display_graph(graph, GRAPH_ROW_LIMIT)
 
     graph_schema = {
         "reasoning_answer": reasoning_answer,
-        "data_nodes": data_nodes,
-        "data_edges": data_edges
+        "data_nodes": display_graph["nodes"],
+        "data_edges": display_graph["edges"],
+        "graph_analytics": analytics
     }
     return graph_schema
 
 
-def process_causal_graph(question, reasoning_type, db_data_json):
-    data_cg_prompt = get_cg_data_prompt(question, reasoning_type, db_data_json)
-    data_cg_response = call_llm(data_cg_prompt)
-    reasoning_answer, data_nodes, data_edges = parsed_kg_data_output(data_cg_response)
+def process_knowledge_graph(question, reasoning_type, graph):
+    return process_graph(question, reasoning_type, "Knowledge Graph", graph)
 
-    graph_schema = {
-        "reasoning_answer": reasoning_answer,
-        "data_nodes": data_nodes,
-        "data_edges": data_edges
-    }
-    return graph_schema
 
+def process_causal_graph(question, reasoning_type, graph):
+    return process_graph(question, reasoning_type, "Causal Graph", graph)
 
-def process_process_flow(question, reasoning_type, db_data_json):
-    data_cg_prompt = get_cg_data_prompt(question, reasoning_type, db_data_json)
-    data_cg_response = call_llm(data_cg_prompt)
-    reasoning_answer, data_nodes, data_edges = parsed_kg_data_output(data_cg_response)
-    graph_schema = {
-        "reasoning_answer": reasoning_answer,
-        "data_nodes": data_nodes,
-        "data_edges": data_edges
-    }
-    return graph_schema
+
+def process_process_flow(question, reasoning_type, graph):
+    return process_graph(question, reasoning_type, "Process Flow", graph)
 
 
 def process_charts(question, reasoning_type, visualization_type, db_data_json):
-    llm_graph_prompt = get_reasoning_answer_prompt(question, reasoning_type, visualization_type, db_data_json)
-    llm_response = call_llm(llm_graph_prompt)
-    reasoning_answer = parse_final_answer_response(llm_response)
+    with stage_timer("answer_llm"):
+        llm_graph_prompt = get_reasoning_answer_prompt(question, reasoning_type, visualization_type, db_data_json)
+        llm_response = call_llm(llm_graph_prompt)
+        reasoning_answer = parse_final_answer_response(llm_response)
+    if reasoning_answer is None:
+        record_parse_failure("final_answer")
 
     graph_schema = {
         "reasoning_answer": reasoning_answer,
@@ -53,3 +63,70 @@ def process_charts(question, reasoning_type, visualization_type, db_data_json):
         "data_edges": None
     }
     return graph_schema
+
+
+def build_node_index(edges_df=None, nodes_df=None):
+    """
+    Builds a node_id -> (label, type) lookup from the enriched edge columns and/or a nodes table.
+    """
+    node_index = {}
+    if edges_df is not None and not edges_df.empty:
+        for side in ("source", "target"):
+            if side not in edges_df.columns:
+                continue
+            side_nodes = edges_df.drop_duplicates(subset=[side])
+            ids = side_nodes[side].astype(str).tolist()
+            node_index.update(zip(ids, zip(_column_or_none(side_nodes, f"{side}_label"),
+                                           _column_or_none(side_nodes, f"{side}_type"))))
+    if nodes_df is not None and not nodes_df.empty and "node_id" in nodes_df.columns:
+        ids = nodes_df["node_id"].astype(str).tolist()
+        node_index.update(zip(ids, zip(_column_or_none(nodes_df, "node_label"),
+                                       _column_or_none(nodes_df, "node_type"))))
+    return node_index
+
+
+def assemble_graph(edges_df=None, nodes_df=None):
+    """
+    Assembles nodes and edges in the shape prepare_chart_data expects, in O(E):
+    nodes → [{"id", "label", "type"}], edges → [{"source", "target", "relationship", ...}].
+    Labels and types come from an index lookup instead of DataFrame merges.
+    """
+    node_index = build_node_index(edges_df, nodes_df)
+    node_ids = []
+    edges = []
+
+    if nodes_df is not None and not nodes_df.empty and "node_id" in nodes_df.columns:
+        node_ids.append(nodes_df["node_id"].astype(str).to_numpy())
+
+    if edges_df is not None and not edges_df.empty and {"source", "target"} <= set(edges_df.columns):
+        edge_columns = ["source", "target"] + [col for col in ("relationship", "count") if col in edges_df.columns]
+        edges_frame = edges_df[edge_columns].dropna(subset=["source", "target"]).copy()
+        edges_frame["source"] = edges_frame["source"].astype(str)
+        edges_frame["target"] = edges_frame["target"].astype(str)
+        edges_frame = edges_frame.drop_duplicates(subset=[col for col in edge_columns if col != "count"])
+        edges = [dict(zip(edge_columns, row))
+                 for row in zip(*(_column_or_none(edges_frame, col) for col in edge_columns))]
+        node_ids.append(edges_frame["source"].to_numpy())
+        node_ids.append(edges_frame["target"].to_numpy())
+
+    unique_ids = pd.unique(np.concatenate(node_ids)) if node_ids else []
+    nodes = []
+    for node_id in unique_ids:
+        label, node_type = node_index.get(node_id, (None, None))
+        nodes.append({
+            "id": node_id,
+            "label": node_id if label is None else label,
+            "type": node_type
+        })
+
+    return {"nodes": nodes, "edges": edges}
+
+
+def _column_or_none(df, column):
+    if column not in df.columns:
+        return [None] * len(df)
+    series = df[column]
+    if series.hasnans:
+        series = series.astype(object).where(series.notna(), None)
+    return series.tolist()
+
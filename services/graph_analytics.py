@@ -0,0 +1,102 @@
+import itertools
+from collections import Counter
+
+import networkx as nx
+
+# Exact betweenness is O(V·E); above this many nodes it is estimated from a fixed-seed sample of pivots
+BETWEENNESS_EXACT_MAX_NODES = 500
+BETWEENNESS_SAMPLE_SIZE = 200
+
+
+def build_nx_graph(graph):
+    """
+    Builds a directed networkx graph from assembled {"nodes": [...], "edges": [...]}.
+    """
+    nx_graph = nx.DiGraph()
+    for node in graph["nodes"]:
+        nx_graph.add_node(node["id"], label=node.get("label"), type=node.get("type"))
+    for edge in graph["edges"]:
+        nx_graph.add_edge(edge["source"], edge["target"], relationship=edge.get("relationship"))
+    return nx_graph
+
+
+def analyze_graph(graph, top_k=5):
+    """
+    Computes a compact, deterministic summary of the graph: size, top-k hubs with degree and
+    betweenness centrality, connected components and shortest paths between the hubs.
+    """
+    nx_graph = build_nx_graph(graph)
+    node_count = nx_graph.number_of_nodes()
+    if node_count == 0:
+        return {"node_count": 0, "edge_count": 0, "hubs": [], "components": {"count": 0, "largest_sizes": []},
+                "hub_paths": [], "node_types": {}, "relationships": {}}
+
+    degree = nx.degree_centrality(nx_graph)
+    if node_count <= BETWEENNESS_EXACT_MAX_NODES:
+        betweenness = nx.betweenness_centrality(nx_graph)
+    else:
+        betweenness = nx.betweenness_centrality(nx_graph, k=BETWEENNESS_SAMPLE_SIZE, seed=0)
+
+    ranked = sorted(nx_graph.nodes, key=lambda node_id: (-degree[node_id], -betweenness[node_id], str(node_id)))
+    hub_ids = ranked[:top_k]
+    hubs = [
+        {
+            "id": node_id,
+            "label": nx_graph.nodes[node_id].get("label"),
+            "type": nx_graph.nodes[node_id].get("type"),
+            "in_degree": nx_graph.in_degree(node_id),
+            "out_degree": nx_graph.out_degree(node_id),
+            "degree_centrality": round(degree[node_id], 4),
+            "betweenness_centrality": round(betweenness[node_id], 4)
+        }
+        for node_id in hub_ids
+    ]
+
+    component_sizes = sorted((len(c) for c in nx.weakly_connected_components(nx_graph)), reverse=True)
+
+    undirected = nx_graph.to_undirected(as_view=True)
+    hub_paths = []
+    for source, target in itertools.combinations(hub_ids, 2):
+        try:
+            path = nx.shortest_path(undirected, source, target)
+        except nx.NetworkXNoPath:
+            continue
+        hub_paths.append({
+            "from": nx_graph.nodes[source].get("label"),
+            "to": nx_graph.nodes[target].get("label"),
+            "length": len(path) - 1,
+            "path": [nx_graph.nodes[node_id].get("label") for node_id in path]
+        })
+
+    node_types = Counter(data.get("type") for _, data in nx_graph.nodes(data=True))
+    relationships = Counter(data.get("relationship") for _, _, data in nx_graph.edges(data=True))
+
+    return {
+        "node_count": node_count,
+        "edge_count": nx_graph.number_of_edges(),
+        "hubs": hubs,
+        "components": {"count": len(component_sizes), "largest_sizes": component_sizes[:top_k]},
+        "hub_paths": hub_paths,
+        "node_types": {str(k): v for k, v in node_types.most_common(10)},
+        "relationships": {str(k): v for k, v in relationships.most_common(10)}
+    }
+
+
+def select_display_graph(graph, limit):
+    """
+    Keeps the `limit` edges whose endpoints have the highest combined degree, so the chart shows
+    the hub structure instead of an arbitrary slice. Node-only graphs are truncated to `limit` nodes.
+    """
+    if not graph["edges"]:
+        return {"nodes": graph["nodes"][:limit], "edges": []}
+
+    degree = Counter()
+    for edge in graph["edges"]:
+        degree[edge["source"]] += 1
+        degree[edge["target"]] += 1
+
+    edges = sorted(graph["edges"],
+                   key=lambda e: (-(degree[e["source"]] + degree[e["target"]]), e["source"], e["target"]))[:limit]
+    kept_ids = {e["source"] for e in edges} | {e["target"] for e in edges}
+    nodes = [node for node in graph["nodes"] if node["id"] in kept_ids]
+    return {"nodes": nodes, "edges": edges}
@@ -0,0 +1,230 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "300"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+
+DEFAULT_PRIORITY = 5
+PURGE_INTERVAL_SECONDS = 60
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class MemoryJobStore:
+    """
+    Keeps jobs in process memory. Only suitable for a single worker process.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def purge_expired(self, now):
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.get("expires_at") is not None and job["expires_at"] <= now]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+
+class SQLiteJobStore:
+    """
+    Keeps jobs in a SQLite file (WAL mode) so every uvicorn/gunicorn worker can serve GET /api/jobs/{id}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+
+    def _connection(self):
+        # One connection per thread, reused; `with connection:` only commits or rolls back, it never closes
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+        return connection
+
+    def save(self, job):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, data, expires_at) VALUES (?, ?, ?)",
+                (job["job_id"], json.dumps(job, default=str), job.get("expires_at"))
+            )
+
+    def get(self, job_id):
+        with self._connection() as connection:
+            row = connection.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge_expired(self, now):
+        with self._connection() as connection:
+            cursor = connection.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        return cursor.rowcount
+
+
+def create_job_store(kind=JOB_STORE, path=JOB_STORE_PATH):
+    if kind == "sqlite":
+        return SQLiteJobStore(path)
+    if kind == "memory":
+        return MemoryJobStore()
+    raise ValueError(f"Unknown JOB_STORE '{kind}' (expected 'memory' or 'sqlite')")
+
+
+class JobRunner:
+    """
+    Runs submitted questions on a bounded pool of worker threads, fed by a bounded priority queue
+    (lower number = higher priority). Each job has a timeout that is checked at every pipeline stage;
+    finished jobs are kept in the store for `result_ttl` seconds.
+    """
+
+    def __init__(self, store, pipeline, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE,
+                 timeout=JOB_TIMEOUT_SECONDS, result_ttl=JOB_RESULT_TTL_SECONDS):
+        self.store = store
+        self.pipeline = pipeline
+        self.workers = workers
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._queue = queue.PriorityQueue(maxsize=queue_size)
+        self._sequence = itertools.count()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, question, priority=DEFAULT_PRIORITY):
+        self.start()
+        self._purge_if_due()
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "question": question,
+            "priority": priority,
+            "status": "queued",
+            "stage": None,
+            "progress": [],
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            # Queued jobs expire too, so abandoned entries never accumulate
+            "expires_at": now + self.timeout + self.result_ttl
+        }
+        self.store.save(job)
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), job["job_id"]))
+        except queue.Full:
+            job.update(status="rejected", error="Job queue is full", finished_at=now, expires_at=now + self.result_ttl)
+            self.store.save(job)
+            raise JobQueueFull("Job queue is full")
+        return job
+
+    def get(self, job_id):
+        self._purge_if_due()
+        job = self.store.get(job_id)
+        if job and job.get("expires_at") is not None and job["expires_at"] <= time.time():
+            return None
+        return job
+
+    def _work(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.error("Job crashed", extra={"job_id": job_id, "error": str(e)})
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        started = time.time()
+        deadline = started + self.timeout
+        job.update(status="running", started_at=started)
+        self.store.save(job)
+
+        def progress(stage):
+            now = time.time()
+            if now > deadline:
+                raise JobTimeout(f"Job exceeded {self.timeout:.0f}s timeout during '{job['stage']}'")
+            job["stage"] = stage
+            job["progress"].append({"stage": stage, "started_at": now, "elapsed": round(now - started, 3)})
+            self.store.save(job)
+
+        result = self.pipeline(job["question"], progress=progress)
+        finished = time.time()
+
+        if finished > deadline:
+            job.update(status="timed_out", error=f"Job exceeded {self.timeout:.0f}s timeout")
+        elif result.get("error") is None:
+            job.update(status="succeeded", result=result)
+        else:
+            job.update(status="failed", result=result, error=result.get("error"))
+        job.update(finished_at=finished, expires_at=finished + self.result_ttl)
+        self.store.save(job)
+
+    def _purge_if_due(self):
+        now = time.time()
+        if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            self.store.purge_expired(now)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """
+    Process-wide JobRunner, created lazily so importing this module never starts threads.
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            from services.analyzer import run_reasoning_pipeline
+            _runner = JobRunner(create_job_store(), run_reasoning_pipeline)
+        return _runner
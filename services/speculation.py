@@ -0,0 +1,174 @@
+# services/speculation.py
+"""
+Speculative SQL generation (opt-in with SPECULATIVE_SQL_ENABLED).
+
+Step 1 classification must finish before the SQL prompt can be built, because the prompt depends on the
+visualization type and the reasoning text. For a question this process has classified before, both are
+predictable (temperature 0), so the SQL-generation call for the recorded classification starts in parallel with
+classification. Its response is used only when its prompt is exactly the one the pipeline builds after
+classification; otherwise the call is cancelled, aborting an in-flight OpenAI request (utils.cancellation).
+
+Only repeated questions are predicted: the prompt embeds the question's own reasoning text, so a guess from
+similar questions would almost never produce the same prompt, and its LLM call would be wasted.
+"""
+import contextvars
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from llm.openai_client import call_llm
+from utils.cancellation import CancellationToken, cancellation_scope, current_token
+from utils.metrics import SPECULATIVE_SQL, SPECULATIVE_SQL_WASTED_TOKENS
+from utils.utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_SQL_ENABLED = os.getenv("SPECULATIVE_SQL_ENABLED", "false").lower() == "true"
+# Distinct questions whose classification is remembered
+SPECULATION_HISTORY_SIZE = int(os.getenv("SPECULATION_HISTORY_SIZE", "5000"))
+SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "8"))
+
+def normalize_question(question):
+    return " ".join(question.lower().split())
+
+
+class VisualizationPredictor:
+    """
+    Predicts a question's classification (visualization type and reasoning text) from its last one.
+    """
+
+    def __init__(self, history_size=SPECULATION_HISTORY_SIZE):
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._history = OrderedDict()  # normalised question -> (visualization_type, reasoning_type)
+
+    def record(self, question, visualization_type, reasoning_type):
+        key = normalize_question(question)
+        with self._lock:
+            self._history[key] = (visualization_type, reasoning_type)
+            self._history.move_to_end(key)
+            while len(self._history) > self.history_size:
+                self._history.popitem(last=False)
+
+    def predict(self, question):
+        """
+        Returns (visualization_type, reasoning_type), or None for a question not classified before.
+        """
+        with self._lock:
+            return self._history.get(normalize_question(question))
+
+
+class Speculation:
+    """
+    One speculative SQL-generation call running alongside classification.
+    """
+
+    def __init__(self, visualization_type, prompt, executor):
+        self.visualization_type = visualization_type
+        self._prompt = prompt
+        self._started = False
+        self._response = None
+        self._resolved = False
+        # Its own token, so a misprediction cancels only this call; the request's token cancels it too
+        self._token = CancellationToken()
+        self._parent_link = current_token().on_cancel(self._token.cancel)
+        self._parent_link.__enter__()
+        self._linked = True
+        context = contextvars.copy_context()
+        self._future = executor.submit(context.run, self._run)
+
+    def _run(self):
+        self._started = True
+        with cancellation_scope(self._token):
+            self._response = call_llm(self._prompt)
+            return self._response
+
+    def take(self, visualization_type, sql_prompt):
+        """
+        Returns a function producing the speculative SQL response (it may still be in flight) when the speculative
+        prompt is exactly `sql_prompt`, the one built from the actual classification; else cancels the call and
+        returns None.
+        """
+        self._resolved = True
+        if sql_prompt == self._prompt:
+            SPECULATIVE_SQL.labels(outcome="hit").inc()
+            return self._result
+        SPECULATIVE_SQL.labels(outcome="miss").inc()
+        logger.info("Speculative SQL discarded", extra={
+            "predicted": self.visualization_type, "actual": visualization_type,
+            # With the type matching, the prompt differs because classification returned different reasoning text
+            "type_matched": visualization_type == self.visualization_type
+        })
+        self.cancel()
+        return None
+
+    def _result(self):
+        try:
+            return self._future.result()
+        except Exception as e:
+            logger.warning("Speculative SQL generation failed", extra={"error": str(e)})
+            return None
+        finally:
+            self._unlink()
+
+    def cancel(self):
+        """
+        Abandons the call and records the (estimated) tokens it spent or was spending as wasted.
+        """
+        if not self._future.cancel():
+            self._token.cancel("speculation_miss")
+            if self._started:
+                SPECULATIVE_SQL_WASTED_TOKENS.labels(direction="in").inc(estimate_tokens(self._prompt))
+            if self._response is not None:
+                SPECULATIVE_SQL_WASTED_TOKENS.labels(direction="out").inc(estimate_tokens(self._response))
+        self._unlink()
+
+    def close(self):
+        """
+        Called when the pipeline ends; cancels a speculation that was never resolved (e.g. classification failed).
+        """
+        if not self._resolved:
+            SPECULATIVE_SQL.labels(outcome="abandoned").inc()
+            self.cancel()
+        self._unlink()
+
+    def _unlink(self):
+        if self._linked:
+            self._linked = False
+            self._parent_link.__exit__(None, None, None)
+
+
+_predictor = VisualizationPredictor()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="speculative-sql")
+        return _executor
+
+
+def record_classification(question, visualization_type, reasoning_type):
+    if SPECULATIVE_SQL_ENABLED and visualization_type:
+        _predictor.record(question, visualization_type, reasoning_type)
+
+
+def start_speculation(question, build_prompt):
+    """
+    Sends the SQL prompt build_prompt(question, reasoning_type, visualization_type) for the predicted
+    visualization type. Returns the Speculation, or None when disabled or the question has not been seen before.
+    """
+    if not SPECULATIVE_SQL_ENABLED:
+        return None
+    prediction = _predictor.predict(question)
+    if prediction is None:
+        SPECULATIVE_SQL.labels(outcome="no_prediction").inc()
+        return None
+    visualization_type, reasoning_type = prediction
+    prompt = build_prompt(question, reasoning_type, visualization_type)
+    return Speculation(visualization_type, prompt, _get_executor())
@@ -0,0 +1,149 @@
+import json
+import numbers
+import os
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from utils.utils import estimate_tokens
+
+# Approximate token budget for the query-result data embedded in an LLM prompt
+PROMPT_DATA_TOKEN_BUDGET = int(os.getenv("PROMPT_DATA_TOKEN_BUDGET", "3000"))
+SIZE_PROBE_ROWS = 64
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def summarize_dataframe(df, token_budget=PROMPT_DATA_TOKEN_BUDGET, top_k=5, sample_size=20):
+    """
+    Returns the query result as JSON for a prompt, staying under `token_budget`.
+    Results that fit are sent verbatim (same as df.to_json(orient='records')); larger ones are replaced
+    by per-column statistics plus a small stratified sample, so prompt size is O(1) in result size.
+    The result is always valid JSON.
+    """
+    if df.empty or _projected_tokens(df) <= token_budget:
+        records_json = df.to_json(orient='records')
+        if estimate_tokens(records_json) <= token_budget:
+            return records_json
+
+    columns = {col: column_stats(df[col], top_k) for col in df.columns}
+    summary = {"row_count": len(df), "truncated": True, "columns": columns, "sample_rows": []}
+
+    # Shrink the sample first, then the category lists, until the summary fits the budget
+    while True:
+        summary["sample_rows"] = json.loads(stratified_sample(df, sample_size).to_json(orient='records'))
+        summary_json = json.dumps(summary, default=str)
+        if estimate_tokens(summary_json) <= token_budget:
+            return summary_json
+        if sample_size > 0:
+            sample_size //= 2
+        elif top_k > 1:
+            top_k //= 2
+            summary["columns"] = {col: column_stats(df[col], top_k) for col in df.columns}
+        else:
+            return _fit_columns(summary, token_budget)
+
+
+def _fit_columns(summary, token_budget):
+    """
+    Last resort for very wide results: keep only the basic statistics, then drop columns from the end.
+    """
+    columns = summary["columns"]
+    for stats in columns.values():
+        stats.pop("quantiles", None)
+        stats.pop("top", None)
+    names = list(columns)
+    while True:
+        summary_json = json.dumps(summary, default=str)
+        if estimate_tokens(summary_json) <= token_budget or not names:
+            return summary_json
+        del columns[names.pop()]
+        summary["omitted_columns"] = summary.get("omitted_columns", 0) + 1
+
+
+def column_stats(series, top_k=5):
+    """
+    Per-column statistics: count and nulls for all columns; min/max/mean/quantiles for numeric and
+    datetime columns; distinct count and top-k values for everything else.
+    """
+    series = _as_numeric(series)
+    values = series.to_numpy()
+    stats = {"count": int(series.notna().sum()), "nulls": int(series.isna().sum())}
+
+    if pd.api.types.is_bool_dtype(series) or not (pd.api.types.is_numeric_dtype(series)
+                                                   or pd.api.types.is_datetime64_any_dtype(series)):
+        counts = series.value_counts(dropna=True)
+        stats["distinct"] = int(len(counts))
+        stats["top"] = {str(k): int(v) for k, v in counts.head(top_k).items()}
+        return stats
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        non_null = series.dropna()
+        if not non_null.empty:
+            stats["min"] = str(non_null.min())
+            stats["max"] = str(non_null.max())
+        return stats
+
+    numeric = values.astype(float)
+    numeric = numeric[~np.isnan(numeric)]
+    if numeric.size:
+        stats["min"] = _round(np.min(numeric))
+        stats["max"] = _round(np.max(numeric))
+        stats["mean"] = _round(np.mean(numeric))
+        stats["quantiles"] = {f"p{int(q * 100)}": _round(v) for q, v in zip(QUANTILES, np.quantile(numeric, QUANTILES))}
+    return stats
+
+
+def _as_numeric(series):
+    # Postgres NUMERIC columns arrive as object dtype holding Decimal values
+    if series.dtype != object:
+        return series
+    non_null = series.dropna()
+    if non_null.empty or not all(isinstance(v, (Decimal, numbers.Number)) and not isinstance(v, bool)
+                                 for v in non_null):
+        return series
+    return pd.to_numeric(series)
+
+
+def stratified_sample(df, sample_size):
+    """
+    Deterministic sample with evenly spaced rows from every group of the lowest-cardinality categorical
+    column (e.g. `series` or `label`); falls back to evenly spaced rows overall.
+    """
+    if sample_size <= 0:
+        return df.iloc[0:0]
+    if len(df) <= sample_size:
+        return df
+
+    strata_column = _strata_column(df, sample_size)
+    if strata_column is None:
+        positions = np.unique(np.linspace(0, len(df) - 1, sample_size).astype(int))
+        return df.iloc[positions]
+
+    groups = df.groupby(strata_column, sort=False, dropna=False).indices
+    quota = max(1, sample_size // len(groups))
+    positions = np.concatenate([
+        group_positions[np.unique(np.linspace(0, len(group_positions) - 1, quota).astype(int))]
+        for group_positions in groups.values()
+    ])
+    return df.iloc[np.sort(positions)]
+
+
+def _strata_column(df, sample_size):
+    best = None
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            continue
+        distinct = df[col].nunique(dropna=False)
+        if 1 < distinct <= sample_size and (best is None or distinct < best[1]):
+            best = (col, distinct)
+    return best[0] if best else None
+
+
+def _projected_tokens(df):
+    probe = df.head(SIZE_PROBE_ROWS).to_json(orient='records')
+    return estimate_tokens(probe) * len(df) // max(1, min(len(df), SIZE_PROBE_ROWS))
+
+
+def _round(value):
+    return round(float(value), 4)
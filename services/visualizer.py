@@ -1,5 +1,10 @@
 import numpy as np
 
+VISUALIZATION_TYPES = [
+    "Knowledge Graph", "Causal Graph", "Process Flow", "Time Series Chart", "Comparative Bar Chart",
+    "Ranking Chart", "Pie Chart", "Histogram", "Multi-Series Time Series Chart"
+]
+
 
 def prepare_chart_data(df, visualization_type, graph_schema=None):
     def safe_get(col_name):
@@ -55,7 +60,8 @@ def prepare_chart_data(df, visualization_type, graph_schema=None):
             "type": visualization_type.lower().replace(' ', '_'),
             "data": {
                 "nodes": graph_schema.get("data_nodes") if graph_schema else [],
-                "edges": graph_schema.get("data_edges") if graph_schema else []
+                "edges": graph_schema.get("data_edges") if graph_schema else [],
+                "analytics": graph_schema.get("graph_analytics") if graph_schema else None
             }
         }
     elif visualization_type == "Multi-Series Time Series Chart":
@@ -0,0 +1,157 @@
+# services/warmup.py
+"""
+Per-worker warm-up and readiness.
+
+When a worker starts, the registered warm-up hooks run in a background thread. They open the DB pools, check
+the LLM backend, import the pipeline, render the schema prompt fragments and optionally replay the most-asked
+questions. /ready reports ready only once every required hook has succeeded; failed required hooks are retried
+every WARMUP_RETRY_SECONDS. Optional hooks run once, after the required ones, and never block readiness.
+Further hooks (e.g. loading a local classifier or embedding index) register with @warmup_hook.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Questions to run through the pipeline during warm-up; 0 disables the replay
+WARMUP_REPLAY_TOP_N = int(os.getenv("WARMUP_REPLAY_TOP_N", "0"))
+# Newline-separated questions to replay; without it, the most-hit answers in the shared cache are used
+WARMUP_QUESTIONS_PATH = os.getenv("WARMUP_QUESTIONS_PATH")
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+_hooks = []  # (name, function, required) in registration order
+_results = {}
+_lock = threading.Lock()
+_ready = threading.Event()
+_thread = None
+
+
+def warmup_hook(name, required=True):
+    """
+    Decorator registering a function to run during warm-up.
+    """
+    def register(function):
+        _hooks.append((name, function, required))
+        return function
+    return register
+
+
+def _run_hook(name, function, required):
+    started = time.perf_counter()
+    try:
+        function()
+        status, error = "ok", None
+    except Exception as e:
+        status, error = "failed", str(e)
+        logger.warning("Warm-up step failed", extra={"step": name, "required": required, "error": error})
+    with _lock:
+        _results[name] = {"status": status, "required": required,
+                          "duration_ms": round((time.perf_counter() - started) * 1000, 1), "error": error}
+    return status == "ok"
+
+
+def run_warmup():
+    """
+    Runs the required hooks that have not succeeded yet and, once they all have, the optional hooks.
+    Returns True (and marks the worker ready) when every required hook has succeeded.
+    """
+    ready = True
+    for name, function, required in _hooks:
+        if required and _results.get(name, {}).get("status") != "ok":
+            ready = _run_hook(name, function, required) and ready
+    if not ready:
+        return False
+    for name, function, required in _hooks:
+        if not required and name not in _results:
+            _run_hook(name, function, required)
+    _ready.set()
+    return True
+
+
+def _warmup_loop():
+    started = time.perf_counter()
+    while not run_warmup():
+        time.sleep(WARMUP_RETRY_SECONDS)
+    logger.info("Worker ready", extra={"warmup_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+
+def start_warmup():
+    """
+    Starts warm-up in a background thread, so liveness checks (/health) answer while it runs.
+    """
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_warmup_loop, name="warmup", daemon=True)
+        _thread.start()
+
+
+def readiness():
+    with _lock:
+        return {"ready": _ready.is_set(), "steps": {name: dict(result) for name, result in _results.items()}}
+
+
+@warmup_hook("database")
+def _open_database_pools():
+    from db.client import warm_up_pools
+
+    warm_up_pools()
+
+
+@warmup_hook("shared_cache")
+def _open_shared_cache():
+    from utils.cache import get_shared_cache
+
+    get_shared_cache()
+
+
+@warmup_hook("llm")
+def _check_llm():
+    from llm.openai_client import check_llm
+
+    check_llm()
+
+
+@warmup_hook("pipeline")
+def _import_pipeline():
+    # Deferred at startup to keep worker start-up fast (see benchmarks/bench_import_time.py)
+    import services.analyzer
+    import services.batch
+
+
+@warmup_hook("schema_prompts")
+def _render_schema_prompts():
+    from db.sql_validator import validate_sql
+    from llm.prompts import get_reasoning_prompt
+
+    # The schema text and the validator's table/column sets are built once and reused by every request
+    get_reasoning_prompt("")
+    validate_sql("SELECT 1")
+
+
+def _replay_questions(limit):
+    if WARMUP_QUESTIONS_PATH:
+        with open(WARMUP_QUESTIONS_PATH, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:limit]
+    from utils.cache import get_shared_cache
+
+    cache = get_shared_cache()
+    return cache.top_labels("answer", limit) if cache is not None else []
+
+
+@warmup_hook("replay_questions", required=False)
+def _replay_top_questions():
+    """
+    Runs the top questions through the full pipeline (not the answer cache), so this worker's code paths,
+    DB connections and prepared statements are warm and the shared LLM and SQL caches are filled.
+    """
+    if WARMUP_REPLAY_TOP_N <= 0:
+        return
+    from services.analyzer import run_reasoning_pipeline
+
+    questions = _replay_questions(WARMUP_REPLAY_TOP_N)
+    failed = sum(run_reasoning_pipeline(question).get("error") is not None for question in questions)
+    logger.info("Warm-up questions replayed", extra={"questions": len(questions), "failed": failed})
@@ -0,0 +1,35 @@
+import ipaddress
+import uuid
+
+from starlette.requests import Request
+
+import utils.admission as admission
+
+
+def make_request(client="203.0.113.9", headers=None):
+    raw_headers = [(name.encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "headers": raw_headers, "client": (client, 40000)})
+
+
+def test_rotating_an_unverified_api_key_does_not_change_the_key(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_API_KEYS", ("known-key",))
+    keys = {admission.client_key(make_request(headers={"x-api-key": uuid.uuid4().hex})) for _ in range(5)}
+    keys |= {admission.client_key(make_request(headers={"authorization": f"Bearer {uuid.uuid4().hex}"}))
+             for _ in range(5)}
+    assert keys == {"ip:203.0.113.9"}
+
+
+def test_configured_api_key_gets_its_own_share(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_API_KEYS", ("known-key",))
+    by_header = admission.client_key(make_request(headers={"x-api-key": "known-key"}))
+    by_bearer = admission.client_key(make_request(client="198.51.100.1",
+                                                  headers={"authorization": "Bearer known-key"}))
+    assert by_header == by_bearer
+    assert by_header.startswith("key:")
+
+
+def test_forwarded_for_is_only_trusted_from_configured_proxies(monkeypatch):
+    monkeypatch.setattr(admission, "TRUSTED_PROXIES", (ipaddress.ip_network("10.0.0.0/8"),))
+    assert admission.client_key(make_request(headers={"x-forwarded-for": "192.0.2.1"})) == "ip:203.0.113.9"
+    proxied = make_request(client="10.0.0.5", headers={"x-forwarded-for": "spoofed, 192.0.2.1, 10.1.1.1"})
+    assert admission.client_key(proxied) == "ip:192.0.2.1"
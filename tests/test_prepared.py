@@ -0,0 +1,68 @@
+from db.prepared import parameterize, prepared_statement
+
+
+class FakeConnection:
+    pass
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+
+def test_integer_literals_become_parameters():
+    template, literals = parameterize("SELECT name FROM workers WHERE age > 40 AND dept = 'Sales'")
+    assert template == "SELECT name FROM workers WHERE age > $1 AND dept = $2"
+    assert literals == ["40", "'Sales'"]
+
+
+def test_percentage_idioms_keep_decimal_literals_inline():
+    # A $n here would be inferred as bigint from COUNT(*) / the INT8 columns and truncate the result
+    assert parameterize("SELECT 100.0 * COUNT(*) / SUM(total) FROM t") == \
+        ("SELECT 100.0 * COUNT(*) / SUM(total) FROM t", [])
+    assert parameterize("SELECT high_risk * 1.0 / total AS share FROM t") == \
+        ("SELECT high_risk * 1.0 / total AS share FROM t", [])
+    assert parameterize("SELECT ROUND(100.0 * a / b, 2) FROM t WHERE c > 1e3") == \
+        ("SELECT ROUND(100.0 * a / b, $1) FROM t WHERE c > 1e3", ["2"])
+
+
+def test_case_results_stay_inline():
+    # As parameters the CASE would resolve to text: strings in the result, and 10 sorting before 9
+    template, literals = parameterize("SELECT CASE WHEN p > 0.7 THEN 10 WHEN p > 3 THEN 5 ELSE 9 END AS score "
+                                      "FROM t ORDER BY CASE WHEN p > 0.7 THEN 10 ELSE 9 END")
+    assert template == ("SELECT CASE WHEN p > 0.7 THEN 10 WHEN p > $1 THEN 5 ELSE 9 END AS score "
+                        "FROM t ORDER BY CASE WHEN p > 0.7 THEN 10 ELSE 9 END")
+    assert literals == ["3"]
+    assert parameterize("SELECT SUM(CASE WHEN dept = 'IT' THEN 1 ELSE 0 END) FROM t") == \
+        ("SELECT SUM(CASE WHEN dept = $1 THEN 1 ELSE 0 END) FROM t", ["'IT'"])
+
+
+def test_type_modifiers_stay_inline():
+    template, literals = parameterize("SELECT CAST(AVG(salary) AS NUMERIC(10,2)), name::varchar(64) FROM t "
+                                      "WHERE id = 7")
+    assert template == "SELECT CAST(AVG(salary) AS NUMERIC(10,2)), name::varchar(64) FROM t WHERE id = $1"
+    assert literals == ["7"]
+
+
+def test_positions_counts_and_typed_literals_stay_inline():
+    sql = "SELECT dept, COUNT(*) FROM t WHERE hired > DATE '2024-01-01' GROUP BY 1 ORDER BY 2 DESC LIMIT 10"
+    assert parameterize(sql) == (sql, [])
+
+
+def test_repeated_literals_share_a_parameter():
+    template, literals = parameterize("SELECT DATE_TRUNC('month', d) FROM t GROUP BY DATE_TRUNC('month', d)")
+    assert template == "SELECT DATE_TRUNC($1, d) FROM t GROUP BY DATE_TRUNC($1, d)"
+    assert literals == ["'month'"]
+
+
+def test_prepared_statement_prepares_once_per_connection():
+    connection, cursor = FakeConnection(), RecordingCursor()
+    first = prepared_statement(connection, cursor, "SELECT 100.0 * a / b FROM t WHERE id = 3;")
+    second = prepared_statement(connection, cursor, "SELECT 100.0 * a / b FROM t WHERE id = 4")
+    prepares = [sql for sql in cursor.executed if sql.startswith("PREPARE")]
+    assert len(prepares) == 1
+    assert prepares[0].endswith("AS SELECT 100.0 * a / b FROM t WHERE id = $1")
+    assert first.endswith("(3)") and second.endswith("(4)")
@@ -0,0 +1,30 @@
+import pytest
+
+from db.sql_validator import SQLValidationError, check_sql
+
+
+def test_nulls_last_is_not_a_column():
+    check_sql("SELECT industry_name, COUNT(*) AS value FROM dim_industry GROUP BY industry_name "
+              "ORDER BY value DESC NULLS LAST")
+    check_sql("SELECT sector FROM dim_industry ORDER BY sector NULLS FIRST")
+
+
+def test_at_time_zone_is_not_a_column():
+    check_sql("SELECT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC') AS now_utc, sector FROM dim_industry")
+    check_sql("SELECT (LOCALTIMESTAMP AT LOCAL) AS now, sector FROM dim_industry")
+
+
+def test_fetch_first_rows_with_ties():
+    check_sql("SELECT sector FROM dim_industry ORDER BY sector FETCH FIRST 5 ROWS WITH TIES")
+
+
+def test_unknown_column_is_still_rejected():
+    with pytest.raises(SQLValidationError) as e:
+        check_sql("SELECT sectr FROM dim_industry ORDER BY sectr NULLS LAST")
+    assert "Column 'sectr' does not exist" in str(e.value)
+    assert "'last'" not in str(e.value)
+
+
+def test_writes_are_rejected():
+    with pytest.raises(SQLValidationError):
+        check_sql("DELETE FROM dim_industry")
@@ -0,0 +1,292 @@
+# utils/admission.py
+"""
+Admission control for the expensive endpoints.
+
+At most ADMISSION_MAX_CONCURRENCY requests run at once per worker; up to ADMISSION_QUEUE_SIZE more wait, for
+at most ADMISSION_QUEUE_TIMEOUT_SECONDS. When a slot frees up it goes to the waiting client with the fewest
+requests running, so one busy client cannot starve the others, and a single client may only have
+ADMISSION_CLIENT_QUEUE_SIZE requests waiting. Everything else is shed at once: 429 when the client is over its
+share, 503 when the worker is full, both with Retry-After.
+
+Clients can send X-Request-Deadline (Unix time in seconds). A request still queued at its deadline is dropped,
+and the pipeline checks the deadline between stages (see check_deadline).
+"""
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import ipaddress
+import logging
+import math
+import os
+import time
+from collections import Counter, OrderedDict, deque
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from utils.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS, \
+    DEADLINE_EXCEEDED
+
+# Per worker process; 0 disables admission control
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_CLIENT_QUEUE_SIZE = int(os.getenv("ADMISSION_CLIENT_QUEUE_SIZE", "8"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "15"))
+# Comma-separated path prefixes that go through admission control
+ADMISSION_PATHS = tuple(filter(None, os.getenv("ADMISSION_PATHS", "/api/ask-question").split(",")))
+# Comma-separated addresses or CIDR ranges of the reverse proxies whose X-Forwarded-For is believed
+TRUSTED_PROXIES = tuple(ipaddress.ip_network(proxy.strip(), strict=False)
+                        for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip())
+# Comma-separated API keys that get their own fair share; any other key is shared out by IP address
+ADMISSION_API_KEYS = tuple(key.strip() for key in os.getenv("ADMISSION_API_KEYS", "").split(",") if key.strip())
+
+DEADLINE_HEADER = "x-request-deadline"
+
+REJECTION_MESSAGES = {
+    "queue_full": "Server is overloaded; retry later",
+    "client_share": "Too many requests in flight for this client; retry later",
+    "queue_timeout": "Timed out waiting for capacity; retry later",
+    "deadline": "Request deadline passed before it could start"
+}
+
+logger = logging.getLogger(__name__)
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded, per-client fair wait queue. Only used from the event loop, so it needs
+    no locks.
+    """
+
+    def __init__(self, max_concurrency=ADMISSION_MAX_CONCURRENCY, queue_size=ADMISSION_QUEUE_SIZE,
+                 client_queue_size=ADMISSION_CLIENT_QUEUE_SIZE, queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.client_queue_size = client_queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._active_by_client = Counter()
+        self._waiting = OrderedDict()  # client -> deque of futures, oldest-waiting client first
+        # Moving average of how long a request holds its slot, for Retry-After
+        self._service_seconds = 1.0
+
+    def retry_after(self):
+        """
+        Seconds until the current queue has likely drained, rounded up.
+        """
+        return max(1, math.ceil(self._service_seconds * (self.queued + 1) / max(self.max_concurrency, 1)))
+
+    def _reject(self, status_code, reason):
+        ADMISSION_REJECTED.labels(reason=reason).inc()
+        raise AdmissionRejected(status_code, reason, self.retry_after())
+
+    async def acquire(self, client, deadline=None):
+        """
+        Waits for a slot; raises AdmissionRejected when the request is shed. Pair with release().
+        """
+        if self.active < self.max_concurrency and not self._waiting:
+            self._grant(client)
+            ADMISSION_WAIT_SECONDS.observe(0)
+            return
+        if self.queued >= self.queue_size:
+            self._reject(503, "queue_full")
+        if len(self._waiting.get(client, ())) >= self.client_queue_size:
+            self._reject(429, "client_share")
+
+        timeout = self.queue_timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+            if timeout <= 0:
+                self._reject(504, "deadline")
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(client, deque()).append(future)
+        self.queued += 1
+        ADMISSION_QUEUED.set(self.queued)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._remove_waiter(client, future)
+            self._reject(504 if deadline is not None and time.time() >= deadline else 503, "queue_timeout")
+        except BaseException:
+            # Client went away while queued; hand back a slot granted in the meantime
+            if future.done() and not future.cancelled():
+                self.release(client, 0)
+            else:
+                self._remove_waiter(client, future)
+            raise
+        finally:
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+    def release(self, client, held_seconds):
+        self.active -= 1
+        self._active_by_client[client] -= 1
+        if self._active_by_client[client] <= 0:
+            del self._active_by_client[client]
+        ADMISSION_ACTIVE.set(self.active)
+        if held_seconds:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * held_seconds
+        self._grant_waiting()
+
+    def _grant(self, client):
+        self.active += 1
+        self._active_by_client[client] += 1
+        ADMISSION_ACTIVE.set(self.active)
+
+    def _grant_waiting(self):
+        while self.active < self.max_concurrency and self._waiting:
+            # Fair share: the waiting client with the fewest running requests; ties go to the longest-waiting one
+            client = min(self._waiting, key=lambda c: self._active_by_client[c])
+            waiters = self._waiting.pop(client)
+            future = waiters.popleft()
+            if waiters:
+                self._waiting[client] = waiters  # back of the line for its next request
+            self.queued -= 1
+            ADMISSION_QUEUED.set(self.queued)
+            if future.done():
+                continue
+            self._grant(client)
+            future.set_result(None)
+
+    def _remove_waiter(self, client, future):
+        waiters = self._waiting.get(client)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiting[client]
+            self.queued -= 1
+            ADMISSION_QUEUED.set(self.queued)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to ADMISSION_PATHS. The slot is held until the response,
+    including a streamed body, has been sent, and the request's deadline is visible to check_deadline.
+    """
+
+    def __init__(self, app, controller=None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or self.controller.max_concurrency <= 0
+                or not scope["path"].startswith(ADMISSION_PATHS)):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        client = client_key(request)
+        deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+        try:
+            await self.controller.acquire(client, deadline)
+        except AdmissionRejected as e:
+            logger.warning("Request shed", extra={
+                "path": scope["path"], "client": client, "reason": e.reason, "status": e.status_code,
+                "active": self.controller.active, "queued": self.controller.queued
+            })
+            response = JSONResponse({"detail": REJECTION_MESSAGES[e.reason]}, status_code=e.status_code,
+                                    headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = set_deadline(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
+            self.controller.release(client, time.perf_counter() - started)
+
+
+def client_key(request):
+    """
+    Who a request is fair-shared as: its API key (hashed) if it is one of ADMISSION_API_KEYS, else its IP address.
+    Unverified keys and X-Forwarded-For from outside TRUSTED_PROXIES are ignored, since otherwise a client could
+    get a fresh fair share per request by changing the header.
+    """
+    api_key = _verified_api_key(request)
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    address = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and _is_trusted_proxy(address):
+        # The client is the nearest address that is not one of our proxies (proxies append to the header)
+        for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+            address = hop
+            if not _is_trusted_proxy(hop):
+                break
+    return "ip:" + address
+
+
+def _verified_api_key(request):
+    api_key = request.headers.get("x-api-key") or request.headers.get("authorization") or ""
+    if api_key.lower().startswith("bearer "):
+        api_key = api_key[len("bearer "):].strip()
+    if not api_key:
+        return None
+    matches = [hmac.compare_digest(api_key.encode("utf-8"), key.encode("utf-8")) for key in ADMISSION_API_KEYS]
+    return api_key if any(matches) else None
+
+
+def _is_trusted_proxy(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def parse_deadline(value):
+    """
+    X-Request-Deadline value → Unix time in seconds, or None when absent or malformed.
+    """
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def set_deadline(deadline):
+    """
+    Sets the deadline for the current request context; returns a token for reset_deadline.
+    """
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def current_deadline():
+    return _deadline.get()
+
+
+def deadline_exceeded():
+    deadline = _deadline.get()
+    return deadline is not None and time.time() >= deadline
+
+
+def check_deadline(stage=None):
+    """
+    Raises DeadlineExceeded when the current request's deadline has passed. Suitable as a pipeline `progress`
+    callback, which is called with the name of each stage as it starts.
+    """
+    deadline = _deadline.get()
+    if deadline is not None and time.time() >= deadline:
+        DEADLINE_EXCEEDED.labels(stage=stage or "unknown").inc()
+        raise DeadlineExceeded(f"Request deadline passed before stage '{stage}'")
@@ -0,0 +1,169 @@
+# utils/cache.py
+"""
+Cross-process cache for LLM replies, SQL results and whole answers.
+
+Entries live in one SQLite file in WAL mode, so with several gunicorn/uvicorn workers a result computed by one
+worker is served to all of them (readers never block the writer). Values are pickled; keys are hashed. Each kind
+has its own TTL, and the oldest entries are dropped once the file holds more than SHARED_CACHE_MAX_ENTRIES.
+Disabled unless SHARED_CACHE=sqlite (gunicorn.conf.py turns it on).
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from utils.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# "sqlite" or "off"
+SHARED_CACHE = os.getenv("SHARED_CACHE", "off")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "cache.sqlite3")
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "10000"))
+# Per-kind TTLs. LLM replies are deterministic (temperature 0); SQL results and answers go stale as data changes.
+SHARED_CACHE_TTL_SECONDS = {
+    "llm": float(os.getenv("SHARED_CACHE_LLM_TTL_SECONDS", "86400")),
+    "sql": float(os.getenv("SHARED_CACHE_SQL_TTL_SECONDS", "600")),
+    "answer": float(os.getenv("SHARED_CACHE_ANSWER_TTL_SECONDS", "600"))
+}
+
+PURGE_INTERVAL_SECONDS = 60
+
+
+class SQLiteCache:
+    """
+    Key/value store in a SQLite file shared by every worker process. Each thread keeps its own connection.
+    """
+
+    def __init__(self, path, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._last_purge = 0.0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, kind TEXT NOT NULL, value BLOB NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, label TEXT, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS cache_created_at ON cache (created_at)")
+        connection.commit()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # WAL makes NORMAL durable enough for a cache and avoids an fsync per write
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _key(kind, key):
+        return hashlib.sha256(f"{kind}\0{key}".encode("utf-8")).hexdigest()
+
+    def get(self, kind, key):
+        connection = self._connection()
+        hashed = self._key(kind, key)
+        row = connection.execute(
+            "SELECT value, label FROM cache WHERE key = ? AND expires_at > ?", (hashed, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None:
+            # Hits are only counted for labelled entries (see top_labels)
+            connection.execute("UPDATE cache SET hits = hits + 1 WHERE key = ?", (hashed,))
+        return pickle.loads(row[0])
+
+    def set(self, kind, key, value, ttl, label=None):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, kind, value, created_at, expires_at, label) VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(kind, key), kind, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, now + ttl, label)
+        )
+        if now - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            self.purge(now)
+
+    def purge(self, now=None):
+        """
+        Drops expired entries, then the oldest ones beyond max_entries.
+        """
+        connection = self._connection()
+        connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now or time.time(),))
+        connection.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def top_labels(self, kind, limit):
+        """
+        Labels of the most-hit live entries of `kind`, most hits first.
+        """
+        rows = self._connection().execute(
+            "SELECT label FROM cache WHERE kind = ? AND label IS NOT NULL AND expires_at > ? "
+            "ORDER BY hits DESC, created_at DESC LIMIT ?", (kind, time.time(), limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """
+    The process-wide SQLiteCache, or None when SHARED_CACHE is off.
+    """
+    global _cache
+    if SHARED_CACHE != "sqlite":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteCache(SHARED_CACHE_PATH)
+        return _cache
+
+
+def shared_cached(kind, key, compute, keep=lambda value: value is not None, label=None):
+    """
+    Returns the cached value for (kind, key), or compute()'s result, which is stored when keep(result) is true.
+    A `label` (e.g. the question text) makes the entry's hits countable through SQLiteCache.top_labels.
+    Cache errors are logged and never fail the caller.
+    """
+    cache = get_shared_cache()
+    if cache is None:
+        return compute()
+    try:
+        value = cache.get(kind, key)
+    except Exception as e:
+        logger.warning("Shared cache read failed", extra={"kind": kind, "error": str(e)})
+        value = None
+    if value is not None:
+        CACHE_REQUESTS.labels(cache=f"shared_{kind}", result="hit").inc()
+        return value
+
+    CACHE_REQUESTS.labels(cache=f"shared_{kind}", result="miss").inc()
+    value = compute()
+    if keep(value):
+        try:
+            cache.set(kind, key, value, SHARED_CACHE_TTL_SECONDS[kind], label)
+        except Exception as e:
+            logger.warning("Shared cache write failed", extra={"kind": kind, "error": str(e)})
+    return value
+
+
+def close_shared_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
@@ -0,0 +1,178 @@
+# utils/cancellation.py
+"""
+Cooperative cancellation of abandoned requests.
+
+Each guarded request gets a CancellationToken, made current for the request's context (and handed to batch
+worker threads). CancellationMiddleware cancels it when the client disconnects or the request's
+X-Request-Deadline passes. The pipeline checks the token between stages (check_cancelled), and code waiting on
+an external system registers an abort with token.on_cancel(): the OpenAI call closes its HTTP connection and
+the DB query sends a cancel request (what pg_cancel_backend does), so abandoned work stops spending tokens
+and database time.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from utils.admission import current_deadline
+from utils.metrics import REQUESTS_CANCELLED
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated path prefixes whose requests are cancelled when the client goes away
+CANCELLATION_PATHS = tuple(filter(None, os.getenv("CANCELLATION_PATHS", "/api/ask-question").split(",")))
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    """
+    Thread-safe, one-way cancelled flag with abort callbacks for in-flight work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason="cancelled"):
+        """
+        Marks the token cancelled and runs the registered abort callbacks (in the calling thread).
+        """
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks = list(self._callbacks.values())
+        REQUESTS_CANCELLED.labels(reason=reason).inc()
+        logger.info("Request cancelled", extra={"reason": reason, "in_flight_calls": len(callbacks)})
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Cancellation callback failed", extra={"error": str(e)})
+
+    def raise_if_cancelled(self, stage=None):
+        if self.reason is not None:
+            raise RequestCancelled(f"Request cancelled ({self.reason}) before stage '{stage}'")
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback):
+        """
+        Calls `callback` if the token is cancelled while the block runs. Raises RequestCancelled up front when
+        it already is, so no new work is started.
+        """
+        key = object()
+        with self._lock:
+            self.raise_if_cancelled()
+            self._callbacks[key] = callback
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._callbacks.pop(key, None)
+
+
+class _NeverCancelled(CancellationToken):
+    """
+    Token for work outside a guarded request (jobs, batch CLI, benchmarks): nothing to register or check.
+    """
+
+    def cancel(self, reason="cancelled"):
+        pass
+
+    def raise_if_cancelled(self, stage=None):
+        pass
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback):
+        yield
+
+
+NEVER_CANCELLED = _NeverCancelled()
+
+_current_token = contextvars.ContextVar("cancellation_token", default=NEVER_CANCELLED)
+
+
+def current_token():
+    return _current_token.get()
+
+
+@contextlib.contextmanager
+def cancellation_scope(token):
+    """
+    Makes `token` the current token in this context (thread), e.g. in a worker thread serving the request.
+    """
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def check_cancelled(stage=None):
+    """
+    Raises RequestCancelled when the current request has been cancelled. Usable as a pipeline `progress` callback.
+    """
+    _current_token.get().raise_if_cancelled(stage)
+
+
+class CancellationMiddleware:
+    """
+    ASGI middleware giving each request on CANCELLATION_PATHS a CancellationToken. Once the request body has been
+    read, a watcher waits for the client to disconnect (or the deadline to pass) and cancels the token.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(CANCELLATION_PATHS):
+            await self.app(scope, receive, send)
+            return
+        token = CancellationToken()
+        body_read = asyncio.Event()
+        response_sent = asyncio.Event()
+
+        async def receive_request():
+            message = await receive()
+            if message["type"] == "http.disconnect" and not response_sent.is_set():
+                token.cancel("client_disconnected")
+            elif not message.get("more_body", False):
+                body_read.set()
+            return message
+
+        async def send_response(message):
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent.set()
+            await send(message)
+
+        async def watch():
+            await body_read.wait()
+            deadline = current_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                message = await asyncio.wait_for(receive(), timeout)
+            except asyncio.TimeoutError:
+                if not response_sent.is_set():
+                    token.cancel("deadline")
+                return
+            # Servers also report a disconnect once the response is complete; that is not an abandoned request
+            if message["type"] == "http.disconnect" and not response_sent.is_set():
+                token.cancel("client_disconnected")
+
+        watcher = asyncio.create_task(watch())
+        try:
+            with cancellation_scope(token):
+                await self.app(scope, receive_request, send_response)
+        finally:
+            watcher.cancel()
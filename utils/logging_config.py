@@ -0,0 +1,143 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+from utils.tracing import current_trace_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per-logger levels, e.g. "pipeline.sql=DEBUG,pipeline.answer=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Fraction of log calls that attach their large payload (LLM responses, SQL, graph schemas)
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+_traceback_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, message, trace_id, any `extra=` fields and the exception.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", None)
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Stamps the current trace id on the record. Runs in the calling thread, before the record is queued.
+    """
+
+    def filter(self, record):
+        if not hasattr(record, "trace_id"):
+            record.trace_id = current_trace_id()
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        """
+        Unlike QueueHandler.prepare, leaves the traceback out of `msg`: it is rendered to exc_text here (the
+        traceback objects are dropped) and formatted by the listener's formatter, e.g. as the JSON "exception".
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Drop rather than block the request path when the writer falls behind
+            pass
+
+
+def configure_logging():
+    """
+    Routes all logging through a bounded queue to a background writer thread, so request threads
+    never block on stdout. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(TraceIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    for entry in filter(None, (part.strip() for part in LOG_LEVELS.split(","))):
+        name, _, level = entry.partition("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """
+    Flushes queued records and stops the writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_payload(logger, level, message, payload, name="payload", **fields):
+    """
+    Logs `message` with the payload size always, and the payload itself (truncated to LOG_PAYLOAD_MAX_CHARS)
+    only for a LOG_PAYLOAD_SAMPLE_RATE sample of calls, or whenever the logger is at DEBUG.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    extra = dict(fields)
+    extra[f"{name}_chars"] = len(text)
+    if logger.isEnabledFor(logging.DEBUG) or random.random() < LOG_PAYLOAD_SAMPLE_RATE:
+        extra[name] = text[:LOG_PAYLOAD_MAX_CHARS]
+        if len(text) > LOG_PAYLOAD_MAX_CHARS:
+            extra[f"{name}_truncated"] = True
+    logger.log(level, message, extra=extra)
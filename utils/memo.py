@@ -0,0 +1,77 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from utils.metrics import CACHE_REQUESTS
+
+_active_memo = contextvars.ContextVar("active_memo", default=None)
+
+
+class BatchMemo:
+    """
+    Thread-safe memo shared by all questions of one batch. Concurrent callers with the same key wait for
+    the first computation instead of repeating it. Failed computations (exceptions or None) are not kept.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute, cache_name="batch"):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"ready": threading.Event(), "value": None, "error": None}
+                self._entries[key] = entry
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.hits += 1
+        CACHE_REQUESTS.labels(cache=cache_name, result="miss" if owner else "hit").inc()
+
+        if not owner:
+            entry["ready"].wait()
+            if entry["error"] is not None:
+                raise entry["error"]
+            return entry["value"]
+
+        try:
+            entry["value"] = compute()
+        except Exception as e:
+            entry["error"] = e
+            raise
+        finally:
+            if entry["error"] is not None or entry["value"] is None:
+                with self._lock:
+                    self._entries.pop(key, None)
+            entry["ready"].set()
+        return entry["value"]
+
+
+@contextmanager
+def memo_scope(memo):
+    """
+    Makes `memo` the active memo for LLM and SQL calls made in this context (thread).
+    """
+    token = _active_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _active_memo.reset(token)
+
+
+def memoized(kind, key, compute):
+    """
+    Returns compute() through the active batch memo, or calls it directly when no batch is running.
+    """
+    memo = _active_memo.get()
+    if memo is None:
+        return compute()
+    return memo.get_or_compute((kind, key), compute, cache_name=f"batch_{kind}")
+
+
+def memo_active():
+    return _active_memo.get() is not None
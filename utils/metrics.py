@@ -0,0 +1,80 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from utils.tracing import span, get_trace_attribute
+
+# Buckets cover fast pandas/parsing work (ms) up to slow LLM calls (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "pipeline_stage_duration_seconds", "Duration of each reasoning pipeline stage",
+    ["stage", "visualization_type"], buckets=LATENCY_BUCKETS
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "Duration of OpenAI chat completion calls", buckets=LATENCY_BUCKETS
+)
+LLM_REQUESTS = Counter("llm_requests_total", "OpenAI chat completion calls", ["status"])
+LLM_TOKENS = Counter("llm_tokens_total", "OpenAI tokens used", ["direction"])
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Duration of Postgres queries", buckets=LATENCY_BUCKETS
+)
+DB_ROWS = Counter("db_rows_returned_total", "Rows returned by Postgres queries")
+DB_ERRORS = Counter("db_query_errors_total", "Postgres queries that raised an error")
+DB_REJECTED = Counter("db_queries_rejected_total", "Generated queries rejected or rewritten before or during execution",
+                      ["reason"])
+# Gauges say how to combine worker processes under PROMETHEUS_MULTIPROC_DIR; the "live" modes drop workers that
+# have exited (recycled by gunicorn's max_requests), which would otherwise be exported as frozen per-pid series
+DB_HOST_OUTSTANDING = Gauge("db_host_outstanding_queries", "Queries currently running per database host", ["host"],
+                            multiprocess_mode="livesum")
+DB_HOST_HEALTHY = Gauge("db_host_healthy", "1 if the database host passed its last health check", ["host"],
+                        multiprocess_mode="livemin")
+DB_HOST_LAG_SECONDS = Gauge("db_host_replication_lag_seconds", "Replication lag per database host", ["host"],
+                            multiprocess_mode="livemax")
+DB_FAILOVERS = Counter("db_failovers_total", "Reads retried on the primary after a replica failed")
+SQL_REPAIRS = Counter("sql_repairs_total", "LLM repair attempts for rejected SQL", ["outcome"])
+SPECULATIVE_SQL = Counter("speculative_sql_total", "Speculative SQL generations by outcome", ["outcome"])
+SPECULATIVE_SQL_WASTED_TOKENS = Counter(
+    "speculative_sql_wasted_tokens_total", "Estimated tokens spent on discarded speculative SQL generations",
+    ["direction"]
+)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups", ["cache", "result"])
+PARSE_FAILURES = Counter("llm_parse_failures_total", "LLM responses that could not be parsed", ["parser"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled", multiprocess_mode="livesum")
+ADMISSION_ACTIVE = Gauge("admission_active_requests", "Requests holding an admission slot",
+                         multiprocess_mode="livesum")
+ADMISSION_QUEUED = Gauge("admission_queued_requests", "Requests waiting for an admission slot",
+                         multiprocess_mode="livesum")
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests shed by admission control", ["reason"])
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Time spent waiting for an admission slot", buckets=LATENCY_BUCKETS
+)
+REQUESTS_CANCELLED = Counter("requests_cancelled_total", "Requests whose remaining work was cancelled", ["reason"])
+DEADLINE_EXCEEDED = Counter("request_deadline_exceeded_total", "Requests abandoned at their client deadline",
+                            ["stage"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests",
+    ["method", "path", "status"], buckets=LATENCY_BUCKETS
+)
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Records the duration of a pipeline stage in pipeline_stage_duration_seconds{stage, visualization_type}
+    and opens a trace span of the same name.
+    """
+    start = time.perf_counter()
+    try:
+        with span(stage) as stage_span:
+            yield stage_span
+    finally:
+        PIPELINE_STAGE_SECONDS.labels(
+            stage=stage,
+            visualization_type=get_trace_attribute("visualization_type", "unknown")
+        ).observe(time.perf_counter() - start)
+
+
+def record_parse_failure(parser):
+    PARSE_FAILURES.labels(parser=parser).inc()
@@ -0,0 +1,193 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from utils.tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+# Keep profiles of requests slower than this, plus a random 1-in-N sample (0 disables sampling)
+PROFILER_SLOW_THRESHOLD_SECONDS = float(os.getenv("PROFILER_SLOW_THRESHOLD_SECONDS", "10"))
+PROFILER_SAMPLE_ONE_IN = int(os.getenv("PROFILER_SAMPLE_ONE_IN", "0"))
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.01"))
+PROFILER_DIR = os.getenv("PROFILER_DIR", "profiles")
+PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", "100"))
+
+PROFILE_SUFFIX = ".collapsed"
+
+
+class _Session:
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.wall = Counter()
+        self.cpu = Counter()
+        self.clock_id = _cpu_clock_id(thread_id)
+        self.last_cpu = _cpu_time(self.clock_id)
+
+
+class SamplingProfiler:
+    """
+    Pure-Python statistical profiler. A daemon thread wakes every `interval` seconds and records the
+    stack of every registered thread (sys._current_frames):
+    - wall profile: one count per sample, whatever the thread is doing (including waiting on I/O);
+    - CPU profile: the thread's CPU time since the previous sample (in µs), charged to the current stack.
+    Output is in the collapsed-stack format used by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL_SECONDS):
+        self.interval = interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start_session(self, thread_id):
+        session = _Session(thread_id)
+        with self._lock:
+            self._sessions[thread_id] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop_session(self, session):
+        """
+        Unregisters the session; its counters are final once this returns.
+        """
+        with self._lock:
+            self._sessions.pop(session.thread_id, None)
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            # Sessions are updated under the lock, so stop_session() never races a sample in progress
+            with self._lock:
+                if self._sessions:
+                    self._sample(list(self._sessions.values()))
+
+    def _sample(self, sessions):
+        frames = sys._current_frames()
+        for session in sessions:
+            frame = frames.get(session.thread_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            session.wall[stack] += 1
+            cpu_now = _cpu_time(session.clock_id)
+            if cpu_now is not None and session.last_cpu is not None:
+                cpu_us = int((cpu_now - session.last_cpu) * 1e6)
+                if cpu_us > 0:
+                    session.cpu[stack] += cpu_us
+            session.last_cpu = cpu_now
+
+
+profiler = SamplingProfiler()
+
+
+@contextmanager
+def profile_request(name):
+    """
+    Profiles the current thread for the duration of the block when PROFILER_ENABLED is set, and keeps the
+    result if the block was slower than PROFILER_SLOW_THRESHOLD_SECONDS or drawn in the 1-in-N sample.
+    """
+    if not PROFILER_ENABLED:
+        yield
+        return
+
+    sampled = PROFILER_SAMPLE_ONE_IN > 0 and random.randrange(PROFILER_SAMPLE_ONE_IN) == 0
+    session = profiler.start_session(threading.get_ident())
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.stop_session(session)
+        duration = time.perf_counter() - start
+        if duration >= PROFILER_SLOW_THRESHOLD_SECONDS or sampled:
+            try:
+                reason = "slow" if duration >= PROFILER_SLOW_THRESHOLD_SECONDS else "sampled"
+                write_profile(name, session, duration, reason)
+            except Exception as e:
+                # Never fail the profiled request because its profile could not be saved
+                logger.warning("Could not write profile", extra={"error": str(e)})
+
+
+def write_profile(name, session, duration, reason):
+    os.makedirs(PROFILER_DIR, exist_ok=True)
+    stem = (f"{time.strftime('%Y%m%dT%H%M%S')}-{name}-{reason}-{int(duration * 1000)}ms-"
+            f"{current_trace_id() or 'notrace'}")
+    for kind, counts in (("wall", session.wall), ("cpu", session.cpu)):
+        if not counts:
+            continue
+        path = os.path.join(PROFILER_DIR, f"{stem}-{kind}{PROFILE_SUFFIX}")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+    logger.info("Profile written", extra={"profile": stem, "duration_ms": int(duration * 1000), "reason": reason})
+    _rotate()
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILER_DIR):
+        return []
+    entries = []
+    for entry in os.scandir(PROFILER_DIR):
+        if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # rotated away by a concurrent request
+            entries.append({"name": entry.name, "size": stat.st_size, "modified": stat.st_mtime})
+    return sorted(entries, key=lambda e: e["modified"], reverse=True)
+
+
+def profile_path(name):
+    """
+    Returns the path of a listed profile, or None (names are matched against the directory, never joined blindly).
+    """
+    if name in {entry["name"] for entry in list_profiles()}:
+        return os.path.join(PROFILER_DIR, name)
+    return None
+
+
+def _rotate():
+    for entry in list_profiles()[PROFILER_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILER_DIR, entry["name"]))
+        except OSError:
+            pass
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{_short_path(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _short_path(filename):
+    # Keep the last two path components, e.g. "pandas/merge.py" or "services/analyzer.py"
+    parts = filename.replace("\\", "/").split("/")
+    return "/".join(parts[-2:]).replace(" ", "_")
+
+
+def _cpu_clock_id(thread_id):
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None
+
+
+def _cpu_time(clock_id):
+    if clock_id is None:
+        return None
+    try:
+        return time.clock_gettime(clock_id)
+    except OSError:
+        return None
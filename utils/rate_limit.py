@@ -0,0 +1,34 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: allows `rate_per_minute` acquisitions per minute with bursts up to `burst`.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_minute=0, burst=None):
+        self._lock = threading.Lock()
+        self.configure(rate_per_minute, burst)
+
+    def configure(self, rate_per_minute, burst=None):
+        with self._lock:
+            self.rate_per_second = rate_per_minute / 60.0
+            self.capacity = float(burst if burst is not None else max(1.0, self.rate_per_second))
+            self._tokens = self.capacity
+            self._updated = time.monotonic()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if self.rate_per_second <= 0:
+                    return
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate_per_second
+            time.sleep(wait)
@@ -0,0 +1,253 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Append one OTLP-JSON document per trace to this file, and/or POST it to an OTLP/HTTP collector
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+TRACE_COLLECTOR_URL = os.getenv("TRACE_COLLECTOR_URL")  # e.g. http://otel-collector:4318/v1/traces
+SERVICE_NAME = os.getenv("SERVICE_NAME", "ox4-capstone-api")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_trace_id = contextvars.ContextVar("current_trace_id", default=None)
+
+
+class Span:
+    def __init__(self, name, trace_id, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._start_perf = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self._start_perf
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def root(self):
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    def to_tree(self):
+        """
+        Nested {name, duration_ms, attributes, error, children} view, returned inline for ?debug_timing=1.
+        """
+        return {
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+            "children": [child.to_tree() for child in self.children]
+        }
+
+    def iter_spans(self):
+        yield self
+        for child in self.children:
+            yield from child.iter_spans()
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def new_trace_id(incoming=None):
+    """
+    Returns a 32-hex-character trace id, reusing a valid incoming id (e.g. from X-Trace-Id).
+    """
+    if incoming and len(incoming) == 32 and all(c in "0123456789abcdef" for c in incoming.lower()):
+        return incoming.lower()
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def trace_id_scope(trace_id):
+    token = _current_trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _current_trace_id.reset(token)
+
+
+def current_trace_id():
+    return _current_trace_id.get()
+
+
+@contextmanager
+def start_trace(name, **attributes):
+    """
+    Opens the root span of a trace and exports the finished span tree when the block exits.
+    """
+    trace_id = _current_trace_id.get() or new_trace_id()
+    root = Span(name, trace_id, attributes=attributes)
+    span_token = _current_span.set(root)
+    id_token = _current_trace_id.set(trace_id)
+    error = None
+    try:
+        yield root
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        root.finish(error)
+        _current_span.reset(span_token)
+        _current_trace_id.reset(id_token)
+        export_trace(root)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Opens a child span of the current span. Outside a trace this is a no-op.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(name, parent.trace_id, parent=parent, attributes=attributes)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    error = None
+    try:
+        yield child
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        child.finish(error)
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace_or_span(name, **attributes):
+    """
+    Opens a child span inside an active trace, or starts a new trace (e.g. for jobs and batch workers).
+    """
+    if _current_span.get() is None:
+        with start_trace(name, **attributes) as root:
+            yield root
+    else:
+        with span(name, **attributes) as child:
+            yield child
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def set_trace_attribute(key, value):
+    """
+    Sets an attribute on the root span of the current trace (e.g. visualization_type).
+    """
+    active = _current_span.get()
+    if active is not None:
+        active.root().set_attribute(key, value)
+
+
+def get_trace_attribute(key, default=None):
+    active = _current_span.get()
+    return active.root().attributes.get(key, default) if active is not None else default
+
+
+def to_otlp_json(root):
+    """
+    Serialises a span tree in the OTLP/HTTP JSON format (ExportTraceServiceRequest).
+    """
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "ox4-capstone-api.tracing"},
+                "spans": [
+                    {
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        "parentSpanId": s.parent.span_id if s.parent is not None else "",
+                        "name": s.name,
+                        "kind": 2 if s.parent is None else 1,
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns),
+                        "attributes": [_otlp_attribute(k, v) for k, v in s.attributes.items()],
+                        "status": {"code": 2, "message": s.error} if s.error else {"code": 1}
+                    }
+                    for s in root.iter_spans()
+                ]
+            }]
+        }]
+    }
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_export_queue = queue.Queue(maxsize=1000)
+_exporter_thread = None
+_exporter_lock = threading.Lock()
+
+
+def export_trace(root):
+    """
+    Hands the finished trace to a background exporter so file/collector I/O never blocks the request.
+    """
+    if not TRACE_EXPORT_PATH and not TRACE_COLLECTOR_URL:
+        return
+    _ensure_exporter()
+    try:
+        _export_queue.put_nowait(root)
+    except queue.Full:
+        logger.warning("Trace export queue is full; dropping trace %s", root.trace_id)
+
+
+def _ensure_exporter():
+    global _exporter_thread
+    with _exporter_lock:
+        if _exporter_thread is None:
+            _exporter_thread = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+            _exporter_thread.start()
+
+
+def _export_loop():
+    while True:
+        root = _export_queue.get()
+        payload = json.dumps(to_otlp_json(root), default=str)
+        try:
+            if TRACE_EXPORT_PATH:
+                with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                    f.write(payload + "\n")
+            if TRACE_COLLECTOR_URL:
+                request = urllib.request.Request(TRACE_COLLECTOR_URL, data=payload.encode("utf-8"),
+                                                 headers={"Content-Type": "application/json"}, method="POST")
+                urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning("Trace export failed", extra={"error": str(e)})
@@ -1,7 +1,17 @@
 import re
 import json
+import logging
 from typing import Optional, Dict
 
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token for English/JSON under GPT-4o tokenisation).
+    """
+    return len(text) // 4 + 1
+
 
 def parsed_reasoning_output(llm_output):
     result = {
@@ -39,6 +49,24 @@ def parsed_reasoning_output(llm_output):
     return result
 
 
+def parsed_batch_reasoning_output(llm_output, question_count):
+    """
+    Splits a multi-question classification response into one section per question.
+    Returns a list of length question_count; missing sections are None.
+    """
+    sections = [None] * question_count
+    if not llm_output:
+        return sections
+
+    parts = re.split(r"^\s*#{0,3}\s*Question\s+(\d+)\s*:?\s*$", llm_output, flags=re.MULTILINE | re.IGNORECASE)
+    # parts → [preamble, number, body, number, body, ...]
+    for number, body in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        if 0 <= index < question_count and "Visualization Type:" in body:
+            sections[index] = body.strip()
+    return sections
+
+
 def parsed_kg_sql_output(llm_output):
     """
     Parses LLM output for Knowledge Graph
@@ -54,7 +82,7 @@ def parsed_kg_sql_output(llm_output):
     }
 
     if not llm_output or not isinstance(llm_output, str):
-        print("LLM output is empty or invalid.")
+        logger.warning("LLM output is empty or invalid.")
 
     # Extract reasoning answer
     reasoning_match = re.search(r'1\.\s*Reasoning Answer:\s*(.*?)(?=2\.\s*SQL Query:)', llm_output, re.DOTALL)